@@ -1,103 +1,151 @@
-import streamlit as st
-import joblib
-import numpy as np
-import os
-
-# -----------------------------------------------------------------------------
-# 1. SETUP & CONFIGURATION
-# -----------------------------------------------------------------------------
-st.set_page_config(
-    page_title="Smart Crop Recommendation",
-    page_icon="🌱",
-    layout="centered"
-)
-
-# -----------------------------------------------------------------------------
-# 2. LOAD MODELS (With Caching for Performance)
-# -----------------------------------------------------------------------------
-@st.cache_resource
-def load_tools():
-    """
-    Load the saved model, scaler, and label encoder.
-    Using cache to prevent reloading on every user interaction.
-    """
-    # Get the directory where this current file (app.py) is located
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    
-    # Construct paths to the 'saved_models' folder relative to this file
-    model_path = os.path.join(current_dir, '..', 'saved_models', 'crop_recommendation_model.pkl')
-    scaler_path = os.path.join(current_dir, '..', 'saved_models', 'scaler.pkl')
-    encoder_path = os.path.join(current_dir, '..', 'saved_models', 'label_encoder.pkl')
-
-    try:
-        model = joblib.load(model_path)
-        scaler = joblib.load(scaler_path)
-        encoder = joblib.load(encoder_path)
-        return model, scaler, encoder
-    except FileNotFoundError as e:
-        st.error(f"Error loading model files: {e}")
-        st.error("Please ensure the 'saved_models' folder exists and contains the .pkl files.")
-        return None, None, None
-
-model, scaler, le = load_tools()
-
-# -----------------------------------------------------------------------------
-# 3. UI LAYOUT
-# -----------------------------------------------------------------------------
-st.title("🌱 Smart Crop Recommendation System")
-st.markdown("""
-Welcome! Enter the soil and environmental conditions below to get the 
-**most suitable crop** recommendation for your farm.
-""")
-
-st.divider() # Adds a visual line separator
-
-if model and scaler and le:
-    # Create two columns for a cleaner layout
-    col1, col2 = st.columns(2)
-
-    with col1:
-        N = st.number_input("Nitrogen (N)", min_value=0, max_value=140, value=50, help="Ratio of Nitrogen content in soil")
-        P = st.number_input("Phosphorus (P)", min_value=0, max_value=145, value=50, help="Ratio of Phosphorus content in soil")
-        K = st.number_input("Potassium (K)", min_value=0, max_value=205, value=50, help="Ratio of Potassium content in soil")
-        ph = st.number_input("Soil pH", min_value=0.0, max_value=14.0, value=6.5, step=0.1)
-
-    with col2:
-        temperature = st.number_input("Temperature (°C)", min_value=0.0, max_value=60.0, value=25.0, step=0.1)
-        humidity = st.number_input("Humidity (%)", min_value=0.0, max_value=100.0, value=70.0, step=0.1)
-        rainfall = st.number_input("Rainfall (mm)", min_value=0.0, max_value=500.0, value=100.0, step=0.1)
-
-    # -------------------------------------------------------------------------
-    # 4. PREDICTION LOGIC
-    # -------------------------------------------------------------------------
-    st.markdown("---")
-    
-    # Center the button
-    _, mid_col, _ = st.columns([1, 2, 1])
-    
-    with mid_col:
-        predict_btn = st.button("🔍 Predict Best Crop", type="primary", use_container_width=True)
-
-    if predict_btn:
-        # A. Prepare the input array (must match training data order)
-        user_input = np.array([[N, P, K, temperature, humidity, ph, rainfall]])
-        
-        # B. Scale the input using the loaded Scaler
-        try:
-            user_input_scaled = scaler.transform(user_input)
-            
-            # C. Predict the Class ID
-            prediction_id = model.predict(user_input_scaled)
-            
-            # D. Decode the Class ID to the Crop Name
-            predicted_crop_name = le.inverse_transform(prediction_id)[0]
-            
-            # E. Display Result
-            st.success(f"✅ The Recommended Crop is: **{predicted_crop_name.upper()}**")
-
-            
-        except Exception as e:
-            st.error(f"An error occurred during prediction: {e}")
-
-else:
-    st.warning("Models could not be loaded. Please check your file structure.")
\ No newline at end of file
+import streamlit as st
+import os
+import sys
+
+# Make the project's `src` package importable under `streamlit run app/...`
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.images import IMAGES_DIR, get_thumbnails
+from src.inference import (DEFAULT_FEATURE_SET, DEFAULT_TOP_K, INPUT_WIDGETS, SOIL_FEATURES,
+                           crop_advice, feature_set, get_predictor, input_warnings, recommend)
+from src.instrumentation import configure_from_env, span
+from src.startup import warm_up
+from src.utils import INPUT_BOUNDS, SAVED_MODELS_DIR
+
+configure_from_env()
+
+# -----------------------------------------------------------------------------
+# 1. SETUP & CONFIGURATION
+# -----------------------------------------------------------------------------
+# One app for every deployment; the former app1-app4 variants are settings:
+#   CROP_APP_FEATURES  'selected' (deployed 5-feature model) or 'all' (7 inputs)
+#   CROP_APP_EXTRAS    comma-separated subset of 'warnings,advice,images'
+#   CROP_APP_TOP_K     number of ranked crops to show (1 = best crop only)
+#   CROP_IMAGES_DIR    folder with <crop>.jpg/.png images (default: ./images);
+#                      run `python -m src.images build` to pre-resize them
+#   CROP_THUMBS_DIR    folder written by `build --output` (default: <images>/thumbs)
+#   CROP_IMAGE_WIDTH   displayed image width in pixels
+#   CROP_MODELS_DIR    folder with the saved model (default: ./saved_models)
+#   CROP_APP_LOOKUP    '1' to answer from the precomputed lookup grid
+#                      (`python -m src.lookup_grid build`) while it matches the model
+FEATURES_SHOWN = feature_set(os.environ.get('CROP_APP_FEATURES', DEFAULT_FEATURE_SET))
+EXTRAS = {e.strip() for e in os.environ.get('CROP_APP_EXTRAS', 'warnings,advice,images').split(',')}
+TOP_K = int(os.environ.get('CROP_APP_TOP_K', DEFAULT_TOP_K))
+IMAGES_PATH = os.environ.get('CROP_IMAGES_DIR', IMAGES_DIR)
+THUMBS_PATH = os.environ.get('CROP_THUMBS_DIR') or None
+IMAGE_WIDTH = int(os.environ.get('CROP_IMAGE_WIDTH', 320))
+MODELS_PATH = os.environ.get('CROP_MODELS_DIR', SAVED_MODELS_DIR)
+LOOKUP = os.environ.get('CROP_APP_LOOKUP') == '1'
+
+st.set_page_config(
+    page_title="Smart Crop Recommendation",
+    page_icon="🌱",
+    layout="centered"
+)
+
+# -----------------------------------------------------------------------------
+# 2. LOAD MODEL (in the background, shared by every session)
+# -----------------------------------------------------------------------------
+def load_predictor():
+    """
+    Load the saved model artifact behind a prediction cache.
+    `get_predictor` keeps one copy per process, shared by all sessions and
+    reruns; the model is reloaded automatically when the files in
+    'saved_models' change. Runs on a background thread (see
+    src/startup.py), so the page renders while sklearn is still loading.
+    """
+    return get_predictor(MODELS_PATH, lookup=LOOKUP)
+
+predictor_task = warm_up('predictor', load_predictor)
+
+# -----------------------------------------------------------------------------
+# 3. UI LAYOUT
+# -----------------------------------------------------------------------------
+st.title("🌱 Smart Crop Recommendation System")
+st.markdown("""
+Welcome! Enter the soil and environmental conditions below to get the
+**most suitable crop** recommendation for your farm.
+""")
+
+st.divider() # Adds a visual line separator
+
+
+def number_input(feature):
+    label, default, help_text = INPUT_WIDGETS[feature]
+    low, high, step = INPUT_BOUNDS[feature]
+    if step >= 1:
+        return st.number_input(label, int(low), int(high), int(default), help=help_text)
+    return st.number_input(label, low, high, float(default), step=step, format="%.1f", help=help_text)
+
+
+if not predictor_task.failed():
+    # Soil readings on the left, climate on the right
+    col1, col2 = st.columns(2)
+    inputs = {}
+
+    with col1:
+        st.subheader("🧪 Soil Nutrients")
+        for feature in FEATURES_SHOWN:
+            if feature in SOIL_FEATURES:
+                inputs[feature] = number_input(feature)
+
+    with col2:
+        st.subheader("🌤️ Climate Conditions")
+        for feature in FEATURES_SHOWN:
+            if feature not in SOIL_FEATURES:
+                inputs[feature] = number_input(feature)
+
+    if 'warnings' in EXTRAS:
+        warnings = input_warnings(inputs)
+        if warnings:
+            st.warning("\n\n".join(f"⚠️ **Warning:** {w}" for w in warnings))
+
+    # -------------------------------------------------------------------------
+    # 4. PREDICTION LOGIC
+    # -------------------------------------------------------------------------
+    st.markdown("---")
+
+    # Center the button
+    _, mid_col, _ = st.columns([1, 2, 1])
+
+    with mid_col:
+        predict_btn = st.button("🔍 Predict Best Crop", type="primary", use_container_width=True)
+
+    if predict_btn:
+        try:
+            # Waits only if the background load has not finished yet
+            with st.spinner("Loading model..."):
+                predictor = predictor_task.result()
+
+            # Scale, predict and decode (or reuse the cached answer)
+            result = recommend(inputs, k=TOP_K, predictor=predictor)
+            crop_name = result.crop
+
+            # Display Result
+            st.success(f"✅ The Recommended Crop is: **{crop_name.upper()}**")
+            st.balloons()
+
+            # Runner-up crops for fields that sit between crops
+            if len(result.ranking) > 1:
+                st.markdown(f"**Top {len(result.ranking)} suitable crops**")
+                for rank, (name, p) in enumerate(result.ranking, start=1):
+                    st.write(f"{rank}. {name.title()} — {p:.0%}")
+                    st.progress(p)
+
+            if 'images' in EXTRAS:
+                # Pre-encoded bytes from memory; missing crops get the placeholder
+                with span('image'):
+                    thumbnail = get_thumbnails(IMAGES_PATH, THUMBS_PATH).get(crop_name, IMAGE_WIDTH)
+                if thumbnail is not None:
+                    st.image(thumbnail.data, caption=crop_name.title(),
+                             width=min(IMAGE_WIDTH, thumbnail.width or IMAGE_WIDTH))
+
+            if 'advice' in EXTRAS and crop_advice(crop_name):
+                st.info(crop_advice(crop_name))
+
+        except Exception as e:
+            st.error(f"An error occurred during prediction: {e}")
+
+else:
+    st.error(f"Error loading model files: {predictor_task.exception()}")
+    st.error(f"Please ensure '{MODELS_PATH}' exists and contains the saved model.")
+    st.warning("Models could not be loaded. Please check your file structure.")
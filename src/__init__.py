@@ -0,0 +1,4 @@
+"""
+Reusable, Streamlit-free building blocks for the Smart Crop Recommendation
+System (model loading, batch scoring and related tooling).
+"""
@@ -0,0 +1,294 @@
+"""
+Single, versioned model artifact.
+
+Bundles the scaler, classifier, label classes and feature schema into one
+uncompressed joblib file so the apps, batch CLI and service load everything
+with a single call instead of three separate unpickles.
+
+Plain NumPy arrays stored in the bundle (label classes, linear model
+coefficients, compiled or scaler-folded predictors from `src.compiled` and
+`src.folding`) are memory-mapped on load via `mmap_mode='r'`, so cold start
+does not copy them into the process heap. sklearn's own tree objects still
+copy their node tables when unpickled; when compiled trees are present they
+serve small batches instead.
+
+Usage:
+    python -m src.artifact build            # fuse the three legacy .pkl files
+    python -m src.artifact inspect saved_models/crop_recommendation.joblib
+"""
+import argparse
+import os
+import sys
+
+import joblib
+import numpy as np
+
+from src.compiled import CompiledForest
+from src.folding import FoldedLinear
+from src.instrumentation import ROWS_PREDICTED, span
+from src.utils import SAVED_MODELS_DIR, feature_order, load_tools, normalize_columns
+
+ARTIFACT_FILE = 'crop_recommendation.joblib'
+
+# Compiled trees beat sklearn's per-call overhead on small batches; past this
+# size sklearn's Cython traversal is faster (see `python -m src.compiled benchmark`)
+COMPILED_MAX_ROWS = 512
+ARTIFACT_FORMAT = 'crop-recommendation'
+FORMAT_VERSION = 1
+
+
+class ArtifactError(ValueError):
+    """
+    Raised when an artifact is malformed, from an unsupported format version
+    or inconsistent with the expected feature schema.
+    """
+
+
+# -----------------------------------------------------------------------------
+# 1. RANKING
+# -----------------------------------------------------------------------------
+def top_k(proba, k):
+    """
+    Column indices and values of the `k` largest entries per row, best first.
+    Ties keep the lower column first, like argmax.
+    """
+    proba = np.ascontiguousarray(proba)
+    n_rows, n_classes = proba.shape
+    k = max(1, min(int(k), n_classes))
+    if k == 1:
+        ids = np.argmax(proba, axis=1)[:, np.newaxis]
+    else:
+        # A full stable sort: with a few dozen classes it costs about as much
+        # as argpartition, which would pick arbitrary ties at the k-th place
+        ids = np.argsort(-proba, axis=1, kind='stable')[:, :k]
+    return ids, np.take_along_axis(proba, ids, axis=1)
+
+
+# -----------------------------------------------------------------------------
+# 2. ARTIFACT OBJECT
+# -----------------------------------------------------------------------------
+class ModelArtifact:
+    """
+    Scaler + classifier + label classes + feature schema, validated together.
+    """
+
+    def __init__(self, model, scaler, classes, features, metadata=None, compiled=None):
+        self.model = model
+        self.scaler = scaler
+        self.classes = np.asarray(classes)
+        self.features = [str(name) for name in features]
+        self.metadata = dict(metadata or {})
+        self.compiled = compiled
+        self.validate()
+
+    @classmethod
+    def from_legacy(cls, base_path=SAVED_MODELS_DIR):
+        """
+        Build an artifact from the separate model/scaler/encoder pickles.
+        """
+        model, scaler, encoder = load_tools(base_path)
+        return cls(model, scaler, encoder.classes_, feature_order(scaler),
+                   metadata={'source': 'legacy-pickles'})
+
+    def validate(self, expected_features=None):
+        """
+        Reject artifacts whose parts disagree about the feature schema.
+        """
+        scaler_names = getattr(self.scaler, 'feature_names_in_', None)
+        if scaler_names is not None and [str(n) for n in scaler_names] != self.features:
+            raise ArtifactError(
+                f"Scaler was fit on {list(scaler_names)} but artifact declares {self.features}")
+        if self.compiled is not None and self.compiled.n_features != len(self.features):
+            raise ArtifactError(
+                f"Compiled predictor expects {self.compiled.n_features} features "
+                f"but artifact declares {len(self.features)}")
+        for part, name in ((self.scaler, 'scaler'), (self.model, 'model')):
+            n_in = getattr(part, 'n_features_in_', None)
+            if n_in is not None and n_in != len(self.features):
+                raise ArtifactError(
+                    f"{name} expects {n_in} features but artifact declares {len(self.features)}")
+        model_classes = getattr(self.model, 'classes_', None)
+        if model_classes is not None and len(model_classes) != len(self.classes):
+            raise ArtifactError(
+                f"Model has {len(model_classes)} classes but artifact stores {len(self.classes)} labels")
+        if expected_features is not None and list(expected_features) != self.features:
+            raise ArtifactError(
+                f"Feature order mismatch: caller expects {list(expected_features)}, "
+                f"artifact was trained on {self.features}")
+
+    # -------------------------------------------------------------------------
+    # Inference helpers
+    # -------------------------------------------------------------------------
+    def to_matrix(self, frame):
+        """
+        Select the artifact's features (in order) from a DataFrame.
+        """
+        return normalize_columns(frame)[self.features]
+
+    def _predictor(self, X):
+        """
+        Pick the predictor for this batch and prepare its input.
+        """
+        fast = self.compiled
+        if fast is not None and (fast.kind != 'forest' or len(X) <= COMPILED_MAX_ROWS):
+            if fast.raw_input:
+                # A folded predictor takes raw columns and skips the scaled copy
+                return fast, np.asarray(X, dtype=np.float64)
+            with span('scale'):
+                return fast, self.scaler.transform(X)
+        with span('scale'):
+            return self.model, self.scaler.transform(X)
+
+    def predict_ids(self, X):
+        """
+        Scale and predict class ids for a DataFrame or array in feature order.
+        """
+        predictor, X_in = self._predictor(X)
+        with span('predict'):
+            ids = np.asarray(predictor.predict(X_in), dtype=np.intp)
+        ROWS_PREDICTED.inc(len(ids))
+        return ids
+
+    def predict_proba(self, X):
+        """
+        Class probabilities for a DataFrame or array in feature order; column
+        j is class id `model.classes_[j]` (normally j itself).
+        """
+        predictor, X_in = self._predictor(X)
+        if not hasattr(predictor, 'predict_proba'):
+            raise ArtifactError(f"{type(predictor).__name__} does not provide class probabilities")
+        with span('predict_proba'):
+            proba = predictor.predict_proba(X_in)
+        ROWS_PREDICTED.inc(len(proba))
+        return proba
+
+    def decode(self, prediction_ids):
+        with span('decode'):
+            return self.classes.take(prediction_ids)
+
+    def recommend(self, frame, k=3):
+        """
+        Top-`k` crops per row of `frame` with their probabilities, best first.
+        Returns (labels, probabilities), both of shape (n_rows, k).
+        """
+        proba = self.predict_proba(self.to_matrix(frame))
+        columns, values = top_k(proba, k)
+        model_classes = self.compiled.classes if self.compiled is not None else self.model.classes_
+        return self.decode(np.asarray(model_classes).take(columns)), values
+
+    def predict(self, frame):
+        """
+        Return decoded crop names for every row of `frame`.
+        """
+        return self.decode(self.predict_ids(self.to_matrix(frame)))
+
+    # -------------------------------------------------------------------------
+    # Persistence
+    # -------------------------------------------------------------------------
+    def to_dict(self):
+        return {
+            'format': ARTIFACT_FORMAT,
+            'format_version': FORMAT_VERSION,
+            'features': list(self.features),
+            'classes': self.classes,
+            'scaler': self.scaler,
+            'model': self.model,
+            'metadata': self.metadata,
+            'compiled': self.compiled.to_dict() if self.compiled is not None else None,
+        }
+
+
+# -----------------------------------------------------------------------------
+# 3. SAVE / LOAD
+# -----------------------------------------------------------------------------
+def save_artifact(artifact, path):
+    """
+    Write the artifact uncompressed so it stays memory-mappable. The file is
+    written next to `path` and renamed into place, so processes that have the
+    old file memory-mapped keep reading a consistent copy.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    joblib.dump(artifact.to_dict(), tmp_path)
+    os.replace(tmp_path, path)
+    return path
+
+
+def _compiled_from_payload(payload):
+    arrays = payload.get('compiled')
+    if arrays is None:
+        return None
+    if arrays.get('kind', 'forest') == 'linear':
+        return FoldedLinear.from_dict(arrays)
+    return CompiledForest.from_dict(arrays)
+
+
+def load_artifact(path, expected_features=None, mmap_mode='r'):
+    """
+    Load and validate an artifact. Raises ArtifactError on a format, version
+    or feature-schema mismatch.
+    """
+    with span('load'):
+        payload = joblib.load(path, mmap_mode=mmap_mode)
+    if not isinstance(payload, dict) or payload.get('format') != ARTIFACT_FORMAT:
+        raise ArtifactError(f"{path} is not a crop recommendation artifact")
+    version = payload.get('format_version')
+    if version != FORMAT_VERSION:
+        raise ArtifactError(
+            f"Unsupported artifact format version {version} (expected {FORMAT_VERSION})")
+
+    artifact = ModelArtifact(payload['model'], payload['scaler'], payload['classes'],
+                             payload['features'], payload.get('metadata'),
+                             compiled=_compiled_from_payload(payload))
+    artifact.validate(expected_features)
+    return artifact
+
+
+def load_default(base_path=SAVED_MODELS_DIR, expected_features=None):
+    """
+    Load the fused artifact from `base_path`, falling back to the three
+    legacy pickles when it has not been built yet.
+    """
+    path = os.path.join(base_path, ARTIFACT_FILE)
+    if os.path.exists(path):
+        return load_artifact(path, expected_features)
+    with span('load'):
+        artifact = ModelArtifact.from_legacy(base_path)
+    artifact.validate(expected_features)
+    return artifact
+
+
+# -----------------------------------------------------------------------------
+# 4. CLI
+# -----------------------------------------------------------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or inspect the fused model artifact.")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    build = sub.add_parser('build', help="Fuse model, scaler and label encoder pickles")
+    build.add_argument('--models', default=SAVED_MODELS_DIR,
+                       help="Directory containing the legacy .pkl files")
+    build.add_argument('--output', default=None,
+                       help=f"Artifact path (default: <models>/{ARTIFACT_FILE})")
+
+    inspect = sub.add_parser('inspect', help="Validate an artifact and print its schema")
+    inspect.add_argument('path')
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        artifact = ModelArtifact.from_legacy(args.models)
+        output = args.output or os.path.join(args.models, ARTIFACT_FILE)
+        save_artifact(artifact, output)
+        print(f"Wrote {output} ({os.path.getsize(output) / 1e6:.2f} MB)")
+    else:
+        artifact = load_artifact(args.path)
+        print(f"Format version: {FORMAT_VERSION}")
+        print(f"Model:    {type(artifact.model).__name__}")
+        print(f"Features: {artifact.features}")
+        print(f"Classes:  {len(artifact.classes)}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
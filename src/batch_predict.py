@@ -0,0 +1,170 @@
+"""
+Headless batch scoring for large field-survey CSVs.
+
+The input is read in fixed-size chunks so peak memory depends on the chunk
+size, not on the file size. Each chunk is scaled, predicted and decoded with
+one vectorized call per step and appended to the output CSV. With `--cache`,
+rows are rounded to the UI input resolution and each distinct row is scored
+once (see `src.prediction_cache`), which pays off on files with many
+resubmitted readings. With `--validate`, each chunk is checked against the
+input schema in one vectorized pass (see `src.monitoring`); rejected rows
+keep an empty prediction and the reason in `input_error`, and the run
+ends with a drift report of the accepted rows against the training data.
+
+Usage:
+    python -m src.batch_predict surveys.csv predictions.csv --chunksize 100000
+    python -m src.batch_predict surveys.csv predictions.csv --validate
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.artifact import load_default
+from src.inference import get_predictor
+from src.prediction_cache import DEFAULT_MAX_ENTRIES
+from src.preprocessing import BOUNDS_FILE, OUTLIER_MODES, load_bounds
+from src.utils import SAVED_MODELS_DIR, normalize_columns
+
+PREDICTION_COLUMN = 'predicted_label'
+ERROR_COLUMN = 'input_error'
+DEFAULT_CHUNKSIZE = 100_000
+
+
+def score_csv(input_path, output_path, chunksize=DEFAULT_CHUNKSIZE, base_path=SAVED_MODELS_DIR,
+              bounds=None, outlier_mode='median', top_k=None, cache_size=0, validate=False):
+    """
+    Stream `input_path` through the saved pipeline and write predictions to
+    `output_path`. Returns a dict with rows, seconds and rows_per_second.
+
+    With `bounds` (see `src.preprocessing`), outliers are replaced before
+    scoring exactly as they were in the training data; the output keeps the
+    original values. With `top_k`, the k most likely crops and their
+    probabilities are added as top1_label, top1_proba, ... columns. With
+    `cache_size`, predictions go through the shared cached predictor. With
+    `validate`, rows failing the schema checks are not scored, and the
+    stats also hold the rejected count and the per-feature drift (PSI).
+    """
+    artifact = get_predictor(base_path, max_entries=cache_size) if cache_size else load_default(base_path)
+    validator = monitor = None
+    if validate:
+        from src.monitoring import BatchValidator, DriftMonitor, load_profile
+
+        profile = load_profile(base_path)
+        validator = BatchValidator(artifact.features, profile=profile)
+        if profile is not None:
+            profile = profile.subset(artifact.features)
+            monitor = DriftMonitor(profile, interval=float('inf'))
+            drift_columns = [list(artifact.features).index(f) for f in profile.features]
+
+    rows = rejected = 0
+    start = time.perf_counter()
+    header = True
+    for chunk in pd.read_csv(input_path, chunksize=chunksize):
+        features = chunk if bounds is None else bounds.apply(normalize_columns(chunk), outlier_mode)
+        valid = slice(None)
+        if validator is not None:
+            result = validator.check(chunk)
+            valid = result.valid
+            errors = result.errors()
+            chunk[ERROR_COLUMN] = [errors.get(i, '') for i in range(len(chunk))]
+            rejected += len(errors)
+            if monitor is not None:
+                monitor.observe(result.X[valid][:, drift_columns])
+            features = features[valid]
+        if top_k:
+            # Every chunk gets every column, even when none of its rows is scored
+            chunk[PREDICTION_COLUMN] = None
+            for i in range(top_k):
+                chunk[f'top{i + 1}_label'] = None
+                chunk[f'top{i + 1}_proba'] = np.nan
+            if len(features):
+                labels, proba = artifact.recommend(features, top_k)
+                chunk.loc[valid, PREDICTION_COLUMN] = labels[:, 0]
+                for i in range(labels.shape[1]):
+                    chunk.loc[valid, f'top{i + 1}_label'] = labels[:, i]
+                    chunk.loc[valid, f'top{i + 1}_proba'] = proba[:, i]
+        elif len(features):
+            chunk.loc[valid, PREDICTION_COLUMN] = artifact.predict(features)
+        else:
+            chunk[PREDICTION_COLUMN] = None
+        chunk.to_csv(output_path, mode='w' if header else 'a', header=header, index=False)
+        header = False
+        rows += len(chunk)
+    elapsed = time.perf_counter() - start
+
+    return {
+        'rows': rows,
+        'seconds': elapsed,
+        'rows_per_second': rows / elapsed if elapsed > 0 else float('inf'),
+        'cache': artifact.cache.stats() if cache_size else None,
+        'rejected': rejected if validate else None,
+        'drift': (monitor.flush() or {}).get('psi') if monitor is not None else None,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score a soil-survey CSV with the saved crop model.")
+    parser.add_argument('input', help="CSV in the same schema as data/Crop_recommendation.csv")
+    parser.add_argument('output', help="Destination CSV (input columns + predicted_label)")
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE,
+                        help=f"Rows per chunk (default: {DEFAULT_CHUNKSIZE})")
+    parser.add_argument('--models', default=SAVED_MODELS_DIR,
+                        help="Directory containing the saved model artifact")
+    parser.add_argument('--clean', action='store_true',
+                        help=f"Apply the training outlier rule from <models>/{BOUNDS_FILE} first")
+    parser.add_argument('--outliers', choices=OUTLIER_MODES, default='median',
+                        help="With --clean: replace outliers by the median or clip them")
+    parser.add_argument('--top-k', type=int, default=None,
+                        help="Also write the k most likely crops with their probabilities")
+    parser.add_argument('--cache', nargs='?', type=int, const=DEFAULT_MAX_ENTRIES, default=0,
+                        metavar='ENTRIES',
+                        help="Score each distinct row (at UI input resolution) once; "
+                             f"optional cache size (default: {DEFAULT_MAX_ENTRIES})")
+    parser.add_argument('--validate', action='store_true',
+                        help=f"Skip rows outside the input schema (reason in '{ERROR_COLUMN}') "
+                             "and report drift against the training data")
+    args = parser.parse_args(argv)
+
+    if args.chunksize <= 0:
+        parser.error("--chunksize must be a positive integer")
+    if args.top_k is not None and args.top_k <= 0:
+        parser.error("--top-k must be a positive integer")
+    if args.cache < 0:
+        parser.error("--cache must be a positive integer")
+    if not os.path.exists(args.input):
+        parser.error(f"Input file not found: {args.input}")
+
+    bounds = None
+    if args.clean:
+        bounds_path = os.path.join(args.models, BOUNDS_FILE)
+        if not os.path.exists(bounds_path):
+            parser.error(f"{bounds_path} not found; run `python -m src.preprocessing clean` first")
+        bounds = load_bounds(bounds_path)
+
+    stats = score_csv(args.input, args.output, chunksize=args.chunksize, base_path=args.models,
+                      bounds=bounds, outlier_mode=args.outliers, top_k=args.top_k,
+                      cache_size=args.cache, validate=args.validate)
+    print(
+        f"Scored {stats['rows']:,} rows in {stats['seconds']:.2f}s "
+        f"({stats['rows_per_second']:,.0f} rows/s) -> {args.output}",
+        file=sys.stderr,
+    )
+    if stats['cache'] is not None:
+        print(f"Cache: {stats['cache']['hits']:,} hits, {stats['cache']['misses']:,} misses",
+              file=sys.stderr)
+    if stats['rejected'] is not None:
+        print(f"Validation: {stats['rejected']:,} rows rejected", file=sys.stderr)
+    if stats['drift']:
+        from src.monitoring import drift_level
+
+        print("Drift (PSI): " + ', '.join(f"{f} {score:.3f} ({drift_level(score)})"
+                                          for f, score in stats['drift'].items()), file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,341 @@
+"""
+Reproducible inference and training benchmarks with regression tracking.
+
+Measures, on synthetic data scaled up from data/Crop_recommendation.csv:
+
+* cold start: a fresh interpreter importing `src.artifact` and loading the
+  model artifact (median of several runs, plus the RSS it ends up with)
+* single-row predict latency (p50 / p99)
+* batch throughput at several batch sizes
+* 5-fold CV training wall time for every model in the training notebook
+* peak RSS of the benchmark process
+
+Results are written as JSON. With a stored baseline, every metric is
+compared against it and the run fails (exit code 1) when one is worse by
+more than the threshold.
+
+Usage:
+    python -m src.benchmarks --save-baseline          # record the baseline
+    python -m src.benchmarks                          # compare against it
+    python -m src.benchmarks --quick --threshold 0.3
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.utils import FEATURES, PROJECT_ROOT, TARGET, normalize_columns
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+RAW_CSV = os.path.join(PROJECT_ROOT, 'data', 'Crop_recommendation.csv')
+BENCHMARK_DIR = os.path.join(PROJECT_ROOT, 'benchmarks')
+BASELINE_FILE = os.path.join(BENCHMARK_DIR, 'baseline.json')
+RESULTS_FILE = os.path.join(PROJECT_ROOT, '.cache', 'benchmarks', 'latest.json')
+
+SEED = 42
+DEFAULT_THRESHOLD = 0.2
+BATCH_SIZES = (1_000, 100_000, 1_000_000)
+QUICK_BATCH_SIZES = (1_000, 10_000)
+CV_MODELS = ('LR', 'DTC', 'RFC', 'RFCT', 'RTRFC', 'SVM', 'XGBC')
+REFERENCE_MODEL = 'RTRFC'
+# Relative noise added to resampled rows, as a share of each column's spread
+JITTER = 0.02
+
+
+# -----------------------------------------------------------------------------
+# 1. SYNTHETIC DATA
+# -----------------------------------------------------------------------------
+def synthetic_dataset(n_rows, seed=SEED, csv_path=RAW_CSV):
+    """
+    Resample the Kaggle rows with replacement and add small Gaussian noise,
+    so any size keeps the original class balance and feature ranges.
+    """
+    source = normalize_columns(pd.read_csv(csv_path))
+    rng = np.random.default_rng(seed)
+    picks = rng.integers(0, len(source), size=n_rows)
+    values = source[FEATURES].to_numpy(dtype=np.float64)[picks]
+    values += rng.normal(0.0, JITTER, size=values.shape) * source[FEATURES].std().to_numpy()
+    frame = pd.DataFrame(np.clip(values, 0, None), columns=FEATURES)
+    frame[TARGET] = source[TARGET].to_numpy()[picks]
+    return frame
+
+
+def reference_artifact(features, seed=SEED):
+    """
+    The deployed model configuration trained on the synthetic training set,
+    so inference numbers do not depend on what is in saved_models/.
+    """
+    from sklearn.preprocessing import StandardScaler
+
+    from src.artifact import ModelArtifact
+    from src.models import BASELINES, make_estimator
+
+    frame = synthetic_dataset(len(pd.read_csv(RAW_CSV)), seed)
+    classes, y = np.unique(frame[TARGET].to_numpy(), return_inverse=True)
+    scaler = StandardScaler().fit(frame[features])
+    name, params = BASELINES[REFERENCE_MODEL]
+    model = make_estimator(name, params).fit(scaler.transform(frame[features]), y)
+    return ModelArtifact(model, scaler, classes, features,
+                         metadata={'source': 'src.benchmarks', 'model': REFERENCE_MODEL})
+
+
+# -----------------------------------------------------------------------------
+# 2. MEASUREMENTS
+# -----------------------------------------------------------------------------
+def _rss_mb():
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    return usage.ru_maxrss / (2**20 if sys.platform == 'darwin' else 2**10)
+
+
+_COLD_START = """
+import json, sys, time
+start = time.perf_counter()
+from src.artifact import load_artifact
+imported = time.perf_counter()
+load_artifact(sys.argv[1])
+loaded = time.perf_counter()
+rss = None
+try:
+    import resource
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (2**20 if sys.platform == 'darwin' else 2**10)
+except ImportError:
+    pass
+print(json.dumps({'import_s': imported - start, 'load_s': loaded - imported, 'rss_mb': rss}))
+"""
+
+
+def cold_start(artifact_path, runs=5):
+    """
+    Import + load time in fresh interpreters (median over `runs`).
+    """
+    samples = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, '-c', _COLD_START, artifact_path], cwd=PROJECT_ROOT,
+                             capture_output=True, text=True, check=True)
+        samples.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    median = {key: float(np.median([s[key] for s in samples]))
+              for key in ('import_s', 'load_s')}
+    rss = [s['rss_mb'] for s in samples if s['rss_mb'] is not None]
+    median['rss_mb'] = float(np.median(rss)) if rss else None
+    return median
+
+
+def single_row_latency(artifact, frame, repeats=500):
+    rows = [frame.iloc[[i % len(frame)]] for i in range(repeats)]
+    timings = np.empty(repeats)
+    for i, row in enumerate(rows):
+        start = time.perf_counter()
+        artifact.predict(row)
+        timings[i] = time.perf_counter() - start
+    return {'p50_ms': float(np.percentile(timings, 50) * 1e3),
+            'p99_ms': float(np.percentile(timings, 99) * 1e3)}
+
+
+def batch_throughput(artifact, frame, batch_size, repeats=3):
+    """
+    Best rows/second over `repeats` predictions of one batch.
+    """
+    batch = frame.iloc[:batch_size]
+    best = float('inf')
+    for _ in range(repeats if batch_size <= 100_000 else 1):
+        start = time.perf_counter()
+        artifact.predict(batch)
+        best = min(best, time.perf_counter() - start)
+    return batch_size / best
+
+
+def cv_training_time(model_key, frame, features, n_splits=5):
+    """
+    Wall time of an uncached, single-process 5-fold CV of one notebook model.
+    Returns None when the model's library is not installed.
+    """
+    from sklearn.preprocessing import StandardScaler
+
+    from src.models import BASELINES, make_estimator
+    from src.train import cross_validate
+
+    name, params = BASELINES[model_key]
+    try:
+        make_estimator(name, params)
+    except ImportError:
+        return None
+    _, y = np.unique(frame[TARGET].to_numpy(), return_inverse=True)
+    X = StandardScaler().fit_transform(frame[features])
+    with tempfile.TemporaryDirectory() as cache_dir:
+        start = time.perf_counter()
+        cross_validate([(name, params)], X, y, n_jobs=1, cache_dir=cache_dir, n_splits=n_splits)
+        return time.perf_counter() - start
+
+
+# -----------------------------------------------------------------------------
+# 3. SUITE
+# -----------------------------------------------------------------------------
+def _metric(value, unit, better):
+    return {'value': value, 'unit': unit, 'better': better}
+
+
+def run_suite(batch_sizes=BATCH_SIZES, cv_models=CV_MODELS, cv_rows=None,
+              cold_runs=5, features=None, log=None):
+    """
+    Run every benchmark and return {'environment': ..., 'metrics': ...}.
+    """
+    from src.artifact import save_artifact
+    from src.utils import SELECTED_FEATURES
+
+    features = list(features or SELECTED_FEATURES)
+    log = log or (lambda message: None)
+    metrics = {}
+
+    log(f"Training the reference {REFERENCE_MODEL} model")
+    artifact = reference_artifact(features)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = save_artifact(artifact, os.path.join(tmp, 'artifact.joblib'))
+        log("Cold start")
+        cold = cold_start(path, cold_runs)
+    metrics['cold_start.import_s'] = _metric(cold['import_s'], 's', 'lower')
+    metrics['cold_start.load_s'] = _metric(cold['load_s'], 's', 'lower')
+    if cold['rss_mb'] is not None:
+        metrics['cold_start.rss_mb'] = _metric(cold['rss_mb'], 'MB', 'lower')
+
+    frame = synthetic_dataset(max(batch_sizes), seed=SEED + 1)
+    log("Single-row latency")
+    latency = single_row_latency(artifact, frame)
+    metrics['predict_1row.p50_ms'] = _metric(latency['p50_ms'], 'ms', 'lower')
+    metrics['predict_1row.p99_ms'] = _metric(latency['p99_ms'], 'ms', 'lower')
+    for size in batch_sizes:
+        log(f"Batch throughput, {size:,} rows")
+        metrics[f'predict_batch_{size}.rows_per_s'] = _metric(
+            batch_throughput(artifact, frame, size), 'rows/s', 'higher')
+    del frame
+
+    cv_frame = synthetic_dataset(cv_rows or len(pd.read_csv(RAW_CSV)), seed=SEED + 2)
+    for key in cv_models:
+        log(f"CV training, {key}")
+        seconds = cv_training_time(key, cv_frame, FEATURES)
+        if seconds is None:
+            log(f"  skipped: library for {key} not installed")
+            continue
+        metrics[f'cv_train.{key}_s'] = _metric(seconds, 's', 'lower')
+
+    peak = _rss_mb()
+    if peak is not None:
+        metrics['peak_rss_mb'] = _metric(peak, 'MB', 'lower')
+    return {'environment': environment(), 'metrics': metrics}
+
+
+def environment():
+    import sklearn
+
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'sklearn': sklearn.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    Metrics that got worse than the baseline by more than `threshold`
+    (a fraction). Metrics missing from either side are ignored.
+    """
+    regressions = []
+    for name, current in results['metrics'].items():
+        reference = baseline.get('metrics', {}).get(name)
+        if not reference or not reference['value']:
+            continue
+        change = current['value'] / reference['value'] - 1.0
+        worse = change > threshold if current['better'] == 'lower' else change < -threshold
+        if worse:
+            regressions.append({'metric': name, 'baseline': reference['value'],
+                                'current': current['value'], 'change': change})
+    return regressions
+
+
+def _write_json(payload, path):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(payload, f, indent=2)
+    os.replace(tmp_path, path)
+    return path
+
+
+# -----------------------------------------------------------------------------
+# 4. CLI
+# -----------------------------------------------------------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the inference and training benchmarks.")
+    parser.add_argument('--quick', action='store_true',
+                        help="Small batches, fast models only and fewer cold starts")
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=None)
+    parser.add_argument('--cv-models', nargs='+', default=None, choices=CV_MODELS)
+    parser.add_argument('--cv-rows', type=int, default=None,
+                        help="Synthetic rows used for CV training (default: size of the CSV)")
+    parser.add_argument('--output', default=RESULTS_FILE, help="Where to write the results JSON")
+    parser.add_argument('--baseline', default=BASELINE_FILE)
+    parser.add_argument('--save-baseline', action='store_true',
+                        help="Store this run as the baseline instead of comparing")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="Allowed relative slowdown before a metric counts as a regression")
+    args = parser.parse_args(argv)
+
+    def log(message):
+        print(message, file=sys.stderr)
+
+    if args.quick:
+        batch_sizes = args.batch_sizes or QUICK_BATCH_SIZES
+        cv_models = args.cv_models or ('LR', 'DTC')
+        cold_runs = 3
+    else:
+        batch_sizes = args.batch_sizes or BATCH_SIZES
+        cv_models = args.cv_models or CV_MODELS
+        cold_runs = 5
+
+    results = run_suite(batch_sizes, cv_models, args.cv_rows, cold_runs, log=log)
+    _write_json(results, args.output)
+
+    print(f"{'metric':<36} {'value':>14}")
+    for name, metric in results['metrics'].items():
+        print(f"{name:<36} {metric['value']:>14,.4f} {metric['unit']}")
+    print(f"Results -> {args.output}")
+
+    if args.save_baseline:
+        _write_json(results, args.baseline)
+        print(f"Baseline -> {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one")
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args.threshold)
+    for r in regressions:
+        print(f"REGRESSION {r['metric']}: {r['baseline']:,.4f} -> {r['current']:,.4f} "
+              f"({r['change']:+.0%})")
+    if regressions:
+        return 1
+    print(f"No regressions beyond {args.threshold:.0%} against {args.baseline}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,219 @@
+"""
+Columnar binary cache for the crop CSVs.
+
+The first load of a CSV parses it once in chunks and writes one raw float32
+file per feature column, a uint8 class-code column and a small JSON header
+holding the class dictionary. Later loads memory-map those files directly,
+skipping CSV parsing and label encoding altogether.
+
+Cache entries are named after the SHA-256 of the source file's contents, so
+an edited CSV gets a fresh entry and a stale one is never read.
+
+Usage:
+    python -m src.dataset build data/Crop_recommendation_cleaned.csv
+    python -m src.dataset info data/Crop_recommendation_cleaned.csv
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.utils import FEATURES, PROJECT_ROOT, TARGET, normalize_columns
+
+CACHE_DIR = os.path.join(PROJECT_ROOT, '.cache', 'datasets')
+CACHE_VERSION = 1
+HEADER_FILE = 'dataset.json'
+PARSE_CHUNKSIZE = 500_000
+_HASH_BLOCK = 1 << 20
+
+
+# -----------------------------------------------------------------------------
+# 1. DATASET
+# -----------------------------------------------------------------------------
+class Dataset:
+    """
+    Memory-mapped feature columns, class codes and the class dictionary.
+
+    `classes` is sorted, so `codes` match what LabelEncoder / np.unique
+    would produce on the same labels.
+    """
+
+    def __init__(self, columns, codes, classes, source_hash):
+        self.columns = columns
+        self.codes = codes
+        self.classes = np.asarray(classes)
+        self.source_hash = source_hash
+
+    @property
+    def features(self):
+        return list(self.columns)
+
+    @property
+    def n_rows(self):
+        return len(self.codes)
+
+    def matrix(self, features=None, dtype=np.float32):
+        """
+        Row-major (n_rows, n_features) copy of the requested columns.
+        """
+        features = self.features if features is None else list(features)
+        missing = [f for f in features if f not in self.columns]
+        if missing:
+            raise KeyError(f"Columns not in the dataset: {missing}")
+        out = np.empty((self.n_rows, len(features)), dtype=dtype)
+        for j, f in enumerate(features):
+            out[:, j] = self.columns[f]
+        return out
+
+    def frame(self, features=None, dtype=np.float32):
+        features = self.features if features is None else list(features)
+        return pd.DataFrame(self.matrix(features, dtype), columns=features)
+
+    def labels(self):
+        return self.classes.take(self.codes)
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(_HASH_BLOCK), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# -----------------------------------------------------------------------------
+# 2. BUILD / LOAD
+# -----------------------------------------------------------------------------
+def _entry_dir(csv_path, source_hash, cache_dir):
+    name = os.path.splitext(os.path.basename(csv_path))[0]
+    return os.path.join(cache_dir, f"{name}-{source_hash[:16]}")
+
+
+def build_cache(csv_path, entry_dir, source_hash, features=FEATURES, chunksize=PARSE_CHUNKSIZE):
+    """
+    Parse the CSV once, streaming each chunk's columns to raw binary files.
+    """
+    tmp_dir = f"{entry_dir}.{os.getpid()}.tmp"
+    os.makedirs(tmp_dir, exist_ok=True)
+    outputs = {f: open(os.path.join(tmp_dir, f"{f}.f32"), 'wb') for f in features}
+    codes_file = open(os.path.join(tmp_dir, 'codes.u8'), 'wb')
+    seen = {}  # label -> provisional code, in order of first appearance
+    n_rows = 0
+    try:
+        for chunk in pd.read_csv(csv_path, chunksize=chunksize):
+            chunk = normalize_columns(chunk)
+            for f in features:
+                outputs[f].write(chunk[f].to_numpy(dtype=np.float32).tobytes())
+            uniques, inverse = np.unique(chunk[TARGET].to_numpy(), return_inverse=True)
+            lookup = np.array([seen.setdefault(label, len(seen)) for label in uniques])
+            if len(seen) > 256:
+                raise ValueError(f"{csv_path} has more than 256 classes; codes are stored as uint8")
+            codes_file.write(lookup[inverse].astype(np.uint8).tobytes())
+            n_rows += len(chunk)
+    finally:
+        for handle in (*outputs.values(), codes_file):
+            handle.close()
+
+    # Renumber the codes so classes come out sorted, as LabelEncoder does
+    classes = sorted(seen)
+    remap = np.empty(len(seen), dtype=np.uint8)
+    remap[[seen[label] for label in classes]] = np.arange(len(classes))
+    if n_rows:
+        codes = np.memmap(os.path.join(tmp_dir, 'codes.u8'), dtype=np.uint8, mode='r+')
+        codes[:] = remap[codes]
+        codes.flush()
+        del codes
+
+    header = {'version': CACHE_VERSION, 'source': os.path.abspath(csv_path),
+              'source_hash': source_hash, 'n_rows': n_rows, 'features': list(features),
+              'classes': [str(label) for label in classes]}
+    with open(os.path.join(tmp_dir, HEADER_FILE), 'w') as f:
+        json.dump(header, f, indent=2)
+    try:
+        os.replace(tmp_dir, entry_dir)
+    except OSError:
+        # Another process finished the same entry first
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    return entry_dir
+
+
+def _open_entry(entry_dir):
+    with open(os.path.join(entry_dir, HEADER_FILE)) as f:
+        header = json.load(f)
+    if header.get('version') != CACHE_VERSION:
+        return None
+
+    def column(name, dtype):
+        path = os.path.join(entry_dir, name)
+        if header['n_rows'] == 0:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(path, dtype=dtype, mode='r', shape=(header['n_rows'],))
+
+    columns = {f: column(f"{f}.f32", np.float32) for f in header['features']}
+    return Dataset(columns, column('codes.u8', np.uint8), header['classes'], header['source_hash'])
+
+
+def load_dataset(csv_path, features=FEATURES, cache_dir=CACHE_DIR, log=None):
+    """
+    Dataset for `csv_path`, built on first use and memory-mapped afterwards.
+    """
+    source_hash = file_hash(csv_path)
+    entry_dir = _entry_dir(csv_path, source_hash, cache_dir)
+    dataset = None
+    if os.path.exists(os.path.join(entry_dir, HEADER_FILE)):
+        dataset = _open_entry(entry_dir)
+        if dataset is not None and not set(features) <= set(dataset.columns):
+            dataset = None
+        if dataset is None:
+            shutil.rmtree(entry_dir, ignore_errors=True)
+    if dataset is None:
+        if log:
+            log(f"Building dataset cache for {csv_path}")
+        os.makedirs(cache_dir, exist_ok=True)
+        dataset = _open_entry(build_cache(csv_path, entry_dir, source_hash, features))
+    return dataset
+
+
+# -----------------------------------------------------------------------------
+# 3. CLI
+# -----------------------------------------------------------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or inspect the columnar dataset cache.")
+    sub = parser.add_subparsers(dest='command', required=True)
+    for name, help_text in (('build', "Build the cache and compare load times with read_csv"),
+                            ('info', "Show the cache entry for a CSV")):
+        cmd = sub.add_parser(name, help=help_text)
+        cmd.add_argument('csv', nargs='+')
+        cmd.add_argument('--cache-dir', default=CACHE_DIR)
+    args = parser.parse_args(argv)
+
+    for csv_path in args.csv:
+        if not os.path.exists(csv_path):
+            parser.error(f"Input file not found: {csv_path}")
+        dataset = load_dataset(csv_path, cache_dir=args.cache_dir)
+        entry = _entry_dir(csv_path, dataset.source_hash, args.cache_dir)
+        print(f"{csv_path}: {dataset.n_rows:,} rows, {len(dataset.features)} features, "
+              f"{len(dataset.classes)} classes -> {entry}")
+        if args.command == 'build':
+            start = time.perf_counter()
+            df = normalize_columns(pd.read_csv(csv_path))
+            np.unique(df[TARGET].to_numpy(), return_inverse=True)
+            df[FEATURES].to_numpy(dtype=np.float32)
+            parse_s = time.perf_counter() - start
+            start = time.perf_counter()
+            cached = load_dataset(csv_path, cache_dir=args.cache_dir)
+            cached.matrix()
+            cache_s = time.perf_counter() - start
+            print(f"  read_csv + encode: {parse_s:.3f}s, cached load: {cache_s:.3f}s "
+                  f"(including the source hash)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
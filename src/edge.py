@@ -0,0 +1,531 @@
+"""
+Compact, quantized model export for low-memory edge devices.
+
+A pickled forest needs sklearn (and its SciPy/joblib stack) just to be
+unpickled. The edge format is a single `.npz` file of small integer arrays
+that loads with `numpy.load(allow_pickle=False)` and predicts with NumPy
+alone:
+
+* Trees: the scaler is folded into the thresholds first (see `src.folding`),
+  so the device feeds raw readings. Every feature keeps a sorted codebook of
+  its split values (float64 at 16 bits, float32 at 8) and each node stores
+  the index of its threshold in that codebook (uint8 or uint16). A reading is turned into its
+  rank in the codebook once per row, and the split test `x <= cut[k]` becomes
+  the integer test `rank <= k`. Feature ids are uint8, child indices are
+  int16 within their tree and leaves hold uint8 class distributions (or just a
+  uint8 class id).
+* Logistic Regression: scaler-folded coefficients as float32, or int8 with
+  one scale per feature.
+
+`--bits 16` (the default) keeps every distinct raw threshold exactly, so
+every reading takes the same branches as in sklearn and predictions only
+differ where a leaf distribution rounds differently. `--bits 8` caps each
+codebook at 255 float32 values and stores int8 coefficients. `--leaves class`
+keeps one class id per leaf instead of its distribution, so the forest
+votes; that is the smallest file but shallow, impure forests lose accuracy.
+`report` shows what each option costs.
+
+The loader half of this module (sections 1-2) imports nothing but NumPy:
+copy `src/edge.py` onto the device and call `load_edge`.
+
+Usage:
+    python -m src.edge export                 # saved_models/crop_recommendation.edge.npz
+    python -m src.edge export --bits 8 --leaves class
+    python -m src.edge report                 # size, memory and accuracy vs the notebook models
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+
+EDGE_FILE = 'crop_recommendation.edge.npz'
+EDGE_FORMAT = 'crop-recommendation-edge'
+FORMAT_VERSION = 1
+
+# Rows x trees walked together, as in `src.compiled`
+BLOCK_NODES = 1 << 16
+LEAF_SCALE = 255
+LEAF_MODES = ('proba', 'class')
+REPORT_MODELS = ('LR', 'DTC', 'RFC', 'RFCT', 'RTRFC')
+# (bits, leaves) exported for every model in the report
+REPORT_VARIANTS = ((16, 'proba'), (8, 'proba'), (8, 'class'))
+
+
+# -----------------------------------------------------------------------------
+# 1. EDGE PREDICTORS (NumPy only)
+# -----------------------------------------------------------------------------
+class EdgeModel:
+    """
+    Shared input handling and ranking for the edge predictors.
+    """
+
+    kind = None
+
+    def __init__(self, features, classes):
+        self.features = [str(name) for name in features]
+        self.classes = np.asarray(classes)
+
+    @property
+    def n_features(self):
+        return len(self.features)
+
+    def _prepare(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X[np.newaxis, :]
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"Expected input of shape (n, {self.n_features}), got {X.shape}")
+        if np.isnan(X).any():
+            raise ValueError("Edge models do not accept missing values")
+        return X
+
+    def predict(self, X):
+        return self.classes.take(np.argmax(self.predict_proba(X), axis=1))
+
+    def recommend(self, readings, k=3):
+        """
+        Top-`k` (crop, probability) pairs for one dict of raw readings.
+        """
+        missing = [f for f in self.features if f not in readings]
+        if missing:
+            raise ValueError(f"The model also needs: {', '.join(missing)}")
+        proba = self.predict_proba([[float(readings[f]) for f in self.features]])[0]
+        best = np.argsort(-proba, kind='stable')[:k]
+        return [(str(self.classes[i]), float(proba[i])) for i in best]
+
+    @property
+    def nbytes(self):
+        """
+        Memory held by the loaded model's arrays, including derived ones.
+        """
+        return sum(value.nbytes for value in vars(self).values() if isinstance(value, np.ndarray)) \
+            + sum(cut.nbytes for cut in getattr(self, '_cuts', ()))
+
+
+class EdgeForest(EdgeModel):
+    """
+    Quantized tree ensemble. Node `i` of a tree tests
+    `rank(x[feature[i]]) > threshold[i]`; its children are `child[i]` and
+    `child[i] + 1` (indices local to the tree). Leaves point to themselves
+    and carry the largest threshold index, so walking past them is a no-op.
+    """
+
+    kind = 'forest'
+
+    def __init__(self, features, classes, cuts, cut_offsets, feature, threshold, child,
+                 roots, max_depth, leaf_proba=None, leaf_class=None):
+        super().__init__(features, classes)
+        self.cut_offsets = cut_offsets
+        self.cuts = cuts
+        self.feature = feature
+        self.threshold = threshold
+        self.child = child
+        self.roots = np.asarray(roots, dtype=np.int32)
+        self.max_depth = int(max_depth)
+        self.leaf_proba = leaf_proba
+        self.leaf_class = leaf_class
+        # Per-feature codebooks in float64, so ranking a row does not upcast
+        self._cuts = [cuts[cut_offsets[f]:cut_offsets[f + 1]].astype(np.float64)
+                      for f in range(len(self.features))]
+        sizes = np.diff(np.append(self.roots, len(child)))
+        local = np.arange(len(child), dtype=np.int32) - np.repeat(self.roots, sizes)
+        self.leaf_row = (np.cumsum(child == local, dtype=np.int32) - 1).astype(np.int32)
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    def ranks(self, X):
+        """
+        Rank of every reading in its feature's codebook, shape (n_rows, n_features).
+        """
+        X = self._prepare(X)
+        ranks = np.empty(X.shape, dtype=np.int32)
+        for f, cuts in enumerate(self._cuts):
+            ranks[:, f] = np.searchsorted(cuts, X[:, f], side='left')
+        return ranks
+
+    def apply(self, X):
+        """
+        Leaf row reached in every tree, shape (n_rows, n_trees).
+        """
+        ranks = self.ranks(X)
+        flat = ranks.ravel()
+        offsets = (np.arange(len(ranks), dtype=np.int32) * self.n_features)[:, np.newaxis]
+        nodes = np.repeat(self.roots[np.newaxis, :], len(ranks), axis=0)
+        for _ in range(self.max_depth):
+            go_right = flat.take(offsets + self.feature.take(nodes)) > self.threshold.take(nodes)
+            nodes = self.roots + self.child.take(nodes) + go_right
+        return self.leaf_row.take(nodes)
+
+    def predict_proba(self, X):
+        X = self._prepare(X)
+        n_classes = len(self.classes)
+        out = np.zeros((len(X), n_classes), dtype=np.float64)
+        block = max(1, BLOCK_NODES // self.n_trees)
+        for start in range(0, len(X), block):
+            leaves = self.apply(X[start:start + block])
+            if self.leaf_proba is not None:
+                counts = np.zeros((len(leaves), n_classes), dtype=np.int32)
+                for t in range(self.n_trees):
+                    counts += self.leaf_proba.take(leaves[:, t], axis=0)
+            else:
+                rows = np.arange(len(leaves))[:, np.newaxis] * n_classes
+                counts = np.bincount((rows + self.leaf_class.take(leaves)).ravel(),
+                                     minlength=len(leaves) * n_classes).reshape(-1, n_classes)
+            out[start:start + block] = counts
+        return out / np.maximum(out.sum(axis=1, keepdims=True), 1.0)
+
+
+class EdgeLinear(EdgeModel):
+    """
+    Logistic Regression on raw readings. `coef` is float32, or int8 with one
+    scale per feature in `coef_scale`.
+    """
+
+    kind = 'linear'
+
+    def __init__(self, features, classes, coef, intercept, ovr, coef_scale=None):
+        super().__init__(features, classes)
+        self.coef = coef
+        self.coef_scale = coef_scale
+        self.intercept = np.asarray(intercept, dtype=np.float32)
+        self.ovr = bool(ovr)
+        weights = coef.astype(np.float32)
+        if coef_scale is not None:
+            weights *= coef_scale
+        self._weights = np.ascontiguousarray(weights.T)
+
+    def predict_proba(self, X):
+        scores = self._prepare(X) @ self._weights + self.intercept
+        if self.ovr:
+            proba = 1.0 / (1.0 + np.exp(-scores))
+            return proba / proba.sum(axis=1, keepdims=True)
+        scores -= scores.max(axis=1, keepdims=True)
+        np.exp(scores, out=scores)
+        return scores / scores.sum(axis=1, keepdims=True)
+
+
+# -----------------------------------------------------------------------------
+# 2. FILE FORMAT
+# -----------------------------------------------------------------------------
+_KINDS = {'forest': EdgeForest, 'linear': EdgeLinear}
+
+
+def from_arrays(arrays):
+    """
+    Build the predictor from the arrays of an edge file.
+    """
+    arrays = dict(arrays)
+    if str(arrays.pop('format', '')) != EDGE_FORMAT:
+        raise ValueError("Not a crop recommendation edge model")
+    version = int(arrays.pop('format_version', -1))
+    if version != FORMAT_VERSION:
+        raise ValueError(f"Unsupported edge format version {version} (expected {FORMAT_VERSION})")
+    kind = str(arrays.pop('kind'))
+    arrays.pop('model', None)
+    return _KINDS[kind](**arrays)
+
+
+def load_edge(path):
+    """
+    Load an edge model without pickle, sklearn or pandas.
+    """
+    with np.load(path, allow_pickle=False) as data:
+        return from_arrays({key: data[key] for key in data.files})
+
+
+def save_edge(arrays, path):
+    """
+    Write the arrays compressed, atomically (temp file + rename).
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as handle:
+        np.savez_compressed(handle, **arrays)
+    os.replace(tmp_path, path)
+    return path
+
+
+# -----------------------------------------------------------------------------
+# 3. EXPORT
+# -----------------------------------------------------------------------------
+def _index_dtype(max_value, dtypes):
+    for dtype in dtypes:
+        if max_value <= np.iinfo(dtype).max:
+            return dtype
+    raise ValueError(f"{max_value} does not fit in {np.dtype(dtypes[-1]).name}")
+
+
+def _float32_floor(values):
+    """
+    Round to float32 without going above `values`, so `x <= cut` never
+    turns true for a reading that failed the original test.
+    """
+    rounded = values.astype(np.float32)
+    above = rounded.astype(np.float64) > values
+    rounded[above] = np.nextafter(rounded[above], np.float32(-np.inf))
+    return rounded
+
+
+def _codebook(values, max_size, exact=False):
+    """
+    Sorted cut values for one feature and the index of each value in it:
+    the float64 thresholds themselves with `exact`, else float32 ones.
+    Beyond `max_size` distinct values, cuts are placed at quantiles of the
+    thresholds and each threshold snaps to the nearest cut.
+    """
+    snap = np.asarray if exact else _float32_floor
+    snapped = snap(values)
+    cuts = np.unique(snapped)
+    if len(cuts) <= max_size:
+        return cuts, np.searchsorted(cuts, snapped)
+    cuts = np.unique(snap(np.quantile(values, np.linspace(0, 1, max_size), method='nearest')))
+    upper = np.clip(np.searchsorted(cuts, snapped), 1, len(cuts) - 1)
+    closer_below = snapped - cuts[upper - 1] <= cuts[upper] - snapped
+    return cuts, np.where(closer_below, upper - 1, upper)
+
+
+def _export_forest(compiled, bits, leaves):
+    n_nodes = len(compiled.child)
+    sizes = np.diff(np.append(compiled.roots, n_nodes))
+    local = np.arange(n_nodes) - np.repeat(compiled.roots, sizes)
+    is_leaf = compiled.child == np.arange(n_nodes)
+    n_features = compiled.n_features
+
+    index_dtype = np.uint8 if bits == 8 else np.uint16
+    max_cuts = int(np.iinfo(index_dtype).max)  # the max value itself marks leaves
+    threshold = np.full(n_nodes, max_cuts, dtype=index_dtype)
+    cuts, cut_offsets = [], [0]
+    for f in range(n_features):
+        nodes = np.flatnonzero(~is_leaf & (compiled.feature == f))
+        feature_cuts, index = _codebook(compiled.threshold[nodes], max_cuts, exact=bits == 16) \
+            if len(nodes) else (np.zeros(0), np.zeros(0, dtype=np.intp))
+        threshold[nodes] = index
+        cuts.append(feature_cuts)
+        cut_offsets.append(cut_offsets[-1] + len(feature_cuts))
+
+    arrays = {
+        # A float32 cut can sit up to one float32 step below the raw threshold
+        'cuts': np.concatenate(cuts).astype(np.float64 if bits == 16 else np.float32),
+        'cut_offsets': np.asarray(cut_offsets, dtype=np.int32),
+        'feature': np.where(is_leaf, 0, compiled.feature).astype(_index_dtype(n_features, (np.uint8, np.uint16))),
+        'threshold': threshold,
+        'child': (compiled.child - np.repeat(compiled.roots, sizes)).astype(
+            _index_dtype(int(local.max()), (np.int16, np.int32))),
+        'roots': np.asarray(compiled.roots, dtype=np.int32),
+        'max_depth': np.int32(compiled.max_depth),
+    }
+    leaf_proba = compiled.leaf_proba[is_leaf]
+    if leaves == 'class':
+        arrays['leaf_class'] = np.argmax(leaf_proba, axis=1).astype(
+            _index_dtype(leaf_proba.shape[1], (np.uint8, np.uint16)))
+    else:
+        arrays['leaf_proba'] = np.rint(leaf_proba * LEAF_SCALE).astype(np.uint8)
+    return arrays
+
+
+def _export_linear(folded, bits):
+    coef = np.asarray(folded.coef, dtype=np.float64)
+    arrays = {'intercept': np.asarray(folded.intercept, dtype=np.float32), 'ovr': np.bool_(folded.ovr)}
+    if bits == 8:
+        scale = np.abs(coef).max(axis=0) / 127.0
+        scale[scale == 0.0] = 1.0
+        arrays['coef'] = np.rint(coef / scale).astype(np.int8)
+        arrays['coef_scale'] = scale.astype(np.float32)
+    else:
+        arrays['coef'] = coef.astype(np.float32)
+    return arrays
+
+
+def export_arrays(artifact, bits=16, leaves='proba'):
+    """
+    Edge file contents for a `ModelArtifact` holding a tree model or a
+    Logistic Regression. The scaler is folded in, so the device takes raw
+    readings in `artifact.features` order.
+    """
+    from src.folding import fold_scaler
+
+    if bits not in (8, 16):
+        raise ValueError("bits must be 8 or 16")
+    if leaves not in LEAF_MODES:
+        raise ValueError(f"leaves must be one of {', '.join(LEAF_MODES)}")
+    folded = artifact.compiled
+    if folded is None or not folded.raw_input:
+        if not (hasattr(artifact.model, 'coef_') or hasattr(artifact.model, 'tree_')
+                or hasattr(artifact.model, 'estimators_')):
+            raise TypeError(f"Cannot export {type(artifact.model).__name__}; "
+                            "only tree models and Logistic Regression are supported")
+        folded = fold_scaler(artifact.model, artifact.scaler)
+    if folded.kind == 'forest':
+        arrays = _export_forest(folded, bits, leaves)
+    else:
+        arrays = _export_linear(folded, bits)
+
+    arrays.update({
+        'format': np.str_(EDGE_FORMAT),
+        'format_version': np.int32(FORMAT_VERSION),
+        'kind': np.str_(folded.kind),
+        'model': np.str_(type(artifact.model).__name__),
+        'features': np.asarray(artifact.features, dtype=str),
+        'classes': np.asarray(artifact.classes.take(np.asarray(folded.classes, dtype=np.intp)), dtype=str),
+    })
+    return arrays
+
+
+# -----------------------------------------------------------------------------
+# 4. REPORT
+# -----------------------------------------------------------------------------
+_COLD_START = """
+import json, sys
+import numpy as np
+if sys.argv[1] == 'edge':
+    from src.edge import load_edge
+    model = load_edge(sys.argv[2])
+    model.predict(np.zeros((1, model.n_features)))
+else:
+    from src.artifact import load_artifact
+    artifact = load_artifact(sys.argv[2])
+    artifact.predict_ids(np.zeros((1, len(artifact.features))))
+rss = None
+try:
+    # Peak RSS of this process image; ru_maxrss would include the parent's before exec
+    with open('/proc/self/status') as status:
+        rss = next(int(line.split()[1]) for line in status if line.startswith('VmHWM')) / 1024
+except OSError:
+    pass
+print(json.dumps({'rss_mb': rss, 'sklearn': 'sklearn' in sys.modules}))
+"""
+
+
+def cold_start(kind, path):
+    """
+    Peak RSS of a fresh interpreter that loads the file and predicts one row.
+    """
+    import json
+    import subprocess
+
+    from src.utils import PROJECT_ROOT
+
+    out = subprocess.run([sys.executable, '-c', _COLD_START, kind, path], cwd=PROJECT_ROOT,
+                         capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def compare(artifact, X_test, y_test, directory, name, variants=REPORT_VARIANTS):
+    """
+    Size, memory and test accuracy of `artifact` against its edge exports.
+    `X_test` is a DataFrame of raw readings, `y_test` the class names.
+    """
+    from src.artifact import save_artifact
+
+    sk_path = save_artifact(artifact, os.path.join(directory, f"{name}.joblib"))
+    X_test = artifact.to_matrix(X_test)
+    reference = artifact.decode(np.asarray(artifact.model.predict(artifact.scaler.transform(X_test)),
+                                           dtype=np.intp))
+    rows = [{'model': name, 'format': 'sklearn', 'file_kb': os.path.getsize(sk_path) / 1024,
+             'memory_kb': None, 'accuracy': float(np.mean(reference == y_test)), 'agreement': 1.0,
+             **cold_start('sklearn', sk_path)}]
+    for bits, leaves in variants:
+        label = f"edge-{bits}" + ('-votes' if leaves == 'class' else '')
+        path = save_edge(export_arrays(artifact, bits, leaves), os.path.join(directory, f"{name}-{label}.npz"))
+        edge = load_edge(path)
+        predicted = edge.predict(X_test.to_numpy(dtype=np.float64))
+        rows.append({'model': name, 'format': label, 'file_kb': os.path.getsize(path) / 1024,
+                     'memory_kb': edge.nbytes / 1024, 'accuracy': float(np.mean(predicted == y_test)),
+                     'agreement': float(np.mean(predicted == reference)), **cold_start('edge', path)})
+    return rows
+
+
+def notebook_report(model_keys=REPORT_MODELS, features=None, log=print):
+    """
+    Train each tuned notebook model on the standard split (`src.train`) and
+    compare it with its edge exports on the held-out rows.
+    """
+    import tempfile
+
+    from src.artifact import ModelArtifact
+    from src.models import BASELINES, make_estimator
+    from src.train import prepare_data
+    from src.utils import SELECTED_FEATURES
+
+    import pandas as pd
+
+    data = prepare_data(features=features or SELECTED_FEATURES)
+    X_test = pd.DataFrame(data['scaler'].inverse_transform(data['X_test']), columns=data['features'])
+    y_test = data['classes'].take(data['y_test'])
+    rows = []
+    with tempfile.TemporaryDirectory() as directory:
+        for key in model_keys:
+            name, params = BASELINES[key]
+            model = make_estimator(name, params).fit(data['X_train'], data['y_train'])
+            artifact = ModelArtifact(model, data['scaler'], data['classes'], data['features'])
+            rows.extend(compare(artifact, X_test, y_test, directory, key))
+            if log:
+                log(f"  {key} done")
+    return rows
+
+
+def format_report(rows):
+    lines = [f"{'model':<7}{'format':<14}{'file KB':>9}{'arrays KB':>11}{'RSS MB':>8}"
+             f"{'sklearn':>9}{'accuracy':>10}{'agree':>8}"]
+    for r in rows:
+        memory = f"{r['memory_kb']:.1f}" if r['memory_kb'] is not None else '-'
+        rss = f"{r['rss_mb']:.1f}" if r['rss_mb'] is not None else '-'
+        lines.append(f"{r['model']:<7}{r['format']:<14}{r['file_kb']:>9.1f}{memory:>11}{rss:>8}"
+                     f"{'yes' if r['sklearn'] else 'no':>9}{r['accuracy']:>10.4f}{r['agreement']:>8.4f}")
+    return '\n'.join(lines)
+
+
+# -----------------------------------------------------------------------------
+# 5. CLI
+# -----------------------------------------------------------------------------
+def main(argv=None):
+    from src.utils import FEATURES, SAVED_MODELS_DIR, SELECTED_FEATURES
+
+    parser = argparse.ArgumentParser(description="Export the model for NumPy-only edge devices.")
+    sub = parser.add_subparsers(dest='command', required=True)
+    export = sub.add_parser('export', help="Write the deployed model as a quantized .npz")
+    export.add_argument('--models', default=SAVED_MODELS_DIR)
+    export.add_argument('--output', default=None, help=f"Edge file (default: <models>/{EDGE_FILE})")
+    export.add_argument('--bits', type=int, choices=(8, 16), default=16,
+                        help="16: every threshold, uint8 leaf distributions; "
+                             "8: at most 255 cuts per feature, int8 coefficients")
+    export.add_argument('--leaves', choices=LEAF_MODES, default='proba',
+                        help="Per leaf: uint8 class distribution, or one class id (forest votes)")
+    report = sub.add_parser('report', help="Compare the notebook's tuned models with their edge exports")
+    report.add_argument('--candidates', nargs='+', default=list(REPORT_MODELS))
+    report.add_argument('--features', choices=('selected', 'full'), default='selected')
+    report.add_argument('--output', default=None, help="Also write the rows as JSON")
+    args = parser.parse_args(argv)
+
+    if args.command == 'export':
+        from src.artifact import load_default
+
+        artifact = load_default(args.models)
+        try:
+            arrays = export_arrays(artifact, args.bits, args.leaves)
+        except TypeError as exc:
+            parser.error(str(exc))
+        output = save_edge(arrays, args.output or os.path.join(args.models, EDGE_FILE))
+        edge = load_edge(output)
+        print(f"Exported {arrays['model']} ({edge.kind}, {args.bits}-bit) -> {output}: "
+              f"{os.path.getsize(output) / 1024:.1f} KB on disk, {edge.nbytes / 1024:.1f} KB loaded")
+        return 0
+
+    unknown = [key for key in args.candidates if key not in REPORT_MODELS]
+    if unknown:
+        parser.error(f"Cannot export {', '.join(unknown)}; choose from {', '.join(REPORT_MODELS)}")
+    rows = notebook_report(args.candidates, SELECTED_FEATURES if args.features == 'selected' else FEATURES)
+    print(format_report(rows))
+    if args.output:
+        import json
+
+        with open(args.output, 'w') as handle:
+            json.dump(rows, handle, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,387 @@
+"""
+Deterministic, cached evaluation report for the notebook models.
+
+The training notebook recomputes MAE, accuracy, precision, recall, F1 and
+the confusion matrix cell by cell, calling `predict` on the same fitted
+model several times, and every figure in `reports/figures/` is redrawn by
+hand. Here:
+
+* Each model is fitted once on the standard split (`src.train.prepare_data`)
+  and predicts the train and test rows once. The predictions are cached in
+  `.cache/evaluation/`, keyed by the split data, the model name and its
+  parameters.
+* All metrics are computed from the stacked prediction arrays in one
+  vectorized pass: one bincount gives every model's confusion matrix, and
+  precision, recall and F1 follow from its rows, columns and diagonal.
+* Every table and figure records a digest of its inputs in
+  `manifest.json`. Only outputs whose inputs changed are written again, so
+  adding one model fits and draws only that model, plus the two comparison
+  charts and the summary table.
+
+Figures need matplotlib; without it only the tables are written.
+
+Usage:
+    python -m src.evaluation                              # all notebook models -> reports/evaluation/
+    python -m src.evaluation --candidates LR DTC RTRFC --features selected
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.models import BASELINES, make_estimator
+from src.preprocessing import CLEANED_CSV
+from src.train import FEATURE_SETS, candidate_key, data_hash, prepare_data
+from src.utils import PROJECT_ROOT
+
+CACHE_DIR = os.path.join(PROJECT_ROOT, '.cache', 'evaluation')
+REPORT_DIR = os.path.join(PROJECT_ROOT, 'reports', 'evaluation')
+MANIFEST_FILE = 'manifest.json'
+# Bump when a table or figure changes, so every output is redrawn once
+RENDER_VERSION = 1
+
+# Rows of the notebook's final metrics table
+METRICS = ('Precision', 'Recall', 'F1-score', 'Mean Absolute Error training',
+           'Mean Absolute Error test', 'Train Accuracy', 'Test Accuracy')
+ERROR_METRICS = ('Mean Absolute Error training', 'Mean Absolute Error test')
+
+
+# -----------------------------------------------------------------------------
+# 1. CACHED PREDICTIONS
+# -----------------------------------------------------------------------------
+def split_digest(data):
+    """
+    Hash of the train and test arrays; changes with the data, the features
+    or the split.
+    """
+    parts = (data_hash(data['X_train'], data['y_train']), data_hash(data['X_test'], data['y_test']))
+    return hashlib.sha256('|'.join(parts).encode()).hexdigest()
+
+
+class PredictionCache:
+    """
+    One small .npz per (split, model) with its train and test predictions.
+    """
+
+    def __init__(self, root, digest):
+        self.root = root
+        self.digest = digest
+
+    def key(self, name, params):
+        return hashlib.sha256(f"{self.digest}|{candidate_key(name, params)}".encode()).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.root, key[:2], f"{key}.npz")
+
+    def get(self, key):
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                return {name: data[name] for name in data.files}
+        except Exception:
+            return None  # half-written or corrupt entry: just refit
+
+    def put(self, key, arrays):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as handle:
+            np.savez(handle, **arrays)
+        os.replace(tmp_path, path)
+
+
+def feature_importance(model):
+    """
+    Impurity importances for tree models; for linear models the mean
+    absolute coefficient per feature, as in the notebook's LR chart.
+    """
+    if hasattr(model, 'feature_importances_'):
+        return np.asarray(model.feature_importances_, dtype=np.float64)
+    if hasattr(model, 'coef_'):
+        return np.abs(np.atleast_2d(model.coef_)).mean(axis=0)
+    return None
+
+
+def predict_models(candidates, data, cache, log=None):
+    """
+    Train/test predictions for every `label -> (name, params)` candidate,
+    fitting only those missing from the cache. Returns (predictions, fitted).
+    """
+    predictions, fitted = {}, 0
+    for label, (name, params) in candidates.items():
+        key = cache.key(name, params)
+        arrays = cache.get(key)
+        if arrays is None:
+            start = time.perf_counter()
+            model = make_estimator(name, params).fit(data['X_train'], data['y_train'])
+            arrays = {'train': np.asarray(model.predict(data['X_train']), dtype=np.int16),
+                      'test': np.asarray(model.predict(data['X_test']), dtype=np.int16)}
+            importance = feature_importance(model)
+            if importance is not None:
+                arrays['importance'] = importance
+            cache.put(key, arrays)
+            fitted += 1
+            if log:
+                log(f"  fitted {label} in {time.perf_counter() - start:.1f}s")
+        predictions[label] = {'key': key, **arrays}
+    return predictions, fitted
+
+
+# -----------------------------------------------------------------------------
+# 2. METRICS
+# -----------------------------------------------------------------------------
+def confusion_matrices(y_true, predicted, n_classes):
+    """
+    Confusion matrix of every row of `predicted` (n_models, n_rows) against
+    `y_true`, shape (n_models, n_classes, n_classes), rows = actual class.
+    """
+    models = np.arange(len(predicted))[:, np.newaxis]
+    cells = (models * n_classes + y_true[np.newaxis, :]) * n_classes + predicted
+    counts = np.bincount(cells.ravel(), minlength=len(predicted) * n_classes * n_classes)
+    return counts.reshape(len(predicted), n_classes, n_classes)
+
+
+def _ratio(numerator, denominator):
+    # sklearn's zero_division=0: an empty class scores 0
+    return np.divide(numerator, denominator, out=np.zeros(numerator.shape), where=denominator > 0)
+
+
+def evaluate(predictions, data):
+    """
+    All metrics for all models at once. Returns the summary table (one row
+    per model, columns `METRICS`), per-class tables and confusion matrices.
+    """
+    labels = list(predictions)
+    n_classes = len(data['classes'])
+    y_train, y_test = np.asarray(data['y_train']), np.asarray(data['y_test'])
+    train = np.stack([predictions[label]['train'] for label in labels]).astype(np.intp)
+    test = np.stack([predictions[label]['test'] for label in labels]).astype(np.intp)
+
+    matrices = confusion_matrices(y_test, test, n_classes)
+    correct = np.diagonal(matrices, axis1=1, axis2=2)
+    support = matrices.sum(axis=2)
+    precision = _ratio(correct, matrices.sum(axis=1))
+    recall = _ratio(correct, support)
+    f1 = _ratio(2 * precision * recall, precision + recall)
+
+    # MAE over the encoded class ids, as the notebook reports it
+    table = pd.DataFrame({
+        'Precision': precision.mean(axis=1),
+        'Recall': recall.mean(axis=1),
+        'F1-score': f1.mean(axis=1),
+        'Mean Absolute Error training': np.abs(train - y_train).mean(axis=1),
+        'Mean Absolute Error test': np.abs(test - y_test).mean(axis=1),
+        'Train Accuracy': (train == y_train).mean(axis=1),
+        'Test Accuracy': correct.sum(axis=1) / len(y_test),
+    }, index=pd.Index(labels, name='model'))
+    per_class = {
+        label: pd.DataFrame({'precision': precision[i], 'recall': recall[i], 'f1-score': f1[i],
+                             'support': support[i]}, index=pd.Index(data['classes'], name='crop'))
+        for i, label in enumerate(labels)
+    }
+    return table, per_class, dict(zip(labels, matrices))
+
+
+# -----------------------------------------------------------------------------
+# 3. INCREMENTAL OUTPUTS
+# -----------------------------------------------------------------------------
+def output_digest(*parts):
+    return hashlib.sha256(json.dumps([RENDER_VERSION, *parts], default=str).encode()).hexdigest()
+
+
+class ReportWriter:
+    """
+    Writes an output only when its digest differs from the one recorded in
+    the manifest (or the file is missing).
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.manifest_path = os.path.join(directory, MANIFEST_FILE)
+        try:
+            with open(self.manifest_path) as handle:
+                self.manifest = json.load(handle)
+        except (OSError, ValueError):
+            self.manifest = {}
+        self.written, self.unchanged = [], []
+
+    def render(self, name, digest, write):
+        path = os.path.join(self.directory, name)
+        if self.manifest.get(name) == digest and os.path.exists(path):
+            self.unchanged.append(name)
+            return path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        write(path)
+        self.manifest[name] = digest
+        self.written.append(name)
+        return path
+
+    def save_manifest(self):
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, 'w') as handle:
+            json.dump(self.manifest, handle, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.manifest_path)
+
+
+def _csv(frame):
+    return lambda path: frame.to_csv(path, float_format='%.4f', lineterminator='\n')
+
+
+def _pyplot():
+    try:
+        import matplotlib
+        matplotlib.use('Agg')
+        import matplotlib.pyplot as plt
+    except ImportError:
+        return None
+    return plt
+
+
+def _savefig(plt, fig, path):
+    # No software version in the PNG metadata, so unchanged inputs give identical bytes
+    fig.savefig(path, dpi=150, bbox_inches='tight', metadata={'Software': None})
+    plt.close(fig)
+
+
+def _confusion_figure(plt, matrix, classes, title):
+    def write(path):
+        fig, ax = plt.subplots(figsize=(10, 9))
+        ax.imshow(matrix, cmap='Blues')
+        threshold = matrix.max() / 2
+        for (i, j), count in np.ndenumerate(matrix):
+            if count:
+                ax.text(j, i, str(count), ha='center', va='center', fontsize=7,
+                        color='white' if count > threshold else 'black')
+        ax.set_xticks(range(len(classes)), classes, rotation=90)
+        ax.set_yticks(range(len(classes)), classes)
+        ax.set_xlabel('Predicted')
+        ax.set_ylabel('Actual')
+        ax.set_title(title)
+        _savefig(plt, fig, path)
+    return write
+
+
+def _importance_figure(plt, importance, features, title):
+    def write(path):
+        order = np.argsort(importance)
+        fig, ax = plt.subplots(figsize=(8, 5))
+        ax.barh(np.asarray(features)[order], importance[order], color='tab:green')
+        ax.set_xlabel('Importance')
+        ax.set_title(title)
+        ax.grid(True, axis='x', linestyle='--', alpha=0.7)
+        _savefig(plt, fig, path)
+    return write
+
+
+def _comparison_figure(plt, table, metrics, title, ylabel, ylim=None):
+    def write(path):
+        fig, ax = plt.subplots(figsize=(12, 6))
+        width = 0.8 / len(table)
+        positions = np.arange(len(metrics))
+        for i, (label, row) in enumerate(table[list(metrics)].iterrows()):
+            ax.bar(positions + i * width, row.to_numpy(), width, label=label)
+        ax.set_xticks(positions + width * (len(table) - 1) / 2, metrics, rotation=15)
+        ax.set_ylabel(ylabel)
+        if ylim is not None:
+            ax.set_ylim(*ylim)
+        ax.set_title(title)
+        ax.legend(bbox_to_anchor=(1.0, 1), loc='upper left')
+        _savefig(plt, fig, path)
+    return write
+
+
+def write_report(predictions, data, directory=REPORT_DIR, figures=True):
+    """
+    Write the tables and figures whose inputs changed. Returns the
+    ReportWriter (lists of written and unchanged outputs) and the summary table.
+    """
+    table, per_class, matrices = evaluate(predictions, data)
+    writer = ReportWriter(directory)
+    features = list(data['features'])
+    classes = [str(c) for c in data['classes']]
+    all_keys = [(label, predictions[label]['key']) for label in table.index]
+
+    writer.render('metrics.csv', output_digest('metrics', all_keys), _csv(table))
+    for label, frame in per_class.items():
+        writer.render(os.path.join('per_class', f"{label}.csv"),
+                      output_digest('per_class', predictions[label]['key'], classes), _csv(frame))
+
+    plt = _pyplot() if figures else None
+    if plt is not None:
+        for label in table.index:
+            key = predictions[label]['key']
+            writer.render(os.path.join('figures', f"{label}_confusion_matrix.png"),
+                          output_digest('confusion', key, classes),
+                          _confusion_figure(plt, matrices[label], classes, f"{label} Confusion Matrix"))
+            importance = predictions[label].get('importance')
+            if importance is not None:
+                writer.render(os.path.join('figures', f"{label}_feature_importance.png"),
+                              output_digest('importance', key, features),
+                              _importance_figure(plt, importance, features, f"Feature Importance ({label})"))
+        performance = [m for m in METRICS if m not in ERROR_METRICS]
+        writer.render(os.path.join('figures', 'performance_metrics.png'),
+                      output_digest('performance', all_keys),
+                      _comparison_figure(plt, table, performance,
+                                         "Model Performance Comparison (Higher is Better)", 'Score',
+                                         ylim=(0.8, 1.05)))
+        writer.render(os.path.join('figures', 'error_metrics.png'),
+                      output_digest('error', all_keys),
+                      _comparison_figure(plt, table, ERROR_METRICS,
+                                         "Model Error Comparison (Lower is Better)", 'Mean Absolute Error'))
+    writer.save_manifest()
+    return writer, table
+
+
+# -----------------------------------------------------------------------------
+# 4. CLI
+# -----------------------------------------------------------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cached evaluation report for the notebook models.")
+    parser.add_argument('--candidates', nargs='+', default=list(BASELINES),
+                        help=f"Baseline keys ({', '.join(BASELINES)})")
+    parser.add_argument('--features', choices=sorted(FEATURE_SETS), default='full')
+    parser.add_argument('--data', default=CLEANED_CSV)
+    parser.add_argument('--output', default=REPORT_DIR)
+    parser.add_argument('--cache-dir', default=CACHE_DIR)
+    parser.add_argument('--no-figures', action='store_true', help="Write the tables only")
+    args = parser.parse_args(argv)
+
+    def log(message):
+        print(message, file=sys.stderr)
+
+    unknown = [key for key in args.candidates if key not in BASELINES]
+    if unknown:
+        parser.error(f"Unknown model(s) {', '.join(unknown)}; choose from {', '.join(BASELINES)}")
+    candidates = {}
+    for key in args.candidates:
+        try:
+            make_estimator(*BASELINES[key])
+        except ImportError as e:
+            log(f"Skipping {key}: {e}")
+            continue
+        candidates[key] = BASELINES[key]
+    if not args.no_figures and _pyplot() is None:
+        log("matplotlib is not installed; writing tables only")
+
+    start = time.perf_counter()
+    data = prepare_data(args.data, FEATURE_SETS[args.features])
+    cache = PredictionCache(args.cache_dir, split_digest(data))
+    predictions, fitted = predict_models(candidates, data, cache, log)
+    writer, table = write_report(predictions, data, args.output, figures=not args.no_figures)
+
+    print(table.round(4).to_string())
+    print(f"\n{fitted} of {len(candidates)} model(s) fitted, {len(writer.written)} output(s) written, "
+          f"{len(writer.unchanged)} unchanged -> {args.output} ({time.perf_counter() - start:.1f}s)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,224 @@
+"""
+Fold the feature scaler into the model so inference takes raw columns.
+
+Every app runs `scaler.transform` and then `model.predict`, allocating a
+scaled copy of the input on each call. For monotone per-feature scalers
+(StandardScaler, MinMaxScaler) that step can be folded away:
+
+* Trees: each split threshold is mapped back to raw units. The raw threshold
+  is found by bisection over float64 values, so `raw <= raw_threshold` holds
+  exactly when sklearn's `float32(scale(raw)) <= threshold` does and the
+  predictions stay identical.
+* Logistic regression: the scaling is absorbed into the coefficients and
+  intercept (W / scale, b - W . mean / scale).
+
+Usage:
+    python -m src.folding export    # store a scaler-free predictor in the artifact
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from src.compiled import CompiledForest, compile_model
+from src.utils import SAVED_MODELS_DIR
+
+_SIGN_BIT = np.uint64(1 << 63)
+
+
+# -----------------------------------------------------------------------------
+# 1. TREES
+# -----------------------------------------------------------------------------
+def _float_to_key(x):
+    """
+    Map float64 values to uint64 keys with the same ordering.
+    """
+    bits = np.asarray(x, dtype=np.float64).view(np.uint64)
+    return np.where(bits & _SIGN_BIT, ~bits, bits | _SIGN_BIT)
+
+
+def _key_to_float(key):
+    bits = np.where(key & _SIGN_BIT, key & ~_SIGN_BIT, ~key)
+    return bits.view(np.float64)
+
+
+def _scaled_column(scaler, feature, raw, n_features):
+    """
+    What the tree sees for value `raw[i]` of feature `feature[i]`: the scaler
+    output, cast to float32 as sklearn does before walking the tree.
+    """
+    matrix = np.zeros((len(raw), n_features))
+    matrix[np.arange(len(raw)), feature] = raw
+    names = getattr(scaler, 'feature_names_in_', None)
+    if names is not None:
+        matrix = pd.DataFrame(matrix, columns=names)
+    # The bracket search probes huge values; float32 turns them into +-inf, as in sklearn
+    with np.errstate(over='ignore'):
+        scaled = np.asarray(scaler.transform(matrix), dtype=np.float32)
+    return scaled[np.arange(len(raw)), feature].astype(np.float64)
+
+
+def raw_thresholds(scaler, feature, threshold, n_features):
+    """
+    For each split, the largest raw float64 `x` with
+    float32(scaler(x)) <= threshold. Requires an increasing scaler.
+    """
+    probe = np.array([[-1.0] * n_features, [1.0] * n_features])
+    names = getattr(scaler, 'feature_names_in_', None)
+    scaled = np.asarray(scaler.transform(pd.DataFrame(probe, columns=names) if names is not None else probe))
+    if np.any(scaled[1] <= scaled[0]):
+        raise ValueError("Scaler folding requires a strictly increasing per-feature scaler")
+
+    result = np.full(len(threshold), np.inf)
+    finite = np.isfinite(threshold)
+    feature, threshold = feature[finite], threshold[finite]
+
+    finite_max = np.finfo(np.float64).max
+    lo = np.full(len(threshold), _float_to_key(-finite_max))
+    hi = np.full(len(threshold), _float_to_key(finite_max))
+    below_all = _scaled_column(scaler, feature, _key_to_float(lo), n_features) > threshold
+    above_all = _scaled_column(scaler, feature, _key_to_float(hi), n_features) <= threshold
+
+    # Invariant: lo satisfies the split test, hi does not
+    while True:
+        open_ = (hi - lo) > 1
+        open_ &= ~below_all & ~above_all
+        if not open_.any():
+            break
+        mid = lo + (hi - lo) // np.uint64(2)
+        ok = _scaled_column(scaler, feature, _key_to_float(mid), n_features) <= threshold
+        lo = np.where(open_ & ok, mid, lo)
+        hi = np.where(open_ & ~ok, mid, hi)
+
+    raw = _key_to_float(lo)
+    raw[below_all] = -np.inf
+    raw[above_all] = np.inf
+    result[finite] = raw
+    return result
+
+
+def fold_forest(compiled, scaler):
+    """
+    Return a CompiledForest that takes raw (unscaled) float64 features.
+    """
+    if compiled.raw_input:
+        return compiled
+    arrays = compiled.to_dict()
+    arrays['threshold'] = raw_thresholds(scaler, compiled.feature, compiled.threshold,
+                                         compiled.n_features)
+    arrays['raw_input'] = True
+    return CompiledForest.from_dict(arrays)
+
+
+# -----------------------------------------------------------------------------
+# 2. LOGISTIC REGRESSION
+# -----------------------------------------------------------------------------
+class FoldedLinear:
+    """
+    Linear classifier with the scaler folded into its coefficients.
+    """
+
+    kind = 'linear'
+    raw_input = True
+
+    def __init__(self, coef, intercept, classes, n_features, ovr):
+        self.coef = coef
+        self.intercept = intercept
+        self.classes = classes
+        self.n_features = int(n_features)
+        self.ovr = bool(ovr)
+
+    def to_dict(self):
+        return {'kind': self.kind, 'coef': self.coef, 'intercept': self.intercept,
+                'classes': self.classes, 'n_features': self.n_features, 'ovr': self.ovr}
+
+    @classmethod
+    def from_dict(cls, arrays):
+        arrays = {key: value for key, value in arrays.items() if key != 'kind'}
+        return cls(**arrays)
+
+    def decision_function(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"Expected input of shape (n, {self.n_features}), got {X.shape}")
+        return X @ self.coef.T + self.intercept
+
+    def predict_proba(self, X):
+        scores = self.decision_function(X)
+        if self.ovr:
+            proba = 1.0 / (1.0 + np.exp(-scores))
+            return proba / proba.sum(axis=1, keepdims=True)
+        scores -= scores.max(axis=1, keepdims=True)
+        np.exp(scores, out=scores)
+        return scores / scores.sum(axis=1, keepdims=True)
+
+    def predict(self, X):
+        return self.classes.take(np.argmax(self.decision_function(X), axis=1))
+
+
+def _affine(scaler):
+    """
+    Express the scaler as scaled = raw * a + b per feature.
+    """
+    n = scaler.n_features_in_
+    if hasattr(scaler, 'min_'):  # MinMaxScaler: X * scale_ + min_
+        return scaler.scale_, scaler.min_
+    if hasattr(scaler, 'with_mean'):  # StandardScaler: (X - mean_) / scale_
+        mean = scaler.mean_ if scaler.with_mean else np.zeros(n)
+        scale = scaler.scale_ if scaler.with_std else np.ones(n)
+        return 1.0 / scale, -mean / scale
+    raise TypeError(f"Cannot fold {type(scaler).__name__}; expected StandardScaler or MinMaxScaler")
+
+
+def fold_linear(model, scaler):
+    a, b = _affine(scaler)
+    coef = np.atleast_2d(model.coef_)
+    if coef.shape[0] == 1:
+        raise TypeError("Binary linear models are not supported; the crop model has 22 classes")
+    ovr = getattr(model, 'solver', None) == 'liblinear' or getattr(model, 'multi_class', None) == 'ovr'
+    return FoldedLinear(
+        coef=np.ascontiguousarray(coef * a),
+        intercept=np.asarray(model.intercept_ + coef @ b, dtype=np.float64),
+        classes=np.asarray(model.classes_),
+        n_features=model.n_features_in_,
+        ovr=ovr,
+    )
+
+
+# -----------------------------------------------------------------------------
+# 3. ENTRY POINTS
+# -----------------------------------------------------------------------------
+def fold_scaler(model, scaler):
+    """
+    Scaler-free predictor for a tree model or a linear model.
+    """
+    if hasattr(model, 'coef_'):
+        return fold_linear(model, scaler)
+    return fold_forest(compile_model(model), scaler)
+
+
+def main(argv=None):
+    from src.artifact import ARTIFACT_FILE, ModelArtifact, load_default, save_artifact
+
+    parser = argparse.ArgumentParser(description="Fold the scaler into the saved model.")
+    sub = parser.add_subparsers(dest='command', required=True)
+    export = sub.add_parser('export', help="Store a scaler-free predictor in the artifact")
+    export.add_argument('--models', default=SAVED_MODELS_DIR)
+    export.add_argument('--output', default=None,
+                        help=f"Artifact path (default: <models>/{ARTIFACT_FILE})")
+    args = parser.parse_args(argv)
+
+    artifact = load_default(args.models)
+    folded = fold_scaler(artifact.model, artifact.scaler)
+    artifact = ModelArtifact(artifact.model, artifact.scaler, artifact.classes,
+                             artifact.features, artifact.metadata, compiled=folded)
+    output = args.output or os.path.join(args.models, ARTIFACT_FILE)
+    save_artifact(artifact, output)
+    print(f"Folded scaler into {type(artifact.model).__name__} -> {output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
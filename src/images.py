@@ -0,0 +1,276 @@
+"""
+Crop image pipeline: pre-resized thumbnails and an in-memory byte cache.
+
+`build` resizes every `images/<crop>.jpg` (or .jpeg/.png/.webp) once into
+compact thumbnails at a few widths (WebP, or JPEG if Pillow lacks WebP),
+plus a neutral placeholder. It writes them to `images/thumbs/` (or
+`--output`) with a `manifest.json` listing what exists. Unchanged sources
+are skipped on rebuild; an image Pillow cannot read is skipped with a
+warning, and that crop gets the placeholder.
+
+`ThumbnailStore` reads the manifest once, from `<images>/thumbs/` or the
+folder given as `thumbs_dir` (`CROP_THUMBS_DIR` in the app). It serves each thumbnail's
+encoded bytes from memory after the first read, so the app hands `st.image`
+a small, ready-made file instead of opening and sending a full-size JPEG on
+every prediction. Crops without an image are resolved from the manifest in
+memory, so they fall back to the placeholder without a filesystem probe.
+Without a built manifest the store lists the source folder once and
+serves the originals.
+
+Pillow is only needed for `build`.
+
+Usage:
+    python -m src.images build --sizes 160 320 640
+    python -m src.images build --output /srv/thumbs    # app: CROP_THUMBS_DIR=/srv/thumbs
+    python -m src.images info
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+
+from src.utils import PROJECT_ROOT
+
+IMAGES_DIR = os.path.join(PROJECT_ROOT, 'images')
+THUMBS_SUBDIR = 'thumbs'
+MANIFEST_FILE = 'manifest.json'
+SOURCE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+DEFAULT_SIZES = (160, 320, 640)
+DEFAULT_QUALITY = 80
+PLACEHOLDER = '_placeholder'
+ORIGINAL = 'original'  # size key for unresized images
+PLACEHOLDER_COLOR = (226, 236, 221)
+MIME_TYPES = {'.webp': 'image/webp', '.jpg': 'image/jpeg', '.jpeg': 'image/jpeg', '.png': 'image/png'}
+
+
+# -----------------------------------------------------------------------------
+# 1. BUILD
+# -----------------------------------------------------------------------------
+def source_images(source_dir):
+    """
+    {crop: path} for the images in `source_dir`, keyed by lower-case stem.
+    """
+    images = {}
+    if not os.path.isdir(source_dir):
+        return images
+    for name in sorted(os.listdir(source_dir)):
+        stem, ext = os.path.splitext(name)
+        if ext.lower() in SOURCE_EXTENSIONS and not stem.startswith('_'):
+            images.setdefault(stem.lower(), os.path.join(source_dir, name))
+    return images
+
+
+def _pil():
+    try:
+        from PIL import Image, ImageOps, features
+    except ImportError:
+        raise SystemExit("Building thumbnails needs Pillow: pip install Pillow") from None
+    return Image, ImageOps, features
+
+
+def _save(image, path, ext, quality):
+    if ext == '.webp':
+        image.save(path, 'WEBP', quality=quality, method=6)
+    else:
+        image.save(path, 'JPEG', quality=quality, optimize=True, progressive=True)
+
+
+def build_thumbnails(source_dir=IMAGES_DIR, output_dir=None, sizes=DEFAULT_SIZES,
+                     quality=DEFAULT_QUALITY, force=False, log=None):
+    """
+    Resize every source image to each width in `sizes` and write the manifest.
+    Returns the manifest dict. Unreadable images are left out of it.
+    """
+    Image, ImageOps, features = _pil()
+    output_dir = output_dir or os.path.join(source_dir, THUMBS_SUBDIR)
+    os.makedirs(output_dir, exist_ok=True)
+    ext = '.webp' if features.check('webp') else '.jpg'
+    sizes = sorted(set(int(s) for s in sizes))
+
+    crops = {}
+    for crop, path in source_images(source_dir).items():
+        mtime = os.path.getmtime(path)
+        entry = {}
+        image = None
+        for size in sizes:
+            name = f"{crop}-{size}{ext}"
+            target = os.path.join(output_dir, name)
+            entry[str(size)] = name
+            if not force and os.path.exists(target) and os.path.getmtime(target) >= mtime:
+                continue
+            if image is None:
+                try:
+                    with Image.open(path) as opened:
+                        # Honour camera rotation, drop alpha/palettes the encoders dislike
+                        image = ImageOps.exif_transpose(opened).convert('RGB')
+                except (OSError, SyntaxError, ValueError, Image.DecompressionBombError) as e:
+                    print(f"warning: skipping {path}: {e}", file=sys.stderr)
+                    entry = None
+                    break
+            thumb = image.copy()
+            thumb.thumbnail((size, size * 4), Image.LANCZOS)  # fit the width, never upscale
+            _save(thumb, target, ext, quality)
+        if entry is None:
+            continue
+        crops[crop] = entry
+        if log and image is not None:
+            log(f"{crop}: {os.path.getsize(path) / 1024:.0f} KB -> "
+                + ', '.join(f"{s}px {os.path.getsize(os.path.join(output_dir, entry[str(s)])) / 1024:.0f} KB"
+                            for s in sizes))
+
+    placeholder = {}
+    for size in sizes:
+        name = f"{PLACEHOLDER}-{size}{ext}"
+        _save(Image.new('RGB', (size, size * 3 // 4), PLACEHOLDER_COLOR),
+              os.path.join(output_dir, name), ext, quality)
+        placeholder[str(size)] = name
+
+    manifest = {'sizes': sizes, 'format': ext.lstrip('.'), 'crops': crops,
+                'placeholder': placeholder}
+    tmp_path = os.path.join(output_dir, f"{MANIFEST_FILE}.tmp")
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, os.path.join(output_dir, MANIFEST_FILE))
+    return manifest
+
+
+# -----------------------------------------------------------------------------
+# 2. IN-MEMORY STORE
+# -----------------------------------------------------------------------------
+class Thumbnail:
+    __slots__ = ('data', 'mime', 'width', 'placeholder')
+
+    def __init__(self, data, mime, width, placeholder=False):
+        self.data = data
+        self.mime = mime
+        self.width = width
+        self.placeholder = placeholder
+
+
+class ThumbnailStore:
+    """
+    Encoded thumbnail bytes by (crop, width), read from disk at most once.
+    The cache holds at most one file per crop and size, so it is not evicted.
+    `thumbs_dir` is where `build` wrote them (default: `<images_dir>/thumbs`).
+    """
+
+    def __init__(self, images_dir=IMAGES_DIR, thumbs_dir=None):
+        self.images_dir = images_dir
+        self._bytes = {}
+        self._lock = threading.Lock()
+        thumbs_dir = thumbs_dir or os.path.join(images_dir, THUMBS_SUBDIR)
+        manifest_path = os.path.join(thumbs_dir, MANIFEST_FILE)
+        if os.path.exists(manifest_path):
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+            self.directory = thumbs_dir
+            self.sizes = [int(s) for s in manifest['sizes']]
+            self.crops = manifest['crops']
+            self.placeholder = manifest.get('placeholder') or {}
+        else:
+            # Not built: serve the originals, one size, no placeholder
+            self.directory = images_dir
+            self.sizes = [ORIGINAL]
+            self.crops = {crop: {ORIGINAL: os.path.basename(path)}
+                          for crop, path in source_images(images_dir).items()}
+            self.placeholder = {}
+
+    @property
+    def built(self):
+        return self.sizes != [ORIGINAL]
+
+    def _size_for(self, width):
+        """
+        Smallest built width >= `width`, else the largest one.
+        """
+        if width is None or not self.built:
+            return self.sizes[-1]
+        return next((s for s in self.sizes if s >= width), self.sizes[-1])
+
+    def _read(self, name):
+        data = self._bytes.get(name)
+        if data is None:
+            with open(os.path.join(self.directory, name), 'rb') as f:
+                data = f.read()
+            with self._lock:
+                self._bytes[name] = data
+        return data
+
+    def get(self, crop, width=None):
+        """
+        Thumbnail for `crop` at least `width` px wide, the placeholder when
+        the crop has no image, or None when there is no placeholder either.
+        """
+        size = str(self._size_for(width))
+        name = self.crops.get(str(crop).lower(), {}).get(size)
+        placeholder = name is None
+        if placeholder:
+            name = self.placeholder.get(size)
+            if name is None:
+                return None
+        ext = os.path.splitext(name)[1].lower()
+        return Thumbnail(self._read(name), MIME_TYPES.get(ext, 'application/octet-stream'),
+                         None if size == ORIGINAL else int(size), placeholder)
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_thumbnails(images_dir=IMAGES_DIR, thumbs_dir=None):
+    """
+    The process-wide `ThumbnailStore` for `images_dir` (and `thumbs_dir`).
+    """
+    key = (os.path.realpath(images_dir), thumbs_dir and os.path.realpath(thumbs_dir))
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = _stores[key] = ThumbnailStore(images_dir, thumbs_dir)
+        return store
+
+
+# -----------------------------------------------------------------------------
+# 3. CLI
+# -----------------------------------------------------------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or inspect the crop thumbnails.")
+    sub = parser.add_subparsers(dest='command', required=True)
+    build = sub.add_parser('build', help="Pre-resize crop images into web thumbnails")
+    build.add_argument('--source', default=IMAGES_DIR, help="Folder with <crop>.jpg images")
+    build.add_argument('--output', default=None,
+                       help=f"Thumbnail folder (default: <source>/{THUMBS_SUBDIR}); "
+                            "point the app at it with CROP_THUMBS_DIR")
+    build.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES),
+                       help="Thumbnail widths in pixels")
+    build.add_argument('--quality', type=int, default=DEFAULT_QUALITY)
+    build.add_argument('--force', action='store_true', help="Rebuild unchanged images too")
+    info = sub.add_parser('info', help="Show what the app would serve")
+    info.add_argument('--source', default=IMAGES_DIR)
+    info.add_argument('--thumbs', default=None,
+                      help=f"Thumbnail folder (default: <source>/{THUMBS_SUBDIR})")
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.source):
+        parser.error(f"Image folder not found: {args.source}")
+
+    if args.command == 'build':
+        if any(size <= 0 for size in args.sizes):
+            parser.error("--sizes must be positive integers")
+        if not 1 <= args.quality <= 100:
+            parser.error("--quality must be between 1 and 100")
+        manifest = build_thumbnails(args.source, args.output, args.sizes, args.quality,
+                                    args.force, log=print)
+        print(f"{len(manifest['crops'])} crops x {len(manifest['sizes'])} sizes "
+              f"({manifest['format']})")
+    else:
+        store = ThumbnailStore(args.source, args.thumbs)
+        print(f"{'built thumbnails' if store.built else 'originals (not built)'} in {store.directory}")
+        for crop in sorted(store.crops):
+            sizes = ', '.join(f"{s}px" if s != ORIGINAL else ORIGINAL for s in store.sizes)
+            print(f"  {crop}: {sizes}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
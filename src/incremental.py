@@ -0,0 +1,436 @@
+"""
+Incremental model updates from newly labelled field data.
+
+`update` takes the deployed artifact and a CSV of new labelled rows and
+produces the next artifact version without touching the training history:
+
+* Scaler: `StandardScaler.partial_fit` folds the new rows into the running
+  mean/variance (exactly what a refit on all rows would give).
+* Models trained on the old scaling are re-expressed in the new one, so
+  they keep making the same predictions:
+    - Random forests: split thresholds are mapped back to raw units (as in
+      `src.folding`) and forward through the new scaler.
+    - Linear models: coefficients and intercepts are transformed exactly.
+* The model then learns from the new rows only:
+    - Random forests grow extra trees on them (`warm_start`). The number of
+      trees is proportional to the new rows' share of all samples seen, and
+      `max_trees` drops the oldest trees.
+    - Models with `partial_fit` (SGDClassifier, ...) call it.
+    - LogisticRegression takes mini-batch gradient steps on its own
+      regularised objective. The step is weighted by the new rows' share.
+    - XGBoost continues boosting. Its splits cannot be re-expressed, so its
+      scaler is left as is.
+  Single decision trees and SVMs need a full retrain with `src.train`.
+
+Trees only know the classes they were fit on. So each batch gets one
+zero-weight anchor row per class, which keeps every tree's class columns
+aligned with the forest. Labels never seen before need a full retrain.
+
+Each update writes `saved_models/versions/crop_recommendation-v<N>.joblib`
+and then atomically replaces the live artifact. Running apps and services
+(`src.prediction_cache`) notice the new file and swap it in without a
+restart. The new rows are also appended to `data/field_updates.csv` for the
+next full retrain.
+
+Usage:
+    python -m src.incremental update new_rows.csv
+    python -m src.incremental update new_rows.csv --trees 20 --max-trees 400 --clean
+    python -m src.incremental versions
+    python -m src.incremental rollback 3
+"""
+import argparse
+import copy
+import datetime
+import os
+import re
+import shutil
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.artifact import ARTIFACT_FILE, ModelArtifact, load_artifact, load_default, save_artifact
+from src.compiled import compile_model
+from src.folding import fold_scaler, raw_thresholds
+from src.preprocessing import BOUNDS_FILE, load_bounds
+from src.utils import DATA_DIR, FEATURES, SAVED_MODELS_DIR, TARGET, normalize_columns
+
+VERSIONS_DIR = 'versions'
+UPDATES_CSV = os.path.join(DATA_DIR, 'field_updates.csv')
+DEFAULT_KEEP = 5
+SGD_EPOCHS = 10
+SGD_LEARNING_RATE = 1.0
+SGD_BATCH_SIZE = 256
+_VERSION_FILE = re.compile(r'^crop_recommendation-v(\d+)\.joblib$')
+
+
+# -----------------------------------------------------------------------------
+# 1. RE-EXPRESSING A MODEL UNDER A NEW SCALER
+# -----------------------------------------------------------------------------
+def _transform(scaler, matrix):
+    names = getattr(scaler, 'feature_names_in_', None)
+    return np.asarray(scaler.transform(pd.DataFrame(matrix, columns=names) if names is not None
+                                       else matrix))
+
+
+def _affine(scaler):
+    """
+    scaled = raw * a + b per feature, read off the scaler itself.
+    """
+    n = scaler.n_features_in_
+    b = _transform(scaler, np.zeros((1, n)))[0]
+    a = _transform(scaler, np.ones((1, n)))[0] - b
+    return a, b
+
+
+def rescale_trees(trees, old_scaler, new_scaler):
+    """
+    Move the split thresholds of sklearn Trees from `old_scaler` units to
+    `new_scaler` units, in place. All splits are mapped in one batch. The
+    trees agree with the old ones up to float32 rounding right at a
+    threshold.
+    """
+    states = [tree.__getstate__() for tree in trees]
+    splits = [state['nodes']['left_child'] != -1 for state in states]
+    feature = np.concatenate([s['nodes']['feature'][m] for s, m in zip(states, splits)]).astype(np.intp)
+    threshold = np.concatenate([s['nodes']['threshold'][m] for s, m in zip(states, splits)])
+    raw = raw_thresholds(old_scaler, feature, threshold, trees[0].n_features)
+    a, b = _affine(new_scaler)
+    scaled = np.where(np.isfinite(raw), (raw * a[feature] + b[feature]).astype(np.float32), raw)
+    offset = 0
+    for tree, state, split in zip(trees, states, splits):
+        count = int(split.sum())
+        state['nodes']['threshold'][split] = scaled[offset:offset + count]
+        offset += count
+        tree.__setstate__(state)
+
+
+def rescale_linear(model, old_scaler, new_scaler):
+    """
+    Rewrite coef_/intercept_ so predictions on new-scaler inputs match the
+    old model on old-scaler inputs.
+    """
+    a_old, b_old = _affine(old_scaler)
+    a_new, b_new = _affine(new_scaler)
+    # z_old = z_new * (a_old / a_new) + (b_old - b_new * a_old / a_new)
+    ratio = a_old / a_new
+    shift = b_old - b_new * ratio
+    model.intercept_ = model.intercept_ + model.coef_ @ shift
+    model.coef_ = model.coef_ * ratio
+
+
+# -----------------------------------------------------------------------------
+# 2. LEARNING FROM THE NEW ROWS
+# -----------------------------------------------------------------------------
+def _with_anchors(X, y_ids, n_classes):
+    """
+    Append one zero-weight row per class so every class is present.
+    """
+    X_all = np.vstack([X, np.zeros((n_classes, X.shape[1]))])
+    y_all = np.concatenate([y_ids, np.arange(n_classes)])
+    weight = np.concatenate([np.ones(len(y_ids)), np.zeros(n_classes)])
+    return X_all, y_all, weight
+
+
+def grow_forest(model, X, y_ids, n_trees, max_trees=None):
+    """
+    Fit `n_trees` extra trees on the new rows and drop the oldest trees
+    beyond `max_trees`.
+    """
+    X_all, y_all, weight = _with_anchors(X, y_ids, len(model.classes_))
+    model.set_params(warm_start=True, n_estimators=len(model.estimators_) + n_trees)
+    model.fit(X_all, y_all, sample_weight=weight)
+    model.set_params(warm_start=False)
+    if max_trees is not None and len(model.estimators_) > max_trees:
+        model.estimators_ = model.estimators_[-max_trees:]
+        model.n_estimators = max_trees
+    return model
+
+
+def sgd_logistic(model, X, y_ids, n_seen, epochs=SGD_EPOCHS, learning_rate=SGD_LEARNING_RATE,
+                 seed=42):
+    """
+    Mini-batch gradient steps on LogisticRegression's objective
+    sum(loss) + ||W||^2 / 2C, normalised by all `n_seen` samples, using only
+    the new rows. Each new row carries the weight it has in the full data,
+    so a small batch nudges the model instead of overwriting it.
+    """
+    W = np.array(model.coef_, dtype=np.float64)
+    b = np.array(model.intercept_, dtype=np.float64)
+    target = np.zeros((len(y_ids), len(model.classes_)))
+    target[np.arange(len(y_ids)), np.searchsorted(model.classes_, y_ids)] = 1.0
+    ovr = getattr(model, 'solver', None) == 'liblinear' or getattr(model, 'multi_class', None) == 'ovr'
+    C = getattr(model, 'C', 1.0)
+    rng = np.random.default_rng(seed)
+    n_batches = max(1, len(y_ids) // SGD_BATCH_SIZE)
+    for _ in range(epochs):
+        for batch in np.array_split(rng.permutation(len(y_ids)), n_batches):
+            scores = X[batch] @ W.T + b
+            if ovr:
+                proba = 1.0 / (1.0 + np.exp(-scores))
+            else:
+                scores -= scores.max(axis=1, keepdims=True)
+                proba = np.exp(scores)
+                proba /= proba.sum(axis=1, keepdims=True)
+            error = proba - target[batch]
+            W -= learning_rate * (error.T @ X[batch] + W * len(batch) / C / len(y_ids)) / n_seen
+            b -= learning_rate * error.sum(axis=0) / n_seen
+    model.coef_, model.intercept_ = W, b
+    return model
+
+
+def _continue_xgboost(model, X, y_ids, n_rounds):
+    X_all, y_all, weight = _with_anchors(X, y_ids, len(model.classes_))
+    booster = model.get_booster()
+    model.set_params(n_estimators=n_rounds)
+    model.fit(X_all, y_all, sample_weight=weight, xgb_model=booster)
+    return model
+
+
+# -----------------------------------------------------------------------------
+# 3. UPDATE + PUBLISH
+# -----------------------------------------------------------------------------
+def read_updates(csv_path, artifact, bounds=None):
+    """
+    New rows as (raw feature frame, class ids); unknown labels are rejected.
+    """
+    frame = normalize_columns(pd.read_csv(csv_path))
+    missing = [c for c in list(artifact.features) + [TARGET] if c not in frame.columns]
+    if missing:
+        raise ValueError(f"{csv_path} is missing columns: {', '.join(missing)}")
+    if bounds is not None:
+        frame = bounds.apply(frame)
+    labels = frame[TARGET].astype(str).to_numpy()
+    classes = np.asarray(artifact.classes).astype(str)
+    order = np.argsort(classes)
+    pos = np.searchsorted(classes, labels, sorter=order)
+    pos = np.minimum(pos, len(classes) - 1)
+    known = classes[order[pos]] == labels
+    if not known.all():
+        unknown = sorted(set(labels[~known]))
+        raise ValueError(f"Labels not known to the model: {unknown}; retrain with src.train")
+    return frame, order[pos]
+
+
+def update(artifact, frame, y_ids, trees=None, max_trees=None, epochs=SGD_EPOCHS, version=None):
+    """
+    Return a new ModelArtifact updated with `frame` (raw features) and
+    `y_ids`, plus a dict describing what was done. The new version number
+    defaults to the artifact's version + 1.
+    """
+    model, old_scaler = artifact.model, artifact.scaler
+    X_raw = artifact.to_matrix(frame)
+    n_before = int(getattr(old_scaler, 'n_samples_seen_', 0))
+    start = time.perf_counter()
+
+    kind = type(model).__name__
+    is_forest = hasattr(model, 'estimators_') and hasattr(model.estimators_[0], 'tree_')
+    is_xgb = hasattr(model, 'get_booster')
+    is_logistic = kind == 'LogisticRegression'
+    if not (is_forest or is_xgb or is_logistic or hasattr(model, 'partial_fit')):
+        raise ValueError(f"{kind} cannot be updated incrementally; retrain with src.train")
+
+    # 1. Scaler statistics (XGBoost splits cannot follow a rescaling)
+    model = copy.deepcopy(model)
+    scaler = copy.deepcopy(old_scaler)
+    if is_xgb or not hasattr(scaler, 'partial_fit'):
+        scaler_action = 'frozen'
+    else:
+        scaler.partial_fit(X_raw)
+        scaler_action = 'partial_fit'
+        if is_forest:
+            rescale_trees([estimator.tree_ for estimator in model.estimators_], old_scaler, scaler)
+        elif hasattr(model, 'coef_'):
+            rescale_linear(model, old_scaler, scaler)
+    X = np.asarray(scaler.transform(X_raw), dtype=np.float64)
+    n_seen = n_before + len(X)
+
+    # 2. Model
+    if is_forest:
+        if trees is None:
+            trees = max(1, round(len(model.estimators_) * len(X) / max(n_seen, 1)))
+        grow_forest(model, X, y_ids, trees, max_trees)
+        method = f"+{trees} trees"
+    elif is_xgb:
+        rounds = trees or max(1, round(model.get_booster().num_boosted_rounds() * len(X) / max(n_seen, 1)))
+        _continue_xgboost(model, X, y_ids, rounds)
+        method = f"+{rounds} boosting rounds"
+    elif hasattr(model, 'partial_fit'):
+        model.partial_fit(X, y_ids, classes=model.classes_)
+        method = 'partial_fit'
+    else:
+        sgd_logistic(model, X, y_ids, n_seen, epochs=epochs)
+        method = f"{epochs} SGD epochs"
+
+    # 3. Predictors derived from the old model are stale now
+    compiled = artifact.compiled
+    if compiled is not None:
+        compiled = fold_scaler(model, scaler) if compiled.raw_input else compile_model(model)
+
+    parent = int(artifact.metadata.get('version', 1))
+    version = version or parent + 1
+    entry = {'version': version, 'rows': int(len(X)), 'model': kind, 'method': method,
+             'scaler': scaler_action, 'samples_seen': n_seen,
+             'seconds': round(time.perf_counter() - start, 3),
+             'updated_at': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds')}
+    metadata = dict(artifact.metadata)
+    metadata.update(version=version, parent_version=parent, samples_seen=n_seen,
+                    history=list(metadata.get('history', [])) + [entry])
+    return ModelArtifact(model, scaler, artifact.classes, artifact.features, metadata,
+                         compiled=compiled), entry
+
+
+def versions_dir(base_path):
+    return os.path.join(base_path, VERSIONS_DIR)
+
+
+def list_versions(base_path=SAVED_MODELS_DIR):
+    """
+    {version: path} of the stored artifact versions.
+    """
+    directory = versions_dir(base_path)
+    found = {}
+    if os.path.isdir(directory):
+        for name in os.listdir(directory):
+            match = _VERSION_FILE.match(name)
+            if match:
+                found[int(match.group(1))] = os.path.join(directory, name)
+    return dict(sorted(found.items()))
+
+
+def version_path(base_path, version):
+    return os.path.join(versions_dir(base_path), f"crop_recommendation-v{version}.joblib")
+
+
+def next_version(artifact, base_path=SAVED_MODELS_DIR):
+    """
+    One above both the live artifact and every stored version, so an update
+    after a rollback never reuses a version number.
+    """
+    return max([int(artifact.metadata.get('version', 1))] + list(list_versions(base_path))) + 1
+
+
+def _make_live(path, base_path):
+    live = os.path.join(base_path, ARTIFACT_FILE)
+    tmp = f"{live}.{os.getpid()}.tmp"
+    shutil.copyfile(path, tmp)
+    os.replace(tmp, live)
+    return live
+
+
+def publish(artifact, base_path=SAVED_MODELS_DIR, keep=DEFAULT_KEEP):
+    """
+    Store the artifact as its own version, then swap it in as the live one.
+    The artifact it replaces is stored first if it is not already, so the
+    first update can be rolled back too. Only the newest `keep` versions are
+    kept.
+    """
+    live = os.path.join(base_path, ARTIFACT_FILE)
+    parent = artifact.metadata.get('parent_version')
+    if parent is not None and os.path.exists(live) and parent not in list_versions(base_path):
+        os.makedirs(versions_dir(base_path), exist_ok=True)
+        shutil.copyfile(live, version_path(base_path, parent))
+    path = version_path(base_path, int(artifact.metadata.get('version', 1)))
+    save_artifact(artifact, path)
+    _make_live(path, base_path)
+    stored = list_versions(base_path)
+    for old in list(stored)[:-keep] if keep else []:
+        os.remove(stored[old])
+    return path
+
+
+def append_rows(frame, csv_path=UPDATES_CSV):
+    """
+    Append rows to `csv_path`, matching columns by name. A new file gets the
+    `FEATURES + [TARGET]` schema; an existing one keeps its own header.
+    """
+    columns = FEATURES + [TARGET]
+    if os.path.exists(csv_path):
+        columns = list(pd.read_csv(csv_path, nrows=0).columns)
+    else:
+        os.makedirs(os.path.dirname(os.path.abspath(csv_path)), exist_ok=True)
+    rows = normalize_columns(frame).reindex(columns=columns)
+    rows.to_csv(csv_path, mode='a', header=not os.path.exists(csv_path), index=False)
+
+
+# -----------------------------------------------------------------------------
+# 4. CLI
+# -----------------------------------------------------------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Update the deployed model with new labelled rows.")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    upd = sub.add_parser('update', help="Learn from a CSV of new labelled rows and publish")
+    upd.add_argument('csv', help="New rows in the schema of data/Crop_recommendation.csv")
+    upd.add_argument('--models', default=SAVED_MODELS_DIR)
+    upd.add_argument('--trees', type=int, default=None,
+                     help="Trees (or boosting rounds) to add; default: proportional to the new rows")
+    upd.add_argument('--max-trees', type=int, default=None,
+                     help="Drop the oldest trees beyond this many")
+    upd.add_argument('--epochs', type=int, default=SGD_EPOCHS,
+                     help="Gradient passes over the new rows for LogisticRegression")
+    upd.add_argument('--clean', action='store_true',
+                     help=f"Apply the training outlier rule from <models>/{BOUNDS_FILE} first")
+    upd.add_argument('--append-to', default=UPDATES_CSV,
+                     help="Where the new rows are appended for the next full retrain ('' to skip)")
+    upd.add_argument('--keep', type=int, default=DEFAULT_KEEP, help="Artifact versions to keep")
+    upd.add_argument('--dry-run', action='store_true', help="Update and report, but do not publish")
+
+    sub.add_parser('versions', help="List stored artifact versions").add_argument(
+        '--models', default=SAVED_MODELS_DIR)
+    rollback = sub.add_parser('rollback', help="Make a stored version live again")
+    rollback.add_argument('version', type=int)
+    rollback.add_argument('--models', default=SAVED_MODELS_DIR)
+    args = parser.parse_args(argv)
+
+    if args.command == 'versions':
+        live = load_default(args.models).metadata.get('version', 1)
+        for version, path in list_versions(args.models).items():
+            meta = load_artifact(path).metadata
+            last = (meta.get('history') or [{}])[-1]
+            print(f"{'*' if version == live else ' '} v{version}: {meta.get('samples_seen', '?')} samples, "
+                  f"{last.get('method', 'initial')}, {last.get('updated_at', '')}")
+        return 0
+
+    if args.command == 'rollback':
+        versions = list_versions(args.models)
+        if args.version not in versions:
+            parser.error(f"No stored version {args.version}; have {sorted(versions)}")
+        live = _make_live(versions[args.version], args.models)
+        print(f"v{args.version} is live -> {live}")
+        return 0
+
+    if not os.path.exists(args.csv):
+        parser.error(f"Input file not found: {args.csv}")
+    if args.trees is not None and args.trees <= 0:
+        parser.error("--trees must be a positive integer")
+    if args.max_trees is not None and args.max_trees <= 0:
+        parser.error("--max-trees must be a positive integer")
+    bounds = None
+    if args.clean:
+        bounds_path = os.path.join(args.models, BOUNDS_FILE)
+        if not os.path.exists(bounds_path):
+            parser.error(f"{bounds_path} not found; run `python -m src.preprocessing clean` first")
+        bounds = load_bounds(bounds_path)
+
+    artifact = load_default(args.models)
+    try:
+        frame, y_ids = read_updates(args.csv, artifact, bounds)
+        updated, entry = update(artifact, frame, y_ids, args.trees, args.max_trees, args.epochs,
+                                next_version(artifact, args.models))
+    except ValueError as e:
+        parser.error(str(e))
+    print(f"v{entry['version']}: {entry['rows']:,} new rows, {entry['method']}, "
+          f"scaler {entry['scaler']}, {entry['samples_seen']:,} samples seen, {entry['seconds']:.2f}s")
+    if args.dry_run:
+        return 0
+    path = publish(updated, args.models, args.keep)
+    if args.append_to:
+        append_rows(frame, args.append_to)
+    print(f"Published {path} and swapped it in as {os.path.join(args.models, ARTIFACT_FILE)}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
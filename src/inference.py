@@ -0,0 +1,168 @@
+"""
+Shared inference core for the Streamlit app, the batch CLI and the service.
+
+`get_predictor` keeps one `CachedPredictor` per model directory for the
+whole process, so every app session, request handler and batch job in that
+process uses the same copy of the model. `recommend` turns one set of field
+readings into a ranked `Recommendation` with advice attached.
+
+The module also holds what the UI needs besides the model:
+* widget metadata for the feature sets,
+* input sanity warnings,
+* per-crop advice.
+
+Crop pictures are served by `src.images`.
+
+At import time it needs only the standard library and `src.utils`. The
+model stack is imported on first use, so the app can render before sklearn
+has loaded (see `src.startup`).
+"""
+import os
+import threading
+
+from src.utils import FEATURES, SAVED_MODELS_DIR, SELECTED_FEATURES, normalize_columns
+
+# Widgets the app shows: the deployed model's features, or all seven
+FEATURE_SETS = {'selected': SELECTED_FEATURES, 'all': FEATURES}
+DEFAULT_FEATURE_SET = 'selected'
+DEFAULT_TOP_K = 3
+
+
+# -----------------------------------------------------------------------------
+# 1. INPUT SCHEMA
+# -----------------------------------------------------------------------------
+# feature -> (label, default value, help text); ranges and steps are in INPUT_BOUNDS
+INPUT_WIDGETS = {
+    'Nitrogen': ("Nitrogen (N)", 50, "Ratio of Nitrogen content in soil (kg/ha)"),
+    'Phosphorous': ("Phosphorus (P)", 50, "Ratio of Phosphorus content in soil (kg/ha)"),
+    'Potassium': ("Potassium (K)", 50, "Ratio of Potassium content in soil (kg/ha)"),
+    'ph': ("Soil pH", 6.5, "0 (Acidic) to 14 (Alkaline)"),
+    'temperature': ("Temperature (°C)", 25.0, None),
+    'humidity': ("Humidity (%)", 70.0, None),
+    'rainfall': ("Rainfall (mm)", 100.0, None),
+}
+SOIL_FEATURES = ('Nitrogen', 'Phosphorous', 'Potassium', 'ph')
+
+
+def feature_set(name):
+    """
+    Features to ask for, in widget order (soil first, then climate).
+    """
+    if name not in FEATURE_SETS:
+        raise ValueError(f"Unknown feature set '{name}'; choose from {sorted(FEATURE_SETS)}")
+    return [f for f in INPUT_WIDGETS if f in FEATURE_SETS[name]]
+
+
+# feature -> (low, high, warning): valid readings most crops do not tolerate.
+# `src.monitoring` applies the same table to whole batches.
+PLAUSIBLE_RANGES = {
+    'ph': (4.0, 9.0, "Your Soil pH is extremely acidic/alkaline. Most crops prefer pH 5.5-7.5."),
+    'temperature': (None, 45.0, "Temperature is extremely high (>45°C). Ensure crops are heat-tolerant."),
+    'humidity': (10.0, None, "Humidity is extremely low (<10%). Intensive irrigation required."),
+}
+
+
+def input_warnings(inputs):
+    """
+    Plausibility warnings for readings that are valid but extreme.
+    """
+    warnings = []
+    for feature, (low, high, message) in PLAUSIBLE_RANGES.items():
+        value = inputs.get(feature)
+        if value is not None and ((low is not None and value < low) or (high is not None and value > high)):
+            warnings.append(message)
+    return warnings
+
+
+# -----------------------------------------------------------------------------
+# 2. EXTRAS
+# -----------------------------------------------------------------------------
+_WATER_CROPS = ('rice', 'jute', 'papaya', 'coconut', 'coffee')
+_DROUGHT_CROPS = ('chickpea', 'mothbeans', 'kidneybeans', 'blackgram', 'lentil')
+
+CROP_ADVICE = {
+    **{crop: "💧 This crop requires high water availability." for crop in _WATER_CROPS},
+    **{crop: "🔥 This crop is drought-resistant." for crop in _DROUGHT_CROPS},
+    'cotton': "🌞 Cotton requires long frost-free periods and sunshine.",
+    'banana': "🌫 Banana needs high humidity and moisture.",
+    'maize': "🌽 Maize grows best in well-drained fertile soil.",
+}
+
+
+def crop_advice(crop):
+    return CROP_ADVICE.get(str(crop).lower())
+
+
+# -----------------------------------------------------------------------------
+# 3. SHARED PREDICTOR
+# -----------------------------------------------------------------------------
+_predictors = {}
+_predictors_lock = threading.Lock()
+
+
+def get_predictor(base_path=SAVED_MODELS_DIR, lookup=False, **options):
+    """
+    The process-wide `CachedPredictor` for `base_path`, created on first use.
+    `options` (max_entries, ttl, ...) only apply to that first call. With
+    `lookup`, in-domain rows are answered from the precomputed lookup grid
+    (`python -m src.lookup_grid build`) when one matches the model.
+    """
+    key = os.path.realpath(base_path)
+    with _predictors_lock:
+        predictor = _predictors.get(key)
+        if predictor is None:
+            from src.prediction_cache import CachedPredictor
+            predictor = _predictors[key] = CachedPredictor(base_path, **options)
+        if not lookup:
+            return predictor
+        grid_predictor = _predictors.get((key, 'lookup'))
+        if grid_predictor is None:
+            from src.lookup_grid import GRID_FILE, GridPredictor
+            grid_predictor = _predictors[(key, 'lookup')] = GridPredictor(
+                predictor, os.path.join(base_path, GRID_FILE))
+        return grid_predictor
+
+
+class Recommendation:
+    """
+    Best crop for one set of readings, runners-up and advice.
+    """
+
+    def __init__(self, ranking, inputs):
+        self.ranking = ranking  # [(crop, probability), ...], best first
+        self.inputs = inputs
+
+    @property
+    def crop(self):
+        return self.ranking[0][0]
+
+    @property
+    def advice(self):
+        return crop_advice(self.crop)
+
+    @property
+    def warnings(self):
+        return input_warnings(self.inputs)
+
+    def to_dict(self):
+        return {'crop': self.crop, 'advice': self.advice, 'warnings': self.warnings,
+                'ranking': [{'crop': crop, 'probability': p} for crop, p in self.ranking]}
+
+
+def recommend(inputs, k=DEFAULT_TOP_K, predictor=None):
+    """
+    Rank crops for one dict of readings keyed by feature name (N/P/K accepted).
+    Runners-up the model gives no chance at all are left out of the ranking.
+    Raises ValueError if the model needs a feature that is missing.
+    """
+    import pandas as pd
+
+    predictor = predictor or get_predictor()
+    frame = normalize_columns(pd.DataFrame([inputs]))
+    missing = [f for f in predictor.features if f not in frame.columns]
+    if missing:
+        raise ValueError(f"The model also needs: {', '.join(missing)}")
+    labels, proba = predictor.recommend(frame, k)
+    ranking = [(str(crop), float(p)) for rank, (crop, p) in enumerate(zip(labels[0], proba[0]))
+               if rank == 0 or p > 0]
+    return Recommendation(ranking, dict(frame.iloc[0]))
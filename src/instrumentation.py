@@ -0,0 +1,409 @@
+"""
+Lightweight instrumentation for the inference hot path.
+
+* `span(name)` times a block of code into the `crop_span_seconds` histogram
+  and counts exceptions raised inside it. Spans wrap artifact loading,
+  scaling, prediction, decoding and image loading.
+* `Counter` / `Gauge` / `Histogram` metrics live in a process-wide `REGISTRY` and can
+  be exported as Prometheus text (`prometheus_text`, `start_http_server`) or
+  as JSON (`snapshot`). With `set_json_log(path)` every span is also
+  appended to a JSON-lines log.
+* `SamplingProfiler` periodically records the Python stacks of running
+  threads. It is opt-in; when off, no thread runs and nothing is sampled.
+
+Environment toggles:
+    CROP_INSTRUMENTATION=0    turn spans into no-ops
+    CROP_SPAN_LOG=path        append every span to a JSON-lines file
+    CROP_METRICS_PORT=9100    serve /metrics (Prometheus text) on this port
+    CROP_PROFILE=1            run the sampling profiler for the whole process
+    CROP_PROFILE_OUT=path     where the collapsed stacks are written at exit
+"""
+import atexit
+import bisect
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter as _StackCounter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from src.utils import PROJECT_ROOT
+
+# Upper bounds in seconds, from 50us to 10s
+LATENCY_BUCKETS = (5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 2.5e-3, 5e-3, 1e-2, 2.5e-2,
+                   5e-2, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PROFILE_INTERVAL = 0.005
+PROFILE_FILE = os.path.join(PROJECT_ROOT, '.cache', 'profile', 'stacks.txt')
+
+
+# -----------------------------------------------------------------------------
+# 1. METRICS
+# -----------------------------------------------------------------------------
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _escape(text, quote=True):
+    # The text format reserves backslash and newline everywhere, and '"' in label values
+    text = str(text).replace('\\', '\\\\').replace('\n', '\\n')
+    return text.replace('"', '\\"') if quote else text
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+class Counter:
+    """
+    Monotonic count per label set.
+    """
+
+    kind = 'counter'
+
+    def __init__(self, name, documentation):
+        self.name = name
+        self.documentation = documentation
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(_label_key(labels), 0)
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        return [(self.name, key, value) for key, value in sorted(values.items())]
+
+    def to_dict(self):
+        with self._lock:
+            return [{'labels': dict(key), 'value': value} for key, value in self._values.items()]
+
+
+class Gauge(Counter):
+    """
+    Last value set per label set.
+    """
+
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram per label set, as Prometheus expects.
+    """
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # label key -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def samples(self):
+        with self._lock:
+            series = {key: list(values) for key, values in self._series.items()}
+        out = []
+        for key, values in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), values[:-1]):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                out.append((f'{self.name}_bucket', key + (('le', le),), cumulative))
+            out.append((f'{self.name}_count', key, cumulative))
+            out.append((f'{self.name}_sum', key, values[-1]))
+        return out
+
+    def to_dict(self):
+        with self._lock:
+            series = {key: list(values) for key, values in self._series.items()}
+        return [{'labels': dict(key), 'count': sum(values[:-1]), 'sum': values[-1],
+                 'buckets': dict(zip([str(b) for b in self.buckets] + ['+Inf'], values[:-1]))}
+                for key, values in series.items()]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, documentation, *args):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, documentation, *args)
+            elif type(metric) is not cls:
+                raise ValueError(f"Metric '{name}' is already registered as a {metric.kind}")
+            return metric
+
+    def counter(self, name, documentation):
+        return self._get_or_create(Counter, name, documentation)
+
+    def gauge(self, name, documentation):
+        return self._get_or_create(Gauge, name, documentation)
+
+    def histogram(self, name, documentation, buckets=LATENCY_BUCKETS):
+        return self._get_or_create(Histogram, name, documentation, buckets)
+
+    def prometheus_text(self):
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.append(f'# HELP {metric.name} {_escape(metric.documentation, quote=False)}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for name, key, value in metric.samples():
+                lines.append(f'{name}{_format_labels(key)} {value}')
+        return '\n'.join(lines) + '\n'
+
+    def snapshot(self):
+        return {name: {'type': metric.kind, 'series': metric.to_dict()}
+                for name, metric in list(self._metrics.items())}
+
+
+REGISTRY = Registry()
+SPAN_SECONDS = REGISTRY.histogram('crop_span_seconds', "Time spent in instrumented code spans")
+SPAN_ERRORS = REGISTRY.counter('crop_span_errors_total', "Exceptions raised inside spans")
+ROWS_PREDICTED = REGISTRY.counter('crop_rows_predicted_total', "Rows scored by the model")
+
+
+# -----------------------------------------------------------------------------
+# 2. SPANS
+# -----------------------------------------------------------------------------
+_enabled = os.environ.get('CROP_INSTRUMENTATION', '1') != '0'
+_span_log = None
+_span_log_lock = threading.Lock()
+
+
+def set_enabled(enabled):
+    global _enabled
+    _enabled = bool(enabled)
+
+
+def set_json_log(path):
+    """
+    Append one JSON line per finished span to `path` (None to stop).
+    """
+    global _span_log
+    with _span_log_lock:
+        if _span_log is not None:
+            _span_log.close()
+        _span_log = None
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            _span_log = open(path, 'a', buffering=1)
+
+
+class _Span:
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.start
+        SPAN_SECONDS.observe(elapsed, span=self.name)
+        if exc_type is not None:
+            SPAN_ERRORS.inc(span=self.name, error=exc_type.__name__)
+        if _span_log is not None:
+            record = {'ts': time.time(), 'span': self.name, 'seconds': elapsed,
+                      'error': exc_type.__name__ if exc_type is not None else None}
+            with _span_log_lock:
+                if _span_log is not None:
+                    _span_log.write(json.dumps(record) + '\n')
+        return False
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(name):
+    """
+    Context manager timing the enclosed block under `name`.
+    """
+    return _Span(name) if _enabled else _NULL_SPAN
+
+
+def prometheus_text():
+    return REGISTRY.prometheus_text()
+
+
+def snapshot():
+    return REGISTRY.snapshot()
+
+
+# -----------------------------------------------------------------------------
+# 3. METRICS ENDPOINT
+# -----------------------------------------------------------------------------
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == '/metrics':
+            body, content_type = prometheus_text().encode('utf-8'), 'text/plain; version=0.0.4'
+        elif self.path == '/metrics.json':
+            body, content_type = json.dumps(snapshot()).encode('utf-8'), 'application/json'
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_metrics_server = None
+
+
+def start_http_server(port, host='127.0.0.1'):
+    """
+    Serve /metrics (Prometheus text) and /metrics.json from a daemon thread.
+    Calling it again returns the server that is already running.
+    """
+    global _metrics_server
+    if _metrics_server is None:
+        _metrics_server = ThreadingHTTPServer((host, port), _MetricsHandler)
+        _metrics_server.daemon_threads = True
+        threading.Thread(target=_metrics_server.serve_forever, name='metrics-http',
+                         daemon=True).start()
+    return _metrics_server
+
+
+# -----------------------------------------------------------------------------
+# 4. SAMPLING PROFILER
+# -----------------------------------------------------------------------------
+class SamplingProfiler:
+    """
+    Record the Python stack of every other thread each `interval` seconds.
+
+    Stacks are aggregated in the collapsed format used by flame graph
+    tools ("outer;inner;leaf count"). Sampling happens on a background
+    thread, so the profiled code is not modified or slowed by tracing hooks.
+    """
+
+    def __init__(self, interval=PROFILE_INTERVAL):
+        self.interval = interval
+        self.stacks = _StackCounter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        return self
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        return False
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                self.stacks[';'.join(reversed(stack))] += 1
+            self.samples += 1
+
+    def top(self, n=20):
+        """
+        Functions with the most samples at the top of the stack (self time).
+        """
+        leaves = _StackCounter()
+        for stack, count in self.stacks.items():
+            leaves[stack.rsplit(';', 1)[-1]] += count
+        return leaves.most_common(n)
+
+    def write_collapsed(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'w') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        return path
+
+
+_profiler = None
+
+
+def start_profiler(interval=PROFILE_INTERVAL, output=PROFILE_FILE):
+    """
+    Start the process-wide profiler; its stacks are written to `output` at exit.
+    """
+    global _profiler
+    if _profiler is None:
+        _profiler = SamplingProfiler(interval).start()
+        atexit.register(lambda: _profiler.stop().write_collapsed(output))
+    return _profiler
+
+
+def configure_from_env():
+    """
+    Apply the CROP_* environment toggles. Safe to call more than once.
+    """
+    if os.environ.get('CROP_SPAN_LOG') and _span_log is None:
+        set_json_log(os.environ['CROP_SPAN_LOG'])
+    if os.environ.get('CROP_METRICS_PORT'):
+        start_http_server(int(os.environ['CROP_METRICS_PORT']))
+    if os.environ.get('CROP_PROFILE', '0') not in ('', '0'):
+        start_profiler(output=os.environ.get('CROP_PROFILE_OUT', PROFILE_FILE))
@@ -0,0 +1,417 @@
+"""
+Precomputed lookup-grid recommender for the bounded Streamlit input domain.
+
+The UI only accepts values inside `INPUT_BOUNDS`, so the model can be
+evaluated once on a quantized grid covering that box. An interactive lookup
+is then one bin search per feature plus one array index, with no model call.
+Each cell stores the uint8 class id predicted at the cell centre, so the
+grid costs one byte per cell and its size is set by a memory budget (or
+explicit per-feature bin counts).
+
+For tree models the bin edges are drawn from the split thresholds (mapped to
+raw units), which makes the grid a compressed index of the decision regions:
+the more thresholds fit in the budget, the closer it gets to exact. Where it
+has to merge regions it can disagree with the model; `evaluate` measures how
+often on random in-domain inputs.
+
+Lookup mode (`get_predictor(lookup=True)`, `CROP_APP_LOOKUP=1` for the app,
+`--lookup` for the service) wraps the shared predictor in `GridPredictor`:
+in-domain rows are answered from the grid, everything else (out-of-domain
+rows, rankings beyond the best crop) still goes to the model. A grid
+remembers the model version it was built from and is ignored once the model
+changes, until it is rebuilt.
+
+Usage:
+    python -m src.lookup_grid build --budget-mb 2
+    python -m src.lookup_grid evaluate --samples 100000
+"""
+import argparse
+import os
+import sys
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from src.utils import INPUT_BOUNDS, SAVED_MODELS_DIR, normalize_columns
+
+GRID_FILE = 'lookup_grid.joblib'
+DEFAULT_BUDGET_BYTES = 2 * 1024 * 1024
+BUILD_CHUNK = 65_536
+
+
+# -----------------------------------------------------------------------------
+# 1. GRID
+# -----------------------------------------------------------------------------
+class LookupGrid:
+    """
+    Per-feature bin edges over the input domain, one class id per cell.
+
+    `edges[i]` holds the interior edges of feature i; a value equal to an
+    edge falls in the lower bin, matching the trees' `x <= threshold` rule.
+    `confidence` (optional) is the model's probability for that class at the
+    cell centre, in 1/255 steps.
+    """
+
+    def __init__(self, features, lower, upper, edges, cells, classes, confidence=None,
+                 model_version=None):
+        self.features = [str(name) for name in features]
+        self.lower = np.asarray(lower, dtype=np.float64)
+        self.upper = np.asarray(upper, dtype=np.float64)
+        self.edges = [np.asarray(e, dtype=np.float64) for e in edges]
+        self.cells = cells
+        self.classes = np.asarray(classes)
+        self.confidence = confidence
+        self.model_version = model_version
+        self.bins = np.array([len(e) + 1 for e in self.edges], dtype=np.intp)
+        self._strides = np.cumprod(np.r_[1, self.bins[:0:-1]])[::-1]
+
+    @property
+    def nbytes(self):
+        return int(self.cells.nbytes) + (int(self.confidence.nbytes) if self.confidence is not None else 0)
+
+    def covers(self, X):
+        """
+        Rows whose values are all finite and inside the grid's domain.
+        """
+        X = np.asarray(X, dtype=np.float64)
+        with np.errstate(invalid='ignore'):
+            return ((X >= self.lower) & (X <= self.upper)).all(axis=1)
+
+    def cell_index(self, X):
+        """
+        Flat cell index for each raw row; out-of-domain values are clamped.
+        """
+        X = np.asarray(X, dtype=np.float64)
+        flat = np.zeros(len(X), dtype=np.intp)
+        for i, edges in enumerate(self.edges):
+            flat += np.searchsorted(edges, X[:, i], side='left') * self._strides[i]
+        return flat
+
+    def predict_ids(self, X):
+        return self.cells.take(self.cell_index(X)).astype(np.intp)
+
+    def predict(self, X):
+        """
+        Crop names for raw rows in `self.features` order.
+        """
+        return self.classes.take(self.predict_ids(X))
+
+    def centres(self, flat_index):
+        """
+        Representative point (bin midpoint) of each cell.
+        """
+        idx = np.unravel_index(flat_index, tuple(self.bins))
+        columns = []
+        for i, edges in enumerate(self.edges):
+            bounds = np.r_[self.lower[i], edges, self.upper[i]]
+            columns.append((bounds[idx[i]] + bounds[idx[i] + 1]) / 2)
+        return np.stack(columns, axis=1)
+
+    def to_dict(self):
+        return {'features': self.features, 'lower': self.lower, 'upper': self.upper,
+                'edges': self.edges, 'cells': self.cells, 'classes': self.classes,
+                'confidence': self.confidence, 'model_version': self.model_version}
+
+
+def candidate_edges(artifact, features):
+    """
+    Where bin edges are worth placing, per feature.
+
+    For tree models these are the split thresholds in raw units, so a grid
+    that uses all of them reproduces the model exactly; otherwise every UI
+    step is a candidate.
+    """
+    candidates = []
+    try:
+        from src.folding import fold_scaler
+        forest = fold_scaler(artifact.model, artifact.scaler)
+        thresholds = forest.threshold if forest.kind == 'forest' else None
+    except (TypeError, ValueError):
+        thresholds = None
+
+    for i, f in enumerate(features):
+        lo, hi, step = INPUT_BOUNDS[f]
+        if thresholds is not None:
+            values = thresholds[(forest.feature == i) & np.isfinite(thresholds)]
+        else:
+            values = np.arange(lo, hi, step) + step / 2
+        candidates.append(np.unique(values[(values >= lo) & (values < hi)]))
+    return candidates
+
+
+def plan_edges(candidates, budget_bytes=DEFAULT_BUDGET_BYTES, bins=None, features=None):
+    """
+    Choose interior edges per feature within the budget (one byte per cell).
+
+    Explicit `bins` counts are honoured; the remaining features are grown
+    greedily, always splitting the feature with the most candidate edges per
+    bin. Edges are the quantiles of each feature's candidates, so bins are
+    narrow where the model has many splits.
+    """
+    features = features or list(range(len(candidates)))
+    bins = dict(bins or {})
+    plan = {f: int(bins.get(f, 1)) for f in features}
+    if any(n < 1 for n in plan.values()):
+        raise ValueError("Bin counts must be positive")
+    if np.prod(list(plan.values()), dtype=np.float64) > budget_bytes:
+        raise ValueError("Explicit bin counts exceed the memory budget")
+
+    limit = {f: len(c) + 1 for f, c in zip(features, candidates)}
+    free = [f for f in features if f not in bins]
+    while free:
+        f = max(free, key=lambda name: limit[name] / plan[name])
+        if plan[f] >= limit[f]:
+            free.remove(f)
+            continue
+        total = np.prod(list(plan.values()), dtype=np.float64)
+        if total / plan[f] * (plan[f] + 1) > budget_bytes:
+            break
+        plan[f] += 1
+
+    edges = []
+    for f, values in zip(features, candidates):
+        n_edges = min(plan[f] - 1, len(values))
+        if n_edges == len(values):
+            edges.append(values)
+        else:
+            q = np.linspace(0, 1, n_edges + 2)[1:-1]
+            edges.append(np.unique(np.quantile(values, q, method='nearest')))
+    return edges
+
+
+def build_grid(artifact, budget_bytes=DEFAULT_BUDGET_BYTES, bins=None, progress=None,
+               model_version=None):
+    """
+    Evaluate the artifact at every cell of a grid that fits the budget.
+    With class probabilities, the budget covers one more byte per cell for
+    the confidence.
+    """
+    if len(artifact.classes) > 256:
+        raise ValueError("Lookup grid stores class ids as uint8 (at most 256 classes)")
+    features = artifact.features
+    unknown = sorted(set(bins or {}) - set(features))
+    if unknown:
+        raise ValueError(f"--bins given for features the model does not use: {', '.join(unknown)}")
+    with_confidence = hasattr(artifact.model, 'predict_proba')
+    cell_bytes = 2 if with_confidence else 1
+    edges = plan_edges(candidate_edges(artifact, features), budget_bytes // cell_bytes, bins, features)
+    lower = np.array([INPUT_BOUNDS[f][0] for f in features])
+    upper = np.array([INPUT_BOUNDS[f][1] for f in features])
+    n_cells = int(np.prod([len(e) + 1 for e in edges]))
+    grid = LookupGrid(features, lower, upper, edges, np.empty(n_cells, dtype=np.uint8),
+                      artifact.classes, np.empty(n_cells, dtype=np.uint8) if with_confidence else None,
+                      model_version)
+
+    for start in range(0, n_cells, BUILD_CHUNK):
+        flat = np.arange(start, min(start + BUILD_CHUNK, n_cells))
+        frame = pd.DataFrame(grid.centres(flat), columns=features)
+        grid.cells[start:start + len(flat)] = artifact.predict_ids(frame)
+        if with_confidence:
+            _, proba = artifact.recommend(frame, 1)
+            grid.confidence[start:start + len(flat)] = np.rint(proba[:, 0] * 255)
+        if progress:
+            progress(start + len(flat), n_cells)
+    return grid
+
+
+def random_inputs(features, n_samples, seed=0):
+    """
+    Uniform random inputs on the UI lattice (values the widgets can produce).
+    """
+    rng = np.random.default_rng(seed)
+    columns = []
+    for f in features:
+        lo, hi, step = INPUT_BOUNDS[f]
+        steps = rng.integers(0, int(round((hi - lo) / step)) + 1, size=n_samples)
+        columns.append(np.round(lo + steps * step, 1))
+    return np.stack(columns, axis=1)
+
+
+def evaluate(grid, artifact, n_samples=100_000, seed=0):
+    """
+    Fraction of random in-domain inputs where grid and exact model disagree,
+    plus lookup vs model timings.
+    """
+    X = random_inputs(grid.features, n_samples, seed)
+    start = time.perf_counter()
+    exact = artifact.predict_ids(pd.DataFrame(X, columns=grid.features))
+    model_s = time.perf_counter() - start
+    start = time.perf_counter()
+    approx = grid.predict_ids(X)
+    grid_s = time.perf_counter() - start
+    return {
+        'samples': n_samples,
+        'disagreement': float(np.mean(exact != approx)),
+        'model_s': model_s,
+        'grid_s': grid_s,
+    }
+
+
+# -----------------------------------------------------------------------------
+# 2. SAVE / LOAD
+# -----------------------------------------------------------------------------
+def save_grid(grid, path):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    joblib.dump(grid.to_dict(), tmp_path)
+    os.replace(tmp_path, path)
+    return path
+
+
+def load_grid(path, expected_features=None, mmap_mode='r'):
+    payload = joblib.load(path, mmap_mode=mmap_mode)
+    grid = LookupGrid(**payload)
+    if expected_features is not None and list(expected_features) != grid.features:
+        raise ValueError(f"Lookup grid was built for {grid.features}, "
+                         f"expected {list(expected_features)}")
+    return grid
+
+
+# -----------------------------------------------------------------------------
+# 3. LOOKUP MODE
+# -----------------------------------------------------------------------------
+def _file_signature(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+class GridPredictor:
+    """
+    `predict` / `recommend` answered from the lookup grid where it can,
+    from `predictor` (a `CachedPredictor`) everywhere else.
+    """
+
+    def __init__(self, predictor, path):
+        self.predictor = predictor
+        self.path = path
+        self.grid = None
+        self._signature = None
+        self._load()
+
+    @property
+    def features(self):
+        return self.predictor.features
+
+    def _load(self):
+        signature = _file_signature(self.path)
+        if signature is None or signature == self._signature:
+            return
+        self._signature = signature
+        try:
+            self.grid = load_grid(self.path, self.predictor.features)
+        except (OSError, ValueError, TypeError, EOFError):
+            self.grid = None
+
+    def current_grid(self):
+        """
+        The grid if it was built from the model being served, else None.
+        """
+        self.predictor.refresh()
+        if self.grid is None or self.grid.model_version != self.predictor.version:
+            self._load()
+        grid = self.grid
+        if grid is None or grid.model_version != self.predictor.version:
+            return None
+        return grid
+
+    def _split(self, frame):
+        grid = self.current_grid()
+        if grid is None or len(frame) == 0:
+            return None, None, None
+        X = np.asarray(normalize_columns(frame)[grid.features], dtype=np.float64)
+        return grid, X, grid.covers(X)
+
+    def predict(self, frame):
+        grid, X, inside = self._split(frame)
+        if grid is None:
+            return self.predictor.predict(frame)
+        labels = np.empty(len(X), dtype=object)
+        labels[inside] = grid.predict(X[inside])
+        if not inside.all():
+            labels[~inside] = self.predictor.predict(frame.iloc[np.flatnonzero(~inside)])
+        return labels.astype(grid.classes.dtype)
+
+    def recommend(self, frame, k=3):
+        """
+        The grid only knows each cell's best crop, so only k=1 is served from it.
+        """
+        grid, X, inside = self._split(frame) if k == 1 else (None, None, None)
+        if grid is None or grid.confidence is None:
+            return self.predictor.recommend(frame, k)
+        labels = np.empty((len(X), 1), dtype=object)
+        proba = np.empty((len(X), 1))
+        flat = grid.cell_index(X[inside])
+        labels[inside, 0] = grid.classes.take(grid.cells.take(flat))
+        proba[inside, 0] = grid.confidence.take(flat) / 255
+        if not inside.all():
+            rest_labels, rest_proba = self.predictor.recommend(frame.iloc[np.flatnonzero(~inside)], 1)
+            labels[~inside], proba[~inside] = rest_labels, rest_proba
+        return labels.astype(grid.classes.dtype), proba
+
+
+# -----------------------------------------------------------------------------
+# 4. CLI
+# -----------------------------------------------------------------------------
+def _parse_bins(parser, values):
+    bins = {}
+    for item in values or []:
+        name, _, count = item.partition('=')
+        if name not in INPUT_BOUNDS or not count.isdigit() or int(count) < 1:
+            parser.error(f"Invalid --bins entry '{item}'; expected FEATURE=N with N >= 1 "
+                         f"and FEATURE one of {', '.join(INPUT_BOUNDS)}")
+        bins[name] = int(count)
+    return bins
+
+
+def main(argv=None):
+    from src.artifact import load_default
+    from src.prediction_cache import artifact_version
+
+    parser = argparse.ArgumentParser(description="Precompute a quantized recommendation grid.")
+    sub = parser.add_subparsers(dest='command', required=True)
+    build = sub.add_parser('build', help="Evaluate the model on every grid cell")
+    build.add_argument('--budget-mb', type=float, default=DEFAULT_BUDGET_BYTES / 2**20,
+                       help="Memory budget for the grid (1 byte per cell, 2 with confidences)")
+    build.add_argument('--bins', nargs='*', metavar='FEATURE=N',
+                       help="Fixed bin counts, e.g. --bins ph=28 rainfall=100")
+    build.add_argument('--samples', type=int, default=100_000,
+                       help="Random inputs used to report the disagreement rate")
+    evaluate_cmd = sub.add_parser('evaluate', help="Compare a saved grid with the exact model")
+    evaluate_cmd.add_argument('--samples', type=int, default=100_000)
+    for cmd in (build, evaluate_cmd):
+        cmd.add_argument('--models', default=SAVED_MODELS_DIR)
+    args = parser.parse_args(argv)
+
+    bins = _parse_bins(parser, args.bins) if args.command == 'build' else None
+    version = artifact_version(args.models)
+    artifact = load_default(args.models)
+    path = os.path.join(args.models, GRID_FILE)
+    if args.command == 'build':
+        def progress(done, total):
+            print(f"\r{done:,}/{total:,} cells", end='', file=sys.stderr)
+
+        try:
+            grid = build_grid(artifact, int(args.budget_mb * 2**20), bins, progress, version)
+        except ValueError as e:
+            parser.error(str(e))
+        print(file=sys.stderr)
+        save_grid(grid, path)
+        print(f"Wrote {path}: bins {dict(zip(grid.features, grid.bins.tolist()))}, "
+              f"{grid.nbytes / 2**20:.2f} MB")
+    else:
+        grid = load_grid(path, artifact.features)
+
+    stats = evaluate(grid, artifact, args.samples)
+    print(f"Disagreement with exact model: {stats['disagreement']:.2%} "
+          f"over {stats['samples']:,} random in-domain inputs")
+    print(f"Model: {stats['model_s']:.3f}s, grid lookup: {stats['grid_s']:.4f}s")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
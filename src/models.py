@@ -0,0 +1,102 @@
+"""
+Candidate models and hyperparameter spaces from
+02_model_training._model_selection.ipynb, defined once so the training
+pipeline, benchmarks and evaluation build exactly the same estimators.
+"""
+from scipy.stats import randint
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+from sklearn.model_selection import ParameterGrid, ParameterSampler
+from sklearn.svm import SVC
+from sklearn.tree import DecisionTreeClassifier
+
+
+def _xgboost(**params):
+    # Imported lazily so everything else works without xgboost installed
+    from xgboost import XGBClassifier
+    return XGBClassifier(**params)
+
+
+# -----------------------------------------------------------------------------
+# 1. ESTIMATORS
+# -----------------------------------------------------------------------------
+ESTIMATORS = {
+    'logreg': LogisticRegression,
+    'decision_tree': DecisionTreeClassifier,
+    'random_forest': RandomForestClassifier,
+    'svc': SVC,
+    'xgboost': _xgboost,
+}
+
+
+def make_estimator(name, params):
+    """
+    Build an unfitted estimator from its registry name and parameters.
+    """
+    try:
+        factory = ESTIMATORS[name]
+    except KeyError:
+        raise ValueError(f"Unknown model '{name}'. Choose from: {', '.join(ESTIMATORS)}") from None
+    return factory(**params)
+
+
+# -----------------------------------------------------------------------------
+# 2. NOTEBOOK CONFIGURATIONS
+# -----------------------------------------------------------------------------
+# Fixed models compared in the metrics table at the end of the notebook
+BASELINES = {
+    'LR': ('logreg', {'random_state': 42, 'max_iter': 1000}),
+    'DTC': ('decision_tree', {'criterion': 'entropy', 'random_state': 42, 'max_depth': 5}),
+    'RFC': ('random_forest', {'n_estimators': 100, 'criterion': 'entropy',
+                              'random_state': 42, 'max_depth': 5}),
+    'RFCT': ('random_forest', {'bootstrap': False, 'criterion': 'entropy', 'max_depth': 14,
+                               'min_samples_leaf': 2, 'min_samples_split': 5,
+                               'n_estimators': 369, 'random_state': 42}),
+    'RTRFC': ('random_forest', {'n_estimators': 274, 'max_depth': 16, 'min_samples_split': 7,
+                                'min_samples_leaf': 3, 'criterion': 'entropy',
+                                'bootstrap': False, 'random_state': 42}),
+    'SVM': ('svc', {'kernel': 'rbf', 'random_state': 2}),
+    'XGBC': ('xgboost', {'eval_metric': 'logloss', 'random_state': 42, 'max_depth': 5}),
+}
+
+# GridSearchCV grid for the Decision Tree (5 x 3 x 3 x 2 x 4 = 360 configs)
+DT_PARAM_GRID = {
+    'max_depth': [5, 10, 15, 20, None],
+    'min_samples_split': [2, 5, 10],
+    'min_samples_leaf': [1, 2, 5],
+    'criterion': ['gini', 'entropy'],
+    'ccp_alpha': [0.0, 0.01, 0.05, 0.1],
+}
+
+# RandomizedSearchCV distributions for the Random Forest (n_iter=30)
+RF_PARAM_DIST = {
+    'n_estimators': randint(100, 500),
+    'max_depth': randint(5, 20),
+    'min_samples_split': randint(2, 10),
+    'min_samples_leaf': randint(1, 4),
+    'criterion': ['gini', 'entropy'],
+    'bootstrap': [True, False],
+}
+RF_N_ITER = 30
+
+
+def _plain(params):
+    # ParameterSampler yields numpy ints; keep params JSON-friendly for cache keys
+    return {key: value.item() if hasattr(value, 'item') else value for key, value in params.items()}
+
+
+def candidate_set(name):
+    """
+    Named groups of (model, params) candidates:
+    'baselines', 'dt-grid', 'rf-random', or a single baseline key such as 'SVM'.
+    """
+    if name == 'baselines':
+        return list(BASELINES.values())
+    if name == 'dt-grid':
+        return [('decision_tree', {**p, 'random_state': 42}) for p in ParameterGrid(DT_PARAM_GRID)]
+    if name == 'rf-random':
+        sampler = ParameterSampler(RF_PARAM_DIST, n_iter=RF_N_ITER, random_state=42)
+        return [('random_forest', {**_plain(p), 'random_state': 42}) for p in sampler]
+    if name in BASELINES:
+        return [BASELINES[name]]
+    raise ValueError(f"Unknown candidate set '{name}'")
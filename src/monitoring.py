@@ -0,0 +1,437 @@
+"""
+Batch input validation and drift monitoring.
+
+`BatchValidator.check` validates a whole DataFrame with a few array
+comparisons instead of per-row `if` branches:
+
+* Rows are rejected when a value is missing, non-numeric, non-finite or
+  outside the schema bounds (`INPUT_BOUNDS`).
+* Rows that are accepted are still flagged when a value lies outside the
+  range seen in training, or outside the plausible ranges of
+  `src.inference.PLAUSIBLE_RANGES`.
+
+`DriftMonitor` compares production inputs with the training distribution
+without storing any request. Each feature has a fixed set of bins, cut at
+the training deciles. Every observed batch adds its counts with one
+`np.bincount`, so memory is O(bins) per feature whatever the traffic. At
+most every `interval` seconds, and once at least `min_rows` rows have been
+seen, the current window is closed:
+* the population stability index (PSI) of each feature against the
+  training proportions is published as the `crop_input_psi` gauge,
+* the window counts are reset.
+By the usual rule of thumb, a PSI below 0.1 is stable, 0.1-0.25 is a
+moderate shift and above 0.25 is a significant shift.
+
+The training side (bin edges, proportions, observed range) is a small JSON
+profile written next to the model by `python -m src.monitoring profile`.
+If no profile has been built, it is computed from the cleaned CSV on first
+use.
+
+Usage:
+    python -m src.monitoring profile                  # saved_models/training_profile.json
+    python -m src.monitoring drift new_rows.csv       # PSI of a file against training
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.inference import PLAUSIBLE_RANGES
+from src.instrumentation import REGISTRY
+from src.preprocessing import CLEANED_CSV, QuantileSketch
+from src.utils import FEATURES, INPUT_BOUNDS, SAVED_MODELS_DIR, normalize_columns
+
+PROFILE_FILE = 'training_profile.json'
+DRIFT_BINS = 10
+DEFAULT_DRIFT_INTERVAL = 60.0
+DEFAULT_MIN_ROWS = 200
+PSI_MODERATE = 0.1
+PSI_SIGNIFICANT = 0.25
+_PSI_FLOOR = 1e-4  # proportion used for empty bins, keeps log() finite
+
+ROWS_REJECTED = REGISTRY.counter('crop_input_rejected_total', "Input rows rejected by validation")
+VALUES_FLAGGED = REGISTRY.counter('crop_input_flagged_total',
+                                  "Accepted values outside the training range, by feature")
+INPUT_PSI = REGISTRY.gauge('crop_input_psi', "Population stability index of the last drift window")
+DRIFT_ROWS = REGISTRY.counter('crop_drift_rows_total', "Rows added to the drift histograms")
+
+
+class InputError(ValueError):
+    """
+    A row failed validation; the message says which values and why.
+    """
+
+
+# -----------------------------------------------------------------------------
+# 1. TRAINING PROFILE
+# -----------------------------------------------------------------------------
+class TrainingProfile:
+    """
+    Per-feature bin edges, training proportions per bin and observed range.
+    `edges` has shape (n_features, bins - 1); features with fewer distinct
+    cut points are padded with +inf, which leaves trailing bins empty.
+    """
+
+    def __init__(self, features, edges, expected, low, high, rows):
+        self.features = list(features)
+        self.edges = np.asarray(edges, dtype=np.float64)
+        self.expected = np.asarray(expected, dtype=np.float64)
+        self.low = np.asarray(low, dtype=np.float64)
+        self.high = np.asarray(high, dtype=np.float64)
+        self.rows = int(rows)
+
+    @property
+    def bins(self):
+        return self.expected.shape[1]
+
+    def bin_counts(self, X):
+        """
+        Histogram counts of `X` (rows x features), shape (n_features, bins).
+        """
+        n_features, bins = self.expected.shape
+        index = np.empty(X.shape, dtype=np.intp)
+        for j in range(n_features):
+            index[:, j] = np.searchsorted(self.edges[j], X[:, j], side='right')
+        index += np.arange(n_features) * bins
+        return np.bincount(index.ravel(), minlength=n_features * bins).reshape(n_features, bins)
+
+    def subset(self, features):
+        """
+        The profile of `features` only, in that order; features the profile
+        does not know are dropped.
+        """
+        index = [self.features.index(f) for f in features if f in self.features]
+        return TrainingProfile([self.features[k] for k in index], self.edges[index],
+                               self.expected[index], self.low[index], self.high[index], self.rows)
+
+    def to_dict(self):
+        return {'features': self.features, 'edges': self.edges.tolist(),
+                'expected': self.expected.tolist(), 'low': self.low.tolist(),
+                'high': self.high.tolist(), 'rows': self.rows}
+
+
+def build_profile(csv_path=CLEANED_CSV, features=FEATURES, bins=DRIFT_BINS, chunksize=1_000_000):
+    """
+    Profile a training CSV in two streaming passes: decile edges from a
+    quantile sketch, then exact bin counts and min/max.
+    """
+    features = list(features)
+    sketch = QuantileSketch(len(features))
+    for chunk in pd.read_csv(csv_path, chunksize=chunksize):
+        sketch.update(normalize_columns(chunk)[features].to_numpy(dtype=np.float64))
+    cuts = sketch.quantiles(np.arange(1, bins) / bins).T
+    edges = np.full((len(features), bins - 1), np.inf)
+    for j, column in enumerate(cuts):
+        unique = np.unique(column[np.isfinite(column)])
+        edges[j, :len(unique)] = unique
+
+    profile = TrainingProfile(features, edges, np.zeros((len(features), bins)),
+                              np.full(len(features), np.inf), np.full(len(features), -np.inf), 0)
+    counts = np.zeros((len(features), bins), dtype=np.int64)
+    for chunk in pd.read_csv(csv_path, chunksize=chunksize):
+        X = normalize_columns(chunk)[features].to_numpy(dtype=np.float64)
+        counts += profile.bin_counts(X)
+        profile.low = np.minimum(profile.low, np.nanmin(X, axis=0))
+        profile.high = np.maximum(profile.high, np.nanmax(X, axis=0))
+        profile.rows += len(X)
+    profile.expected = counts / max(profile.rows, 1)
+    return profile
+
+
+def save_profile(profile, path):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(profile.to_dict(), f, indent=2)
+    os.replace(tmp_path, path)
+    return path
+
+
+def load_profile(base_path=SAVED_MODELS_DIR, fallback_csv=CLEANED_CSV):
+    """
+    The saved profile in `base_path`, else one computed from `fallback_csv`,
+    else None (drift monitoring is then off).
+    """
+    path = os.path.join(base_path, PROFILE_FILE)
+    if os.path.exists(path):
+        with open(path) as f:
+            return TrainingProfile(**json.load(f))
+    if fallback_csv and os.path.exists(fallback_csv):
+        return build_profile(fallback_csv)
+    return None
+
+
+def psi(counts, expected):
+    """
+    Population stability index per feature of `counts` against the
+    `expected` proportions (both shaped features x bins).
+    """
+    counts = np.asarray(counts, dtype=np.float64)
+    actual = counts / np.maximum(counts.sum(axis=1, keepdims=True), 1)
+    actual = np.maximum(actual, _PSI_FLOOR)
+    expected = np.maximum(expected, _PSI_FLOOR)
+    return ((actual - expected) * np.log(actual / expected)).sum(axis=1)
+
+
+def drift_level(score):
+    if score >= PSI_SIGNIFICANT:
+        return 'significant'
+    return 'moderate' if score >= PSI_MODERATE else 'stable'
+
+
+# -----------------------------------------------------------------------------
+# 2. VALIDATION
+# -----------------------------------------------------------------------------
+class ValidationResult:
+    """
+    Outcome of one `BatchValidator.check` call, as arrays over the rows.
+    Messages are only built for the rows that are asked about.
+    """
+
+    def __init__(self, features, X, bad, outside_training, implausible, lower, upper):
+        self.features = features
+        self.X = X
+        self.valid = ~bad.any(axis=1)
+        self._bad = bad
+        self._outside_training = outside_training
+        self._implausible = implausible
+        self._lower = lower
+        self._upper = upper
+
+    @property
+    def flagged(self):
+        return self.valid & (self._outside_training.any(axis=1) | self._implausible.any(axis=1))
+
+    def error(self, i):
+        """
+        Why row `i` was rejected, or None if it was accepted.
+        """
+        if self.valid[i]:
+            return None
+        problems = []
+        for j in np.flatnonzero(self._bad[i]):
+            value = self.X[i, j]
+            if np.isnan(value):
+                problems.append(f"{self.features[j]} is missing or not a number")
+            else:
+                problems.append(f"{self.features[j]}={value:g} is outside "
+                                f"[{self._lower[j]:g}, {self._upper[j]:g}]")
+        return '; '.join(problems)
+
+    def warnings(self, i):
+        """
+        Warnings for accepted row `i`.
+        """
+        out = [PLAUSIBLE_RANGES[self.features[j]][2] for j in np.flatnonzero(self._implausible[i])]
+        out += [f"{self.features[j]}={self.X[i, j]:g} is outside the range seen in training"
+                for j in np.flatnonzero(self._outside_training[i])]
+        return out
+
+    def errors(self):
+        """
+        {row position: message} for every rejected row.
+        """
+        return {int(i): self.error(i) for i in np.flatnonzero(~self.valid)}
+
+
+class BatchValidator:
+    """
+    Vectorized schema and range checks for batches of rows.
+    """
+
+    def __init__(self, features, bounds=INPUT_BOUNDS, profile=None):
+        self.features = list(features)
+        self.lower = np.array([bounds[f][0] if f in bounds else -np.inf for f in self.features])
+        self.upper = np.array([bounds[f][1] if f in bounds else np.inf for f in self.features])
+        self.plausible_low = np.array([_bound(PLAUSIBLE_RANGES, f, 0, -np.inf) for f in self.features])
+        self.plausible_high = np.array([_bound(PLAUSIBLE_RANGES, f, 1, np.inf) for f in self.features])
+        self.train_low = np.full(len(self.features), -np.inf)
+        self.train_high = np.full(len(self.features), np.inf)
+        if profile is not None:
+            for j, f in enumerate(self.features):
+                if f in profile.features:
+                    k = profile.features.index(f)
+                    self.train_low[j], self.train_high[j] = profile.low[k], profile.high[k]
+
+    def matrix(self, frame):
+        """
+        The features as a float matrix; missing columns and values that are
+        not numbers become NaN.
+        """
+        frame = normalize_columns(frame)
+        X = np.full((len(frame), len(self.features)), np.nan)
+        for j, f in enumerate(self.features):
+            if f in frame.columns:
+                X[:, j] = pd.to_numeric(frame[f], errors='coerce').to_numpy(dtype=np.float64)
+        return X
+
+    def check(self, frame):
+        X = self.matrix(frame)
+        with np.errstate(invalid='ignore'):
+            bad = ~np.isfinite(X) | (X < self.lower) | (X > self.upper)
+            outside_training = ~bad & ((X < self.train_low) | (X > self.train_high))
+            implausible = ~bad & ((X < self.plausible_low) | (X > self.plausible_high))
+        result = ValidationResult(self.features, X, bad, outside_training, implausible,
+                                  self.lower, self.upper)
+        rejected = int((~result.valid).sum())
+        if rejected:
+            ROWS_REJECTED.inc(rejected)
+        for j in np.flatnonzero(outside_training.any(axis=0)):
+            VALUES_FLAGGED.inc(int(outside_training[:, j].sum()), feature=self.features[j])
+        return result
+
+
+def _bound(table, feature, index, default):
+    value = table.get(feature, (None, None))[index]
+    return default if value is None else value
+
+
+# -----------------------------------------------------------------------------
+# 3. DRIFT
+# -----------------------------------------------------------------------------
+class DriftMonitor:
+    """
+    Streaming per-feature histograms of accepted rows with periodic PSI.
+    """
+
+    def __init__(self, profile, interval=DEFAULT_DRIFT_INTERVAL, min_rows=DEFAULT_MIN_ROWS,
+                 clock=time.monotonic):
+        self.profile = profile
+        self.interval = interval
+        self.min_rows = min_rows
+        self._clock = clock
+        self._lock = threading.Lock()
+        shape = profile.expected.shape
+        self._window = np.zeros(shape, dtype=np.int64)
+        self._total = np.zeros(shape, dtype=np.int64)
+        self._window_rows = 0
+        self._window_start = clock()
+        self.last = None  # scores of the last closed window
+
+    def observe(self, X):
+        """
+        Add the rows of `X` (columns in the profile's feature order) to the
+        histograms. Closes the window when it is due.
+        """
+        X = np.asarray(X, dtype=np.float64)
+        if not len(X):
+            return
+        counts = self.profile.bin_counts(X)
+        DRIFT_ROWS.inc(len(X))
+        with self._lock:
+            self._window += counts
+            self._total += counts
+            self._window_rows += len(X)
+            if self._due():
+                self._close_window()
+
+    def _due(self):
+        return self._window_rows >= self.min_rows and self._clock() - self._window_start >= self.interval
+
+    def _close_window(self):
+        scores = psi(self._window, self.profile.expected)
+        for feature, score in zip(self.profile.features, scores):
+            INPUT_PSI.set(float(score), feature=feature)
+        self.last = {'rows': self._window_rows, 'closed_at': time.time(),
+                     'psi': dict(zip(self.profile.features, scores.tolist()))}
+        self._window[:] = 0
+        self._window_rows = 0
+        self._window_start = self._clock()
+
+    def poll(self):
+        """
+        Close the current window if it is due. `observe` only checks when rows
+        arrive, so readers call this to keep the PSI gauges from going stale
+        when traffic stops.
+        """
+        with self._lock:
+            if self._due():
+                self._close_window()
+            return self.last
+
+    def flush(self):
+        """
+        Close the current window now, if it has any rows.
+        """
+        with self._lock:
+            if self._window_rows:
+                self._close_window()
+            return self.last
+
+    def snapshot(self):
+        with self._lock:
+            if self._due():
+                self._close_window()
+            total = psi(self._total, self.profile.expected) if self._total.any() else None
+            return {
+                'window_rows': self._window_rows,
+                'last_window': self.last,
+                'since_start': None if total is None else dict(zip(self.profile.features, total.tolist())),
+            }
+
+
+# -----------------------------------------------------------------------------
+# 4. CLI
+# -----------------------------------------------------------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Training profile and input drift reports.")
+    sub = parser.add_subparsers(dest='command', required=True)
+    prof = sub.add_parser('profile', help="Profile the training data for drift monitoring")
+    prof.add_argument('input', nargs='?', default=CLEANED_CSV)
+    prof.add_argument('--models', default=SAVED_MODELS_DIR, help=f"Where {PROFILE_FILE} is written")
+    prof.add_argument('--bins', type=int, default=DRIFT_BINS)
+    drift = sub.add_parser('drift', help="Validate a CSV and report its drift against training")
+    drift.add_argument('input')
+    drift.add_argument('--models', default=SAVED_MODELS_DIR)
+    drift.add_argument('--chunksize', type=int, default=100_000)
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.input):
+        parser.error(f"Input file not found: {args.input}")
+
+    if args.command == 'profile':
+        if args.bins < 2:
+            parser.error("--bins must be at least 2")
+        profile = build_profile(args.input, bins=args.bins)
+        path = save_profile(profile, os.path.join(args.models, PROFILE_FILE))
+        print(f"Profiled {profile.rows:,} rows -> {path}")
+        for f, lo, hi in zip(profile.features, profile.low, profile.high):
+            print(f"  {f:<12} [{lo:.4g}, {hi:.4g}]")
+        return 0
+
+    if args.chunksize <= 0:
+        parser.error("--chunksize must be a positive integer")
+    profile = load_profile(args.models)
+    if profile is None:
+        parser.error(f"No {PROFILE_FILE} in {args.models}; run `python -m src.monitoring profile`")
+    validator = BatchValidator(profile.features, profile=profile)
+    monitor = DriftMonitor(profile, interval=float('inf'))
+    rows = rejected = flagged = 0
+    examples = []
+    for chunk in pd.read_csv(args.input, chunksize=args.chunksize):
+        result = validator.check(chunk)
+        monitor.observe(result.X[result.valid])
+        rows += len(chunk)
+        rejected += int((~result.valid).sum())
+        flagged += int(result.flagged.sum())
+        for i, message in list(result.errors().items())[:3 - len(examples)]:
+            examples.append(f"row {rows - len(chunk) + i}: {message}")
+    print(f"{rows:,} rows: {rejected:,} rejected, {flagged:,} flagged")
+    for example in examples:
+        print(f"  {example}")
+    scores = monitor.flush()
+    if scores is None:
+        return 0
+    print(f"\n{'feature':<12}{'PSI':>8}")
+    for feature, score in scores['psi'].items():
+        print(f"{feature:<12}{score:>8.3f}  {drift_level(score)}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
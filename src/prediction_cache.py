@@ -0,0 +1,262 @@
+"""
+Memoizing prediction cache in front of the model artifact.
+
+Field readings arrive at the resolution of the input widgets (1 kg/ha for
+N/P/K, 0.1 for the climate and pH values), and cooperatives resubmit the
+same readings many times. `CachedPredictor` rounds every row to that
+resolution, scores the rounded row, and remembers the answer under the
+rounded values plus the model version. Repeated or nearly identical rows
+are then answered without scaling, predicting or decoding again. Because
+the rounded row is always what gets scored, results never depend on
+whether an answer came from the cache, but a reading between grid points
+gets the answer of the nearest one. The app's widgets only produce grid
+values; the HTTP service and batch CLI score exact rows unless the cache is
+asked for. Rows with a missing or infinite reading have no grid cell; they
+are scored as given and never cached.
+
+Entries are evicted least-recently-used once `max_entries` is reached and,
+with `ttl`, after a fixed number of seconds. The model version is the
+size and modification time of the files in `saved_models/`. It is checked
+at most once every `check_interval` seconds. When it changes, the artifact
+is reloaded and entries keyed on the old version are never looked up again.
+
+Usage:
+    predictor = CachedPredictor()           # wraps load_default()
+    predictor.predict(frame)                # same as ModelArtifact.predict
+    predictor.recommend(frame, k=3)         # same as ModelArtifact.recommend
+    predictor.cache.stats()                 # hits, misses, evictions, ...
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from src.artifact import ARTIFACT_FILE, load_default
+from src.instrumentation import REGISTRY
+from src.utils import ENCODER_FILE, INPUT_BOUNDS, MODEL_FILE, SAVED_MODELS_DIR, SCALER_FILE
+
+DEFAULT_MAX_ENTRIES = 50_000
+DEFAULT_CHECK_INTERVAL = 1.0  # seconds between artifact version checks
+
+CACHE_LOOKUPS = REGISTRY.counter('crop_prediction_cache_total', "Prediction cache lookups by result")
+CACHE_EVICTIONS = REGISTRY.counter('crop_prediction_cache_evictions_total',
+                                   "Prediction cache entries dropped by reason")
+
+
+# -----------------------------------------------------------------------------
+# 1. MODEL VERSION
+# -----------------------------------------------------------------------------
+def artifact_version(base_path=SAVED_MODELS_DIR):
+    """
+    Cheap fingerprint of the model files in `base_path` (size + mtime).
+    Mirrors `load_default`: the fused artifact if present, else the pickles.
+    """
+    fused = os.path.join(base_path, ARTIFACT_FILE)
+    paths = [fused] if os.path.exists(fused) else [
+        os.path.join(base_path, name) for name in (MODEL_FILE, SCALER_FILE, ENCODER_FILE)]
+    parts = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            parts.append(f"{os.path.basename(path)}:missing")
+            continue
+        parts.append(f"{os.path.basename(path)}:{stat.st_size}:{stat.st_mtime_ns}")
+    return '|'.join(parts)
+
+
+# -----------------------------------------------------------------------------
+# 2. LRU / TTL CACHE
+# -----------------------------------------------------------------------------
+class PredictionCache:
+    """
+    Thread-safe mapping with LRU eviction and an optional time-to-live.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl=None, clock=time.monotonic):
+        if max_entries <= 0:
+            raise ValueError("max_entries must be a positive integer")
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._clock = clock
+        self._entries = OrderedDict()  # key -> (value, stored_at)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get_many(self, keys):
+        """
+        Cached values for `keys`, with None for every miss.
+        """
+        now = self._clock()
+        found = []
+        expired = 0
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is not None and self.ttl is not None and now - entry[1] > self.ttl:
+                    del self._entries[key]
+                    expired += 1
+                    entry = None
+                if entry is None:
+                    found.append(None)
+                else:
+                    self._entries.move_to_end(key)
+                    found.append(entry[0])
+            hits = sum(value is not None for value in found)
+            self.hits += hits
+            self.misses += len(found) - hits
+            self.expirations += expired
+        CACHE_LOOKUPS.inc(hits, result='hit')
+        CACHE_LOOKUPS.inc(len(found) - hits, result='miss')
+        if expired:
+            CACHE_EVICTIONS.inc(expired, reason='ttl')
+        return found
+
+    def put_many(self, items):
+        now = self._clock()
+        evicted = 0
+        with self._lock:
+            for key, value in items:
+                self._entries[key] = (value, now)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                evicted += 1
+            self.evictions += evicted
+        if evicted:
+            CACHE_EVICTIONS.inc(evicted, reason='lru')
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {'entries': len(self._entries), 'max_entries': self.max_entries,
+                    'ttl': self.ttl, 'hits': self.hits, 'misses': self.misses,
+                    'hit_rate': self.hits / lookups if lookups else None,
+                    'evictions': self.evictions, 'expirations': self.expirations}
+
+
+# -----------------------------------------------------------------------------
+# 3. CACHED PREDICTOR
+# -----------------------------------------------------------------------------
+def quantize(X, features, resolution=None):
+    """
+    Round each column to its resolution (default: the UI step size from
+    `INPUT_BOUNDS`). Returns the rounded values and their integer grid codes.
+    """
+    steps = np.array([(resolution or {}).get(f, INPUT_BOUNDS[f][2] if f in INPUT_BOUNDS else 0.1)
+                      for f in features], dtype=np.float64)
+    codes = np.rint(np.asarray(X, dtype=np.float64) / steps).astype(np.int64)
+    return codes * steps, codes
+
+
+class CachedPredictor:
+    """
+    `ModelArtifact.predict` / `recommend` behind a `PredictionCache`, with
+    automatic reload when the artifact in `base_path` changes.
+    """
+
+    def __init__(self, base_path=SAVED_MODELS_DIR, max_entries=DEFAULT_MAX_ENTRIES, ttl=None,
+                 resolution=None, check_interval=DEFAULT_CHECK_INTERVAL):
+        self.base_path = base_path
+        self.resolution = resolution
+        self.check_interval = check_interval
+        self.cache = PredictionCache(max_entries, ttl)
+        self._reload_lock = threading.Lock()
+        self._checked_at = time.monotonic()
+        self.version = artifact_version(base_path)
+        self.artifact = load_default(base_path)
+
+    @property
+    def features(self):
+        return self.artifact.features
+
+    def refresh(self, force=False):
+        """
+        Reload the artifact if its files changed. Returns True on reload.
+        """
+        now = time.monotonic()
+        if not force and now - self._checked_at < self.check_interval:
+            return False
+        with self._reload_lock:
+            self._checked_at = now
+            version = artifact_version(self.base_path)
+            if version == self.version and not force:
+                return False
+            # Load before swapping so a bad artifact keeps the old one serving
+            artifact = load_default(self.base_path)
+            self.artifact, self.version = artifact, version
+            self.cache.clear()
+            return True
+
+    def _cached(self, frame, kind, compute):
+        """
+        Answer each distinct rounded row once: from the cache if possible,
+        otherwise with one `compute(artifact, frame_of_misses)` call.
+        """
+        self.refresh()
+        artifact, version = self.artifact, self.version
+        X = np.asarray(artifact.to_matrix(frame), dtype=np.float64)
+        finite = np.isfinite(X).all(axis=1)
+        values, inverse = [], np.empty(len(X), dtype=np.intp)
+        if finite.any():
+            rounded, codes = quantize(X[finite], artifact.features, self.resolution)
+            unique_codes, first, unique_inverse = np.unique(codes, axis=0, return_index=True,
+                                                            return_inverse=True)
+            keys = [(version, kind, row.tobytes()) for row in unique_codes]
+            values = self.cache.get_many(keys)
+            missing = [i for i, value in enumerate(values) if value is None]
+            if missing:
+                fresh = compute(artifact, pd.DataFrame(rounded[first[missing]], columns=artifact.features))
+                self.cache.put_many(zip([keys[i] for i in missing], fresh))
+                for i, value in zip(missing, fresh):
+                    values[i] = value
+            inverse[finite] = unique_inverse.reshape(-1)
+        if not finite.all():
+            # NaN/inf have no grid code: score those rows as given and keep them out of the cache
+            rows = np.flatnonzero(~finite)
+            inverse[rows] = len(values) + np.arange(len(rows))
+            values.extend(compute(artifact, pd.DataFrame(X[rows], columns=artifact.features)))
+        return values, inverse
+
+    def predict(self, frame):
+        """
+        Decoded crop names for every row of `frame`.
+        """
+        if len(frame) == 0:
+            return self.artifact.classes[:0]
+
+        def compute(artifact, rows):
+            return artifact.decode(artifact.predict_ids(rows))
+
+        values, inverse = self._cached(frame, 'predict', compute)
+        return np.asarray(values).take(inverse)
+
+    def recommend(self, frame, k=3):
+        """
+        Top-`k` crops and probabilities per row, as `ModelArtifact.recommend`.
+        """
+        if len(frame) == 0:
+            k = min(k, len(self.artifact.classes))
+            return self.artifact.classes[:0].reshape(0, k), np.empty((0, k))
+
+        def compute(artifact, rows):
+            labels, proba = artifact.recommend(rows, k)
+            return list(zip(labels, proba))
+
+        values, inverse = self._cached(frame, ('recommend', k), compute)
+        labels = np.stack([labels for labels, _ in values]).take(inverse, axis=0)
+        proba = np.stack([proba for _, proba in values]).take(inverse, axis=0)
+        return labels, proba
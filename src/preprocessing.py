@@ -0,0 +1,290 @@
+"""
+Data cleaning stage from 01_data_preprocessing_and_exploration.ipynb.
+
+The notebook renames N/P/K, then for each feature replaces values outside
+[Q1 - 1.5 IQR, Q3 + 1.5 IQR] with the column median. Here all quartiles and
+medians come from one vectorized percentile call, and the fitted bounds are
+saved so the same rule can be applied to new data at inference time.
+
+Files that do not fit in memory are cleaned in two streaming passes: the
+first feeds every chunk into a quantile sketch (relative error
+`SKETCH_ACCURACY`), the second rewrites the chunks with the fitted bounds.
+
+In-memory runs shuffle the rows with the notebook's seed (42) first, so the
+default command reproduces the committed cleaned CSV byte for byte. Runs
+that keep the row order (`--no-shuffle`, `--chunksize`) must write
+somewhere else.
+
+Usage:
+    python -m src.preprocessing clean                   # rebuild the cleaned CSV
+    python -m src.preprocessing clean big.csv out.csv --chunksize 1000000
+"""
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+from src.utils import DATA_DIR, FEATURES, SAVED_MODELS_DIR, normalize_columns
+
+RAW_CSV = os.path.join(DATA_DIR, 'Crop_recommendation.csv')
+CLEANED_CSV = os.path.join(DATA_DIR, 'Crop_recommendation_cleaned.csv')
+BOUNDS_FILE = 'outlier_bounds.json'
+
+IQR_FACTOR = 1.5
+SKETCH_ACCURACY = 1e-3
+OUTLIER_MODES = ('median', 'clip')
+NOTEBOOK_SHUFFLE_SEED = 42
+
+
+# -----------------------------------------------------------------------------
+# 1. OUTLIER BOUNDS
+# -----------------------------------------------------------------------------
+class OutlierBounds:
+    """
+    Per-feature quartiles and medians defining the IQR outlier rule.
+    """
+
+    def __init__(self, features, q1, q3, median, factor=IQR_FACTOR, approximate=False):
+        self.features = [str(name) for name in features]
+        self.q1 = np.asarray(q1, dtype=np.float64)
+        self.q3 = np.asarray(q3, dtype=np.float64)
+        self.median = np.asarray(median, dtype=np.float64)
+        self.factor = float(factor)
+        self.approximate = bool(approximate)
+
+    @property
+    def lower(self):
+        return self.q1 - self.factor * (self.q3 - self.q1)
+
+    @property
+    def upper(self):
+        return self.q3 + self.factor * (self.q3 - self.q1)
+
+    def apply(self, frame, mode='median'):
+        """
+        Return a copy of `frame` with out-of-bounds values replaced by the
+        median (as in the notebook) or clipped to the nearest bound.
+        Columns missing from `frame` are ignored; NaNs are left as they are.
+        """
+        if mode not in OUTLIER_MODES:
+            raise ValueError(f"Unknown outlier mode '{mode}'. Choose from: {', '.join(OUTLIER_MODES)}")
+        present = [i for i, f in enumerate(self.features) if f in frame.columns]
+        if not present:
+            return frame.copy()
+        columns = [self.features[i] for i in present]
+        values = frame[columns].to_numpy(dtype=np.float64)
+        lower, upper = self.lower[present], self.upper[present]
+        if mode == 'median':
+            outside = (values < lower) | (values > upper)
+            cleaned = np.where(outside, self.median[present], values)
+        else:
+            cleaned = np.clip(values, lower, upper)
+
+        frame = frame.copy()
+        for j, column in enumerate(columns):
+            frame[column] = _keep_dtype(cleaned[:, j], frame[column].dtype)
+        return frame
+
+    def to_dict(self):
+        return {'features': self.features, 'q1': self.q1.tolist(), 'q3': self.q3.tolist(),
+                'median': self.median.tolist(), 'factor': self.factor,
+                'approximate': self.approximate}
+
+
+def _keep_dtype(values, dtype):
+    # The notebook's .loc assignment keeps integer columns integer when the
+    # median is a whole number; do the same so the cleaned CSV is unchanged
+    if np.issubdtype(dtype, np.integer) and np.all(values == np.round(values)):
+        return values.astype(dtype)
+    return values
+
+
+def fit_bounds(frame, features=FEATURES, factor=IQR_FACTOR):
+    """
+    Exact quartiles and medians of all features in one vectorized pass.
+    """
+    values = normalize_columns(frame)[list(features)].to_numpy(dtype=np.float64)
+    q1, median, q3 = np.nanpercentile(values, [25, 50, 75], axis=0)
+    return OutlierBounds(features, q1, q3, median, factor)
+
+
+# -----------------------------------------------------------------------------
+# 2. STREAMING QUANTILES
+# -----------------------------------------------------------------------------
+class QuantileSketch:
+    """
+    Mergeable log-bucket quantile sketch, one per feature column.
+
+    Values are counted in buckets whose width grows geometrically, so any
+    quantile is returned within `relative_accuracy` of a true data value,
+    whatever the range. Memory depends on the spread of the data, not on
+    the number of rows.
+    """
+
+    def __init__(self, n_features, relative_accuracy=SKETCH_ACCURACY):
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = np.log(self.gamma)
+        self._min_value = 1e-9
+        self.n_features = int(n_features)
+        # Per feature: sorted signed bucket keys and their counts
+        self.keys = [np.empty(0, dtype=np.int64) for _ in range(self.n_features)]
+        self.counts = [np.empty(0, dtype=np.int64) for _ in range(self.n_features)]
+        self.count = np.zeros(self.n_features, dtype=np.int64)
+
+    def _bucket(self, values):
+        """
+        Signed bucket key: 0 for (near) zero, +/-(k + 1) for |x| in
+        (gamma^(k-1), gamma^k], so keys sort in the same order as values.
+        """
+        magnitude = np.abs(values)
+        keys = np.zeros(len(values), dtype=np.int64)
+        nonzero = magnitude > self._min_value
+        k = np.ceil(np.log(magnitude[nonzero] / self._min_value) / self._log_gamma)
+        keys[nonzero] = np.sign(values[nonzero]).astype(np.int64) * (k.astype(np.int64) + 1)
+        return keys
+
+    def _value(self, keys):
+        k = np.abs(keys) - 1
+        magnitude = self._min_value * 2 * self.gamma ** k / (self.gamma + 1)
+        return np.where(keys == 0, 0.0, np.sign(keys) * magnitude)
+
+    def update(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        for i in range(self.n_features):
+            column = X[:, i]
+            column = column[~np.isnan(column)]
+            keys = np.r_[self.keys[i], self._bucket(column)]
+            weights = np.r_[self.counts[i], np.ones(len(column), dtype=np.int64)]
+            self.keys[i], inverse = np.unique(keys, return_inverse=True)
+            self.counts[i] = np.bincount(inverse, weights=weights).astype(np.int64)
+            self.count[i] += len(column)
+        return self
+
+    def quantiles(self, q):
+        """
+        Approximate quantiles, shape (len(q), n_features).
+        """
+        q = np.atleast_1d(np.asarray(q, dtype=np.float64))
+        out = np.full((len(q), self.n_features), np.nan)
+        for i in range(self.n_features):
+            if self.count[i] == 0:
+                continue
+            cumulative = np.cumsum(self.counts[i])
+            ranks = q * (self.count[i] - 1)
+            position = np.searchsorted(cumulative, ranks, side='right')
+            out[:, i] = self._value(self.keys[i][np.minimum(position, len(cumulative) - 1)])
+        return out
+
+
+def fit_bounds_streaming(csv_path, features=FEATURES, chunksize=1_000_000,
+                         factor=IQR_FACTOR, relative_accuracy=SKETCH_ACCURACY):
+    """
+    Approximate bounds for a CSV larger than memory, read once in chunks.
+    """
+    sketch = QuantileSketch(len(features), relative_accuracy)
+    for chunk in pd.read_csv(csv_path, chunksize=chunksize):
+        sketch.update(normalize_columns(chunk)[list(features)].to_numpy(dtype=np.float64))
+    q1, median, q3 = sketch.quantiles([0.25, 0.5, 0.75])
+    return OutlierBounds(features, q1, q3, median, factor, approximate=True)
+
+
+# -----------------------------------------------------------------------------
+# 3. CLEANING
+# -----------------------------------------------------------------------------
+def clean_csv(input_path=RAW_CSV, output_path=CLEANED_CSV, chunksize=None,
+              bounds=None, shuffle_seed=NOTEBOOK_SHUFFLE_SEED, features=FEATURES):
+    """
+    Rename columns and replace outliers, returning the bounds used.
+
+    Without `chunksize` the file is cleaned in memory with exact quantiles,
+    after shuffling with `shuffle_seed` (None keeps the row order). With
+    `chunksize` it is processed in two streaming passes; row order is kept,
+    so `shuffle_seed` must be None. Pass previously fitted `bounds` to skip
+    fitting. Only the notebook's shuffle may overwrite `CLEANED_CSV`.
+    """
+    if (os.path.abspath(output_path) == os.path.abspath(CLEANED_CSV)
+            and (chunksize is not None or shuffle_seed != NOTEBOOK_SHUFFLE_SEED)):
+        raise ValueError(f"Only the notebook's shuffle (seed {NOTEBOOK_SHUFFLE_SEED}) may overwrite "
+                         f"{CLEANED_CSV}; give another output path")
+    if chunksize is None:
+        df = normalize_columns(pd.read_csv(input_path))
+        if shuffle_seed is not None:
+            df = df.sample(frac=1, random_state=shuffle_seed).reset_index(drop=True)
+        bounds = bounds or fit_bounds(df, features)
+        bounds.apply(df).to_csv(output_path, index=False)
+        return bounds
+
+    if shuffle_seed is not None:
+        raise ValueError("Shuffling is only supported for in-memory cleaning")
+    bounds = bounds or fit_bounds_streaming(input_path, features, chunksize)
+    header = True
+    for chunk in pd.read_csv(input_path, chunksize=chunksize):
+        bounds.apply(normalize_columns(chunk)).to_csv(
+            output_path, mode='w' if header else 'a', header=header, index=False)
+        header = False
+    return bounds
+
+
+# -----------------------------------------------------------------------------
+# 4. SAVE / LOAD
+# -----------------------------------------------------------------------------
+def save_bounds(bounds, path):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(bounds.to_dict(), f, indent=2)
+    os.replace(tmp_path, path)
+    return path
+
+
+def load_bounds(path):
+    with open(path) as f:
+        return OutlierBounds(**json.load(f))
+
+
+# -----------------------------------------------------------------------------
+# 5. CLI
+# -----------------------------------------------------------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Clean the crop dataset and fit outlier bounds.")
+    sub = parser.add_subparsers(dest='command', required=True)
+    clean = sub.add_parser('clean', help="Rename columns and replace IQR outliers")
+    clean.add_argument('input', nargs='?', default=RAW_CSV)
+    clean.add_argument('output', nargs='?', default=CLEANED_CSV)
+    clean.add_argument('--chunksize', type=int, default=None,
+                       help="Stream the file in chunks with approximate quantiles")
+    clean.add_argument('--shuffle-seed', type=int, default=NOTEBOOK_SHUFFLE_SEED,
+                       help="Seed for the in-memory shuffle (default: the notebook's 42)")
+    clean.add_argument('--no-shuffle', action='store_true',
+                       help="Keep the input row order (needs an output other than the cleaned CSV)")
+    clean.add_argument('--bounds', default=None,
+                       help="Apply previously saved bounds instead of fitting new ones")
+    clean.add_argument('--models', default=SAVED_MODELS_DIR,
+                       help=f"Where {BOUNDS_FILE} is written")
+    args = parser.parse_args(argv)
+
+    if args.chunksize is not None and args.chunksize <= 0:
+        parser.error("--chunksize must be a positive integer")
+    shuffle_seed = None if args.no_shuffle or args.chunksize is not None else args.shuffle_seed
+    if args.chunksize is not None and args.shuffle_seed != NOTEBOOK_SHUFFLE_SEED:
+        parser.error("--shuffle-seed cannot be combined with --chunksize")
+
+    bounds = load_bounds(args.bounds) if args.bounds else None
+    try:
+        bounds = clean_csv(args.input, args.output, args.chunksize, bounds, shuffle_seed)
+    except ValueError as e:
+        parser.error(str(e))
+    print(f"Cleaned {args.input} -> {args.output}")
+    if not args.bounds:
+        path = save_bounds(bounds, os.path.join(args.models, BOUNDS_FILE))
+        print(f"Saved {'approximate' if bounds.approximate else 'exact'} bounds -> {path}")
+    for f, lo, hi in zip(bounds.features, bounds.lower, bounds.upper):
+        print(f"  {f:<12} [{lo:.4g}, {hi:.4g}]")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
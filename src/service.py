@@ -0,0 +1,405 @@
+"""
+Standalone JSON inference server with request micro-batching.
+
+The saved model artifact is loaded once at startup. Concurrent single-row
+requests are queued and grouped into small batches: the batcher waits at
+most `window_ms` after the first queued row (or until `max_batch_size` rows
+are waiting) and then runs scaler, model and label decoding once for the
+whole batch. Every row is scored exactly as submitted unless `--cache-size`
+turns on the prediction cache (`src.prediction_cache`): it rounds rows to the
+UI input resolution, answers repeated ones from memory and reloads the
+artifact when it changes on disk. Each batch is validated in one vectorized pass before
+scoring (`src.monitoring`): rows outside the input schema get a 400 with
+the reason, and accepted rows feed streaming drift histograms whose PSI
+per feature is published every `--drift-interval` seconds.
+
+Endpoints:
+    POST /predict             {"N": 90, "P": 42, "K": 43, "temperature": 20.8, ...}
+    GET  /metrics             p50/p99 latency, batch-size, cache and drift statistics
+    GET  /metrics/prometheus  request, batch and span metrics as Prometheus text
+    GET  /health              liveness probe
+
+Usage:
+    python -m src.service --port 8000 --window-ms 5 --max-batch-size 64
+    python -m src.service --cache-size 50000    # round rows and cache their answers
+    python -m src.service --cache-size 50000 --lookup    # in-domain rows from the lookup grid
+    python -m src.service --profile    # sample stacks, written to .cache/profile/ at exit
+"""
+import argparse
+import json
+import queue
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+
+from src.artifact import load_default
+from src.instrumentation import REGISTRY, configure_from_env, prometheus_text, span, start_profiler
+from src.inference import get_predictor
+from src.monitoring import DEFAULT_DRIFT_INTERVAL, BatchValidator, DriftMonitor, InputError, load_profile
+from src.prediction_cache import DEFAULT_MAX_ENTRIES
+from src.utils import COLUMN_ALIASES, SAVED_MODELS_DIR
+
+DEFAULT_WINDOW_MS = 5.0
+DEFAULT_MAX_BATCH_SIZE = 64
+MAX_BODY_BYTES = 64 * 1024  # one JSON row is well under 1 KB
+METRICS_WINDOW = 10_000  # most recent observations kept for percentiles
+
+REQUEST_SECONDS = REGISTRY.histogram('crop_request_seconds', "End-to-end /predict latency")
+REQUESTS = REGISTRY.counter('crop_requests_total', "Handled /predict requests by outcome")
+BATCH_ROWS = REGISTRY.histogram('crop_batch_rows', "Rows per micro-batch",
+                                buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256))
+
+
+# -----------------------------------------------------------------------------
+# 1. METRICS
+# -----------------------------------------------------------------------------
+class Metrics:
+    """
+    Thread-safe rolling window of request latencies and batch sizes.
+    """
+
+    def __init__(self, window=METRICS_WINDOW):
+        self._lock = threading.Lock()
+        self._latencies_ms = deque(maxlen=window)
+        self._batch_sizes = deque(maxlen=window)
+        self.requests = 0
+        self.batches = 0
+        self.rejected = 0
+        self.errors = 0
+
+    def observe_batch(self, size):
+        BATCH_ROWS.observe(size)
+        with self._lock:
+            self._batch_sizes.append(size)
+            self.batches += 1
+
+    def observe_request(self, latency_ms, status=200):
+        """
+        Record one /predict response: 4xx counts as rejected, 5xx as an error.
+        """
+        outcome = 'ok' if status < 400 else 'rejected' if status < 500 else 'error'
+        REQUEST_SECONDS.observe(latency_ms / 1000.0)
+        REQUESTS.inc(outcome=outcome)
+        with self._lock:
+            self._latencies_ms.append(latency_ms)
+            self.requests += 1
+            if outcome == 'rejected':
+                self.rejected += 1
+            elif outcome == 'error':
+                self.errors += 1
+
+    def snapshot(self):
+        with self._lock:
+            latencies = np.fromiter(self._latencies_ms, dtype=float)
+            sizes = np.fromiter(self._batch_sizes, dtype=float)
+            requests, batches, rejected, errors = self.requests, self.batches, self.rejected, self.errors
+
+        def pct(values, q):
+            return float(np.percentile(values, q)) if values.size else None
+
+        return {
+            'requests': requests,
+            'batches': batches,
+            'rejected': rejected,
+            'errors': errors,
+            'latency_ms': {'p50': pct(latencies, 50), 'p99': pct(latencies, 99),
+                           'max': float(latencies.max()) if latencies.size else None},
+            'batch_size': {'mean': float(sizes.mean()) if sizes.size else None,
+                           'p50': pct(sizes, 50), 'p99': pct(sizes, 99),
+                           'max': int(sizes.max()) if sizes.size else None},
+        }
+
+
+# -----------------------------------------------------------------------------
+# 2. MICRO-BATCHER
+# -----------------------------------------------------------------------------
+class MicroBatcher:
+    """
+    Collect single rows from many threads and score them in batches.
+
+    `predict_fn` receives a DataFrame of rows and must return one label per
+    row, or an exception instance for a row it rejects. Each `submit` call
+    returns a Future resolved with that row's label.
+    """
+
+    def __init__(self, predict_fn, window_ms=DEFAULT_WINDOW_MS,
+                 max_batch_size=DEFAULT_MAX_BATCH_SIZE, metrics=None):
+        self.predict_fn = predict_fn
+        self.window = window_ms / 1000.0
+        self.max_batch_size = max_batch_size
+        self.metrics = metrics or Metrics()
+        self._queue = queue.Queue()
+        self._stopped = threading.Event()
+        self._worker = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+        self._worker.start()
+
+    def submit(self, row):
+        future = Future()
+        self._queue.put((row, future))
+        return future
+
+    def close(self):
+        self._stopped.set()
+        self._worker.join()
+
+    def _collect(self):
+        """
+        Block for the first row, then gather more until the window closes.
+        """
+        try:
+            batch = [self._queue.get(timeout=0.1)]
+        except queue.Empty:
+            return []
+        deadline = time.perf_counter() + self.window
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while not self._stopped.is_set():
+            batch = self._collect()
+            if not batch:
+                continue
+            rows = [row for row, _ in batch]
+            self.metrics.observe_batch(len(batch))
+            try:
+                with span('batch'):
+                    labels = self.predict_fn(pd.DataFrame.from_records(rows))
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future), label in zip(batch, labels):
+                if isinstance(label, Exception):
+                    future.set_exception(label)
+                else:
+                    future.set_result(label)
+
+
+# -----------------------------------------------------------------------------
+# 3. HTTP LAYER
+# -----------------------------------------------------------------------------
+def parse_row(payload, features):
+    """
+    Validate a JSON object and return it keyed by the model's feature names.
+    """
+    if not isinstance(payload, dict):
+        raise ValueError("Request body must be a JSON object")
+    payload = {COLUMN_ALIASES.get(key, key): value for key, value in payload.items()}
+    missing = [name for name in features if name not in payload]
+    if missing:
+        raise ValueError(f"Missing features: {', '.join(missing)}")
+    try:
+        return {name: float(payload[name]) for name in features}
+    except (TypeError, ValueError):
+        raise ValueError("All feature values must be numeric") from None
+
+
+class InferenceHandler(BaseHTTPRequestHandler):
+    server_version = 'CropRecommendation/1.0'
+
+    def _send_json(self, status, body):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == '/health':
+            self._send_json(200, {'status': 'ok'})
+        elif self.path == '/metrics':
+            snapshot = self.server.batcher.metrics.snapshot()
+            cache = getattr(self.server.predictor, 'cache', None)
+            snapshot['cache'] = cache.stats() if cache is not None else None
+            drift = self.server.drift
+            snapshot['drift'] = drift.snapshot() if drift is not None else None
+            self._send_json(200, snapshot)
+        elif self.path == '/metrics/prometheus':
+            if self.server.drift is not None:
+                self.server.drift.poll()  # publish an overdue window even when traffic stopped
+            data = prometheus_text().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        else:
+            self._send_json(404, {'error': 'Not found'})
+
+    def do_POST(self):
+        if self.path != '/predict':
+            self._send_json(404, {'error': 'Not found'})
+            return
+        start = time.perf_counter()
+        metrics = self.server.batcher.metrics
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+        except ValueError:
+            length = -1
+        if not 0 <= length <= MAX_BODY_BYTES:
+            # Never read a body of unknown or excessive size; read(-1) would wait for EOF
+            status = 413 if length > MAX_BODY_BYTES else 400
+            metrics.observe_request((time.perf_counter() - start) * 1000, status=status)
+            self.close_connection = True
+            self._send_json(status, {'error': f"Content-Length must be between 0 and {MAX_BODY_BYTES}"})
+            return
+        try:
+            row = parse_row(json.loads(self.rfile.read(length) or b'null'), self.server.predictor.features)
+        except ValueError as e:  # also covers json.JSONDecodeError
+            metrics.observe_request((time.perf_counter() - start) * 1000, status=400)
+            self._send_json(400, {'error': str(e)})
+            return
+
+        try:
+            crop = self.server.batcher.submit(row).result(timeout=self.server.request_timeout)
+        except InputError as e:
+            metrics.observe_request((time.perf_counter() - start) * 1000, status=400)
+            self._send_json(400, {'error': str(e)})
+            return
+        except Exception as e:
+            metrics.observe_request((time.perf_counter() - start) * 1000, status=500)
+            self._send_json(500, {'error': f"Prediction error: {e}"})
+            return
+        metrics.observe_request((time.perf_counter() - start) * 1000)
+        self._send_json(200, {'crop': str(crop)})
+
+    def log_message(self, format, *args):
+        # Per-request access logs are too noisy under load; use /metrics
+        pass
+
+
+class InferenceServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default backlog of 5 resets connections under concurrent load
+    request_queue_size = 128
+
+
+def validated(predictor, validator, drift=None):
+    """
+    Wrap `predictor.predict` so each batch is validated first. Rejected rows
+    come back as InputError instances; accepted rows feed `drift`.
+    """
+    drift_columns = ([validator.features.index(f) for f in drift.profile.features]
+                     if drift is not None else None)
+
+    def predict(frame):
+        result = validator.check(frame)
+        labels = np.empty(len(frame), dtype=object)
+        valid = result.valid
+        if valid.any():
+            X = result.X[valid]
+            if drift is not None:
+                drift.observe(X[:, drift_columns])
+            labels[valid] = predictor.predict(pd.DataFrame(X, columns=validator.features))
+        for i in np.flatnonzero(~valid):
+            labels[i] = InputError(result.error(i))
+        return labels
+
+    return predict
+
+
+def build_server(host='127.0.0.1', port=8000, window_ms=DEFAULT_WINDOW_MS,
+                 max_batch_size=DEFAULT_MAX_BATCH_SIZE, base_path=SAVED_MODELS_DIR,
+                 request_timeout=10.0, cache_size=0, cache_ttl=None,
+                 validate=True, drift_interval=DEFAULT_DRIFT_INTERVAL, lookup=False):
+    """
+    Load the model artifact once and return a ready-to-serve HTTP server.
+    With `cache_size=0` every row is scored as submitted and the artifact is
+    never reloaded. A positive `cache_size` answers rows rounded to the UI
+    input resolution from the prediction cache.
+    With `lookup`, in-domain rows are answered from the lookup grid
+    (`src.lookup_grid`) while it matches the model.
+    With `validate`, batches are checked against the input schema and drift
+    is tracked when a training profile is available.
+    """
+    if cache_size:
+        predictor = get_predictor(base_path, lookup=lookup, max_entries=cache_size, ttl=cache_ttl)
+    else:
+        predictor = load_default(base_path)
+    predict_fn, drift = predictor.predict, None
+    if validate:
+        profile = load_profile(base_path)
+        validator = BatchValidator(predictor.features, profile=profile)
+        if profile is not None:
+            drift = DriftMonitor(profile.subset(predictor.features), interval=drift_interval)
+        predict_fn = validated(predictor, validator, drift)
+    server = InferenceServer((host, port), InferenceHandler)
+    server.predictor = predictor
+    server.drift = drift
+    server.request_timeout = request_timeout
+    server.batcher = MicroBatcher(predict_fn, window_ms=window_ms, max_batch_size=max_batch_size)
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve crop recommendations over HTTP.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--window-ms', type=float, default=DEFAULT_WINDOW_MS,
+                        help="Max time to wait for more rows after the first one in a batch")
+    parser.add_argument('--max-batch-size', type=int, default=DEFAULT_MAX_BATCH_SIZE)
+    parser.add_argument('--models', default=SAVED_MODELS_DIR,
+                        help="Directory containing the saved model artifact")
+    parser.add_argument('--cache-size', type=int, default=0,
+                        help=f"Prediction cache entries, e.g. {DEFAULT_MAX_ENTRIES}. Cached rows are rounded to "
+                             "the app's input resolution (default: 0, score rows as submitted)")
+    parser.add_argument('--cache-ttl', type=float, default=None,
+                        help="Seconds before a cached prediction expires (default: never)")
+    parser.add_argument('--lookup', action='store_true',
+                        help="Answer in-domain rows from the precomputed lookup grid")
+    parser.add_argument('--no-validate', action='store_true',
+                        help="Skip batch validation and drift monitoring")
+    parser.add_argument('--drift-interval', type=float, default=DEFAULT_DRIFT_INTERVAL,
+                        help="Seconds between drift (PSI) updates")
+    parser.add_argument('--profile', action='store_true',
+                        help="Run the sampling profiler and write collapsed stacks at exit")
+    args = parser.parse_args(argv)
+
+    if args.window_ms < 0:
+        parser.error("--window-ms must be >= 0")
+    if args.max_batch_size <= 0:
+        parser.error("--max-batch-size must be a positive integer")
+    if args.cache_size < 0:
+        parser.error("--cache-size must be >= 0")
+    if args.cache_ttl is not None and args.cache_ttl <= 0:
+        parser.error("--cache-ttl must be positive")
+    if args.lookup and not args.cache_size:
+        parser.error("--lookup needs the prediction cache (--cache-size > 0)")
+    if args.drift_interval <= 0:
+        parser.error("--drift-interval must be positive")
+
+    configure_from_env()
+    if args.profile:
+        start_profiler()
+    server = build_server(args.host, args.port, args.window_ms, args.max_batch_size, args.models,
+                          cache_size=args.cache_size, cache_ttl=args.cache_ttl,
+                          validate=not args.no_validate, drift_interval=args.drift_interval,
+                          lookup=args.lookup)
+    print(f"Serving on http://{args.host}:{args.port} "
+          f"(window={args.window_ms}ms, max batch={args.max_batch_size})", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.batcher.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
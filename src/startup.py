@@ -0,0 +1,271 @@
+"""
+Fast startup for the Streamlit apps.
+
+Importing sklearn (and xgboost, when the model uses it) and unpickling the
+model take well over a second, and used to happen before the first widget
+was drawn. The app now imports only streamlit, the standard library and
+light `src` modules at module level, and hands model loading to `warm_up`.
+That starts a background thread once per process and returns a
+`WarmupTask`. The page renders while the thread runs, and the prediction
+handler calls `task.result()`, which only blocks if the model is not ready
+yet.
+
+Tasks live in this module rather than in the app script, so Streamlit
+reruns and new sessions reuse the model already loaded (like
+`st.cache_resource`).
+
+`python -m src.startup report` measures both startup orders in fresh
+interpreters. "Eager" is the old order: import everything, then load the
+model, then render. "Lazy" lets the script go on as soon as streamlit is
+imported and loads in the background. Without streamlit the report can only
+time when the script is unblocked (free to draw its first widget). With
+streamlit installed it also times the actual first render: a complete first
+script run of app/app.py through `streamlit.testing`, in both orders.
+
+Usage:
+    python -m src.startup report
+    python -m src.startup report --models saved_models --runs 5
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import Future
+
+from src.utils import PROJECT_ROOT, SAVED_MODELS_DIR
+
+APP_DIR = os.path.join(PROJECT_ROOT, 'app')
+APP_FILE = os.path.join(APP_DIR, 'app.py')
+# Modules the apps used to import before rendering anything
+EAGER_MODULES = ('streamlit', 'joblib', 'numpy', 'pandas', 'PIL.Image', 'sklearn.ensemble')
+
+
+# -----------------------------------------------------------------------------
+# 1. BACKGROUND WARM-UP
+# -----------------------------------------------------------------------------
+class WarmupTask:
+    """
+    Runs `loader()` once on a daemon thread; `result()` waits for it.
+    """
+
+    def __init__(self, name, loader):
+        self.name = name
+        self.seconds = None
+        self._future = Future()
+        self._thread = threading.Thread(target=self._run, args=(loader,),
+                                        name=f'warmup-{name}', daemon=True)
+        self._thread.start()
+
+    def _run(self, loader):
+        start = time.perf_counter()
+        try:
+            self._future.set_result(loader())
+        except BaseException as e:  # surfaced to the caller of result()
+            self._future.set_exception(e)
+        finally:
+            self.seconds = time.perf_counter() - start
+
+    def ready(self):
+        return self._future.done()
+
+    def failed(self):
+        return self.exception() is not None
+
+    def exception(self):
+        """
+        The error raised by the loader, or None if it succeeded or is running.
+        """
+        return self._future.exception() if self._future.done() else None
+
+    def result(self, timeout=None):
+        return self._future.result(timeout)
+
+
+_tasks = {}
+_tasks_lock = threading.Lock()
+
+
+def warm_up(name, loader):
+    """
+    Start `loader` in the background under `name`, once per process.
+    Later calls with the same name return the existing task; a failed task
+    is restarted so a fixed model directory is picked up on the next rerun.
+    """
+    with _tasks_lock:
+        task = _tasks.get(name)
+        if task is None or task.failed():
+            task = _tasks[name] = WarmupTask(name, loader)
+        return task
+
+
+# -----------------------------------------------------------------------------
+# 2. STARTUP REPORT
+# -----------------------------------------------------------------------------
+_PROBE = r"""
+import importlib, json, sys, time
+start = time.perf_counter()
+mode, models, modules = sys.argv[1], sys.argv[2], sys.argv[3].split(',')
+missing = []
+
+def load(name):
+    try:
+        importlib.import_module(name)
+    except ImportError:
+        missing.append(name)
+
+def load_model():
+    from src.artifact import load_default
+    return load_default(models)
+
+if mode == 'eager':
+    for name in modules:
+        load(name)
+    imports_s = time.perf_counter() - start
+    load_model()
+    unblocked_s = ready_s = time.perf_counter() - start
+else:
+    load('streamlit')
+    from src.startup import warm_up
+    task = warm_up('model', load_model)
+    imports_s = unblocked_s = time.perf_counter() - start
+    task.result()
+    ready_s = time.perf_counter() - start
+print(json.dumps({'imports_s': imports_s, 'ui_unblocked_s': unblocked_s,
+                  'model_ready_s': ready_s, 'missing': missing}))
+"""
+
+# Time until the first complete script run of the app, i.e. its first render
+_APP_RUN = r"""
+import importlib, os, sys, time
+start = time.perf_counter()
+mode, app, models, modules = sys.argv[1], sys.argv[2], sys.argv[3], sys.argv[4].split(',')
+os.environ['CROP_MODELS_DIR'] = models
+if mode == 'eager':
+    for name in modules:
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            pass
+    from src.inference import get_predictor
+    from src.startup import warm_up
+    # The app picks up this finished task instead of starting its own
+    warm_up('predictor', lambda: get_predictor(models)).result()
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file(app, default_timeout=60).run()
+if at.exception:
+    raise SystemExit(f"{app} raised during its first run: {at.exception}")
+print(time.perf_counter() - start)
+"""
+
+
+def _python(*args):
+    out = subprocess.run([sys.executable, *args], cwd=PROJECT_ROOT, capture_output=True,
+                         text=True, check=True)
+    return out.stdout.strip().splitlines()[-1]
+
+
+def _median(values):
+    values = sorted(values)
+    mid = len(values) // 2
+    return values[mid] if len(values) % 2 else (values[mid - 1] + values[mid]) / 2
+
+
+def probe_startup(mode, base_path=SAVED_MODELS_DIR, runs=5):
+    """
+    Median import, UI-unblocked and model-ready times over fresh interpreters.
+    """
+    samples = [json.loads(_python('-c', _PROBE, mode, base_path, ','.join(EAGER_MODULES)))
+               for _ in range(runs)]
+    result = {key: _median([s[key] for s in samples])
+              for key in ('imports_s', 'ui_unblocked_s', 'model_ready_s')}
+    result['missing'] = samples[0]['missing']
+    return result
+
+
+def import_costs(modules=EAGER_MODULES, top=8):
+    """
+    Cumulative `-X importtime` cost of each top-level module, largest first.
+    """
+    code = '\n'.join(f"try:\n    import {m}\nexcept ImportError:\n    pass" for m in modules)
+    out = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=PROJECT_ROOT,
+                         capture_output=True, text=True, check=True)
+    costs = {}
+    for line in out.stderr.splitlines():
+        parts = line.split('|')
+        # Nested imports are indented; top-level ones have a single leading space
+        if len(parts) == 3 and parts[1].strip().isdigit() and not parts[2].startswith('  '):
+            costs[parts[2].strip()] = int(parts[1]) / 1e6
+    wanted = set(modules) | {m.split('.')[0] for m in modules}
+    return sorted(((name, s) for name, s in costs.items() if name in wanted),
+                  key=lambda item: -item[1])[:top]
+
+
+def app_first_render(base_path=SAVED_MODELS_DIR, runs=3, app=APP_FILE):
+    """
+    Median seconds from interpreter start to the end of the app's first
+    script run, for each startup order; None without streamlit.
+    """
+    try:
+        import streamlit.testing.v1  # noqa: F401
+    except ImportError:
+        return None
+    return {mode: _median([float(_python('-c', _APP_RUN, mode, app, base_path, ','.join(EAGER_MODULES)))
+                           for _ in range(runs)])
+            for mode in ('eager', 'lazy')}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure Streamlit app startup.")
+    sub = parser.add_subparsers(dest='command', required=True)
+    report = sub.add_parser('report', help="Import-time and startup-order report")
+    report.add_argument('--models', default=SAVED_MODELS_DIR,
+                        help="Directory containing the saved model artifact")
+    report.add_argument('--runs', type=int, default=5)
+    report.add_argument('--output', default=None, help="Also write the report as JSON")
+    args = parser.parse_args(argv)
+
+    if args.runs <= 0:
+        parser.error("--runs must be a positive integer")
+
+    results = {'imports': import_costs(),
+               'eager': probe_startup('eager', args.models, args.runs),
+               'lazy': probe_startup('lazy', args.models, args.runs),
+               'first_render': app_first_render(args.models, min(args.runs, 3))}
+
+    print("Top-level import cost (cumulative):")
+    for name, seconds in results['imports']:
+        print(f"  {name:<20} {seconds * 1e3:8.1f} ms")
+    missing = results['eager']['missing']
+    if missing:
+        print(f"  not installed: {', '.join(missing)}")
+    print(f"\n{'':<8}{'imports':>10}{'UI unblocked':>15}{'model ready':>14}")
+    for mode in ('eager', 'lazy'):
+        r = results[mode]
+        print(f"{mode:<8}{r['imports_s'] * 1e3:>8.0f}ms{r['ui_unblocked_s'] * 1e3:>13.0f}ms"
+              f"{r['model_ready_s'] * 1e3:>12.0f}ms")
+    # Eager startup unblocks the script only once the model is loaded, by construction,
+    # so this is a head start, not a render time
+    lazy = results['lazy']
+    head_start = lazy['model_ready_s'] - lazy['ui_unblocked_s']
+    print(f"\nLazy startup frees the script {head_start * 1e3:.0f} ms before the model is ready.")
+    render = results['first_render']
+    if render is None:
+        print("streamlit is not installed; the first render itself was not measured.")
+    else:
+        saved = render['eager'] - render['lazy']
+        print(f"First render of {os.path.relpath(APP_FILE, PROJECT_ROOT)} (first complete script run): "
+              f"eager {render['eager'] * 1e3:.0f} ms, lazy {render['lazy'] * 1e3:.0f} ms, "
+              f"{saved * 1e3:.0f} ms ({saved / render['eager']:.0%}) earlier.")
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
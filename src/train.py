@@ -0,0 +1,457 @@
+"""
+Scriptable, parallel and cached model selection.
+
+Replaces the notebook's serial GridSearchCV / RandomizedSearchCV cells and
+the separate `cross_val_score` calls per model:
+
+* One set of CV folds (KFold, 5 splits, shuffled with seed 42) is shared by
+  every candidate, so scores are directly comparable.
+* Every (candidate, fold) fit is an independent task run on a process pool.
+* Each finished fold is cached on disk under a key made of the training data
+  hash, the model name, its parameters and the fold definition. A re-run, or
+  a run resumed after an interruption, only fits what is missing; adding one
+  candidate costs only that candidate.
+* `--search halving` runs successive halving instead: candidates start on a
+  small share of the training rows and only the best advance to more data,
+  optionally within a wall-clock or fit-time budget.
+
+Usage:
+    python -m src.train --candidates baselines dt-grid rf-random --n-jobs -1
+    python -m src.train --candidates RTRFC --features selected --save
+    python -m src.train --candidates dt-grid rf-random --search halving --budget-s 300
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import joblib
+import numpy as np
+from sklearn.model_selection import KFold, train_test_split
+from sklearn.preprocessing import StandardScaler
+
+from src.dataset import load_dataset
+from src.models import candidate_set, make_estimator
+from src.preprocessing import CLEANED_CSV
+from src.utils import FEATURES, PROJECT_ROOT, SAVED_MODELS_DIR, SELECTED_FEATURES
+
+CACHE_DIR = os.path.join(PROJECT_ROOT, '.cache', 'cv')
+N_SPLITS = 5
+SEED = 42
+FEATURE_SETS = {'full': FEATURES, 'selected': SELECTED_FEATURES}
+# Smallest default resource share for successive halving (~6 training rows per crop)
+MIN_FRACTION = 0.1
+
+
+# -----------------------------------------------------------------------------
+# 1. DATA
+# -----------------------------------------------------------------------------
+def prepare_data(csv_path=CLEANED_CSV, features=FEATURES, test_size=0.2):
+    """
+    Load the cached columns and class codes (see `src.dataset`), split 80/20
+    and fit the scaler on the training part only, as in the training notebook.
+    """
+    dataset = load_dataset(csv_path)
+    classes, y = dataset.classes, np.asarray(dataset.codes, dtype=np.intp)
+    X_train_raw, X_test_raw, y_train, y_test = train_test_split(
+        dataset.frame(features, np.float64), y, test_size=test_size, random_state=SEED)
+    scaler = StandardScaler().fit(X_train_raw)
+    return {
+        'features': list(features),
+        'classes': classes,
+        'scaler': scaler,
+        'X_train': scaler.transform(X_train_raw),
+        'X_test': scaler.transform(X_test_raw),
+        'y_train': y_train,
+        'y_test': y_test,
+    }
+
+
+def data_hash(X, y):
+    digest = hashlib.sha256()
+    for array in (np.ascontiguousarray(X), np.ascontiguousarray(y)):
+        digest.update(str((array.dtype, array.shape)).encode())
+        digest.update(array.tobytes())
+    return digest.hexdigest()
+
+
+def shared_folds(n_rows, n_splits=N_SPLITS, seed=SEED):
+    return list(KFold(n_splits=n_splits, shuffle=True, random_state=seed).split(np.arange(n_rows)))
+
+
+# -----------------------------------------------------------------------------
+# 2. FOLD CACHE
+# -----------------------------------------------------------------------------
+def candidate_key(name, params):
+    return f"{name}:{json.dumps(params, sort_keys=True, default=str)}"
+
+
+class FoldCache:
+    """
+    One small joblib file per (data, candidate, fold) result.
+    """
+
+    def __init__(self, root, data_digest, fold_spec):
+        self.root = root
+        self.prefix = f"{data_digest}|{fold_spec}"
+
+    def _path(self, name, params, fold):
+        key = hashlib.sha256(f"{self.prefix}|{candidate_key(name, params)}|{fold}".encode())
+        return os.path.join(self.root, key.hexdigest()[:2], f"{key.hexdigest()}.joblib")
+
+    def get(self, name, params, fold):
+        path = self._path(name, params, fold)
+        if not os.path.exists(path):
+            return None
+        try:
+            return joblib.load(path)
+        except Exception:
+            return None  # half-written or corrupt entry: just refit
+
+    def put(self, name, params, fold, result):
+        path = self._path(name, params, fold)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        joblib.dump(result, tmp_path)
+        os.replace(tmp_path, path)
+
+
+# -----------------------------------------------------------------------------
+# 3. PARALLEL CV
+# -----------------------------------------------------------------------------
+_WORKER = {}
+
+
+def _init_worker(X, y, folds):
+    _WORKER.update(X=X, y=y, folds=folds)
+
+
+def _fit_fold(name, params, fold):
+    X, y = _WORKER['X'], _WORKER['y']
+    train_idx, val_idx = _WORKER['folds'][fold]
+    estimator = make_estimator(name, params)
+    start = time.perf_counter()
+    estimator.fit(X[train_idx], y[train_idx])
+    fit_time = time.perf_counter() - start
+    predictions = np.asarray(estimator.predict(X[val_idx]))
+    return {
+        'score': float(np.mean(predictions == y[val_idx])),
+        'fit_time': fit_time,
+        'predictions': predictions.astype(np.uint8),
+    }
+
+
+def subsample_folds(folds, fraction, seed=SEED):
+    """
+    Keep a seeded random `fraction` of each fold's training rows; the
+    validation rows are untouched so scores stay comparable across fractions.
+    """
+    if fraction >= 1.0:
+        return folds
+    rng = np.random.default_rng(seed)
+    subsampled = []
+    for train_idx, val_idx in folds:
+        n_train = max(1, int(round(len(train_idx) * fraction)))
+        subsampled.append((np.sort(rng.permutation(train_idx)[:n_train]), val_idx))
+    return subsampled
+
+
+def cross_validate(candidates, X, y, n_jobs=-1, cache_dir=CACHE_DIR,
+                   n_splits=N_SPLITS, seed=SEED, fraction=1.0, stop=None, log=None):
+    """
+    Score every (name, params) candidate on shared folds. Returns one dict
+    per candidate with its fold scores, mean/std accuracy and how many folds
+    came from the cache.
+
+    With `fraction` < 1 each fold trains on that share of its training rows
+    (used by `successive_halving`); those results are cached separately.
+    `stop(result)` is called after every new fit; once it returns True no
+    further fits are started and candidates with missing folds are left out.
+    Fits already running still finish and are cached for the next run.
+    """
+    folds = subsample_folds(shared_folds(len(X), n_splits, seed), fraction, seed)
+    fold_spec = f"kfold{n_splits}-seed{seed}"
+    if fraction < 1.0:
+        fold_spec += f"-frac{fraction:.6g}"
+    cache = FoldCache(cache_dir, data_hash(X, y), fold_spec)
+    results = {candidate_key(n, p): {'name': n, 'params': p, 'folds': {}, 'cached': 0}
+               for n, p in candidates}
+
+    pending = []
+    for key, entry in results.items():
+        for fold in range(n_splits):
+            hit = cache.get(entry['name'], entry['params'], fold)
+            if hit is None:
+                pending.append((key, fold))
+            else:
+                entry['folds'][fold] = hit
+                entry['cached'] += 1
+
+    if log:
+        log(f"{len(results)} candidates x {n_splits} folds: "
+            f"{len(results) * n_splits - len(pending)} cached, {len(pending)} to fit")
+
+    step = max(1, len(pending) // 10)
+
+    def record(done, key, fold, result):
+        entry = results[key]
+        entry['folds'][fold] = result
+        cache.put(entry['name'], entry['params'], fold, result)
+        if log and (done % step == 0 or done == len(pending)):
+            log(f"  {done}/{len(pending)} fits")
+        return stop is not None and stop(result)
+
+    workers = os.cpu_count() if n_jobs in (None, -1) else max(1, n_jobs)
+    if pending and workers == 1:
+        _init_worker(X, y, folds)
+        for done, (key, fold) in enumerate(pending, 1):
+            if record(done, key, fold, _fit_fold(results[key]['name'], results[key]['params'], fold)):
+                break
+    elif pending:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(X, y, folds)) as pool:
+            futures = {pool.submit(_fit_fold, results[key]['name'], results[key]['params'], fold):
+                       (key, fold) for key, fold in pending}
+            stopping = False
+            for done, future in enumerate(as_completed(futures), 1):
+                if future.cancelled():
+                    continue
+                key, fold = futures[future]
+                if record(done, key, fold, future.result()) and not stopping:
+                    # Drop the queued fits; the running ones are still recorded and cached
+                    stopping = True
+                    for other in futures:
+                        other.cancel()
+
+    summary = []
+    for entry in results.values():
+        if len(entry['folds']) < n_splits:
+            continue
+        scores = np.array([entry['folds'][f]['score'] for f in range(n_splits)])
+        summary.append({
+            'name': entry['name'],
+            'params': entry['params'],
+            'scores': scores,
+            'mean': float(scores.mean()),
+            'std': float(scores.std()),
+            'fit_time': float(sum(entry['folds'][f]['fit_time'] for f in range(n_splits))),
+            'cached': entry['cached'],
+        })
+    summary.sort(key=lambda r: -r['mean'])
+    return summary
+
+
+# -----------------------------------------------------------------------------
+# 4. BUDGETED SEARCH
+# -----------------------------------------------------------------------------
+# Ensembles grow their trees as the budget rises instead of their training rows
+TREE_RESOURCE_MODELS = ('random_forest', 'xgboost')
+MIN_TREES = 10
+
+
+def halving_schedule(n_candidates, factor=3, min_fraction=None):
+    """
+    Resource fraction used at each rung. Every rung gives the surviving
+    candidates factor times more, finishing at the full configuration. By
+    default the first rung is sized so the last one scores about `factor`
+    candidates, without going below `MIN_FRACTION`.
+    """
+    if min_fraction is None:
+        n_rungs = 1
+        while factor ** n_rungs < n_candidates and float(factor) ** -n_rungs >= MIN_FRACTION:
+            n_rungs += 1
+        min_fraction = float(factor) ** -(n_rungs - 1)
+    fractions = [min(1.0, min_fraction)]
+    while fractions[-1] < 1.0:
+        fractions.append(min(1.0, fractions[-1] * factor))
+    return fractions
+
+
+def _with_resource(name, params, fraction):
+    """
+    The candidate as trained at `fraction` of its budget: fewer trees for
+    ensembles, otherwise unchanged (the rows are subsampled instead).
+    """
+    if fraction < 1.0 and name in TREE_RESOURCE_MODELS:
+        n_trees = params.get('n_estimators', 100)
+        return {**params, 'n_estimators': max(MIN_TREES, int(round(n_trees * fraction)))}
+    return params
+
+
+def successive_halving(candidates, X, y, factor=3, min_fraction=None, budget_s=None,
+                       cpu_budget_s=None, n_jobs=-1, cache_dir=CACHE_DIR,
+                       n_splits=N_SPLITS, seed=SEED, log=None):
+    """
+    Successive halving over the shared CV folds.
+
+    All candidates start with a small share of their resource: fewer trees
+    for forests and boosting, fewer training rows for the other models. After
+    every rung only the best 1/factor go on with factor times more, and the
+    survivors of the last rung are scored exactly as `cross_validate` would.
+
+    The search stops as soon as the wall-clock (`budget_s`) or summed
+    fit-time (`cpu_budget_s`) budget is spent. The ranking then comes from the
+    last rung that finished, and a re-run with a larger budget resumes from
+    the cached folds.
+
+    Returns (summary, report): the leaderboard and the fits (cached or new)
+    and full-fit equivalents the search used, next to the size of the full
+    grid.
+    """
+    start = time.perf_counter()
+    candidates = list({candidate_key(*c): c for c in candidates}.values())
+    report = {'rungs': [], 'fits': 0, 'fits_full_grid': len(candidates) * n_splits,
+              'cost': 0.0, 'fit_time': 0.0, 'complete': False}
+
+    def out_of_budget(result=None):
+        if result is not None:
+            report['fit_time'] += result['fit_time']
+        return ((budget_s is not None and time.perf_counter() - start >= budget_s)
+                or (cpu_budget_s is not None and report['fit_time'] >= cpu_budget_s))
+
+    survivors, summary = list(candidates), []
+    for rung, fraction in enumerate(halving_schedule(len(candidates), factor, min_fraction)):
+        if out_of_budget():
+            break
+        if log:
+            log(f"Rung {rung}: {len(survivors)} candidates at {fraction:.1%} of their trees "
+                f"or training rows")
+        rung_summary = []
+        for trees in (True, False):
+            group = [(name, params) for name, params in survivors
+                     if (name in TREE_RESOURCE_MODELS) == trees]
+            if not group or out_of_budget():
+                continue
+            scaled = [(name, _with_resource(name, params, fraction)) for name, params in group]
+            unique = list({candidate_key(*c): c for c in scaled}.values())
+            rows = cross_validate(unique, X, y, n_jobs=n_jobs, cache_dir=cache_dir,
+                                  n_splits=n_splits, seed=seed,
+                                  fraction=1.0 if trees else fraction, stop=out_of_budget, log=log)
+            report['fits'] += len(rows) * n_splits
+            report['cost'] += len(rows) * n_splits * fraction
+            # Configurations differing only in tree count can coincide at a rung
+            originals = {}
+            for reduced, candidate in zip(scaled, group):
+                originals.setdefault(candidate_key(*reduced), []).append(candidate)
+            for row in rows:
+                for name, params in originals[candidate_key(row['name'], row['params'])]:
+                    rung_summary.append({**row, 'name': name, 'params': params})
+        rung_summary.sort(key=lambda r: -r['mean'])
+
+        finished = len(rung_summary) == len(survivors)
+        report['rungs'].append({'fraction': fraction, 'candidates': len(survivors),
+                                'finished': finished})
+        if finished or not summary:
+            summary = rung_summary
+        if not finished:
+            break
+        if fraction >= 1.0:
+            report['complete'] = True
+            break
+        keep = max(1, int(np.ceil(len(survivors) / factor)))
+        survivors = [(row['name'], row['params']) for row in summary[:keep]]
+
+    if log and not report['complete']:
+        if report['rungs'] and report['rungs'][0]['finished']:
+            log("Budget spent before the final rung; ranking is from the last finished rung")
+        else:
+            log(f"Budget spent during the first rung; only {len(summary)} of "
+                f"{len(candidates)} candidates were scored")
+    report['seconds'] = time.perf_counter() - start
+    return summary, report
+
+
+# -----------------------------------------------------------------------------
+# 5. CLI
+# -----------------------------------------------------------------------------
+def refit_best(best, data):
+    """
+    Fit the winning candidate on the whole training split and wrap it in a
+    model artifact together with the scaler, classes and feature order.
+    """
+    from src.artifact import ModelArtifact
+
+    model = make_estimator(best['name'], best['params']).fit(data['X_train'], data['y_train'])
+    test_accuracy = float(np.mean(model.predict(data['X_test']) == data['y_test']))
+    artifact = ModelArtifact(model, data['scaler'], data['classes'], data['features'],
+                             metadata={'source': 'src.train', 'params': best['params'],
+                                       'cv_accuracy': best['mean'],
+                                       'test_accuracy': test_accuracy})
+    return artifact, test_accuracy
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Parallel, cached model selection.")
+    parser.add_argument('--candidates', nargs='+', default=['baselines'],
+                        help="Candidate sets: baselines, dt-grid, rf-random or a baseline "
+                             "key (LR, DTC, RFC, RFCT, RTRFC, SVM, XGBC)")
+    parser.add_argument('--features', choices=sorted(FEATURE_SETS), default='full')
+    parser.add_argument('--data', default=CLEANED_CSV)
+    parser.add_argument('--n-jobs', type=int, default=-1)
+    parser.add_argument('--cache-dir', default=CACHE_DIR)
+    parser.add_argument('--search', choices=['grid', 'halving'], default='grid',
+                        help="grid: score every candidate on full folds; halving: "
+                             "successive halving, dropping weak candidates early")
+    parser.add_argument('--factor', type=int, default=3,
+                        help="Halving: keep the best 1/factor candidates per rung")
+    parser.add_argument('--min-fraction', type=float, default=None,
+                        help="Halving: training-data share of the first rung")
+    parser.add_argument('--budget-s', type=float, default=None,
+                        help="Halving: wall-clock budget in seconds")
+    parser.add_argument('--cpu-budget-s', type=float, default=None,
+                        help="Halving: budget of summed fit time in seconds")
+    parser.add_argument('--top', type=int, default=10, help="Leaderboard rows to print")
+    parser.add_argument('--save', action='store_true',
+                        help="Refit the best candidate and save it as the model artifact")
+    parser.add_argument('--models', default=SAVED_MODELS_DIR)
+    args = parser.parse_args(argv)
+
+    def log(message):
+        print(message, file=sys.stderr)
+
+    candidates = []
+    for name, params in (c for group in args.candidates for c in candidate_set(group)):
+        try:
+            make_estimator(name, params)
+        except ImportError as e:
+            log(f"Skipping {name}: {e}")
+            continue
+        candidates.append((name, params))
+    data = prepare_data(args.data, FEATURE_SETS[args.features])
+
+    start = time.perf_counter()
+    if args.search == 'halving':
+        summary, report = successive_halving(
+            candidates, data['X_train'], data['y_train'], factor=args.factor,
+            min_fraction=args.min_fraction, budget_s=args.budget_s,
+            cpu_budget_s=args.cpu_budget_s, n_jobs=args.n_jobs, cache_dir=args.cache_dir, log=log)
+        full = report['fits_full_grid']
+        log(f"Successive halving: {report['fits']} fits ({report['cost']:.0f} full-fit "
+            f"equivalents) vs {full} for the full grid, {1 - report['cost'] / full:.0%} "
+            f"of the training work saved")
+        if not summary:
+            log("Budget spent before any candidate finished its folds")
+            return 1
+    else:
+        summary = cross_validate(candidates, data['X_train'], data['y_train'],
+                                 n_jobs=args.n_jobs, cache_dir=args.cache_dir, log=log)
+    log(f"Cross-validation finished in {time.perf_counter() - start:.1f}s")
+
+    print(f"{'rank':>4} {'cv acc':>7} {'std':>6}  model / params")
+    for rank, row in enumerate(summary[:args.top], 1):
+        print(f"{rank:>4} {row['mean']:>7.4f} {row['std']:>6.4f}  {row['name']} {row['params']}")
+
+    if args.save:
+        from src.artifact import ARTIFACT_FILE, save_artifact
+
+        artifact, test_accuracy = refit_best(summary[0], data)
+        path = save_artifact(artifact, os.path.join(args.models, ARTIFACT_FILE))
+        print(f"Saved best model ({summary[0]['name']}, test accuracy {test_accuracy:.4f}) -> {path}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
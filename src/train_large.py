@@ -0,0 +1,610 @@
+"""
+Out-of-core, parallel Random Forest training for very large survey files.
+
+`src.train` loads the training split into memory and lets sklearn grow
+every tree on it. That stops working at tens of millions of rows. This
+entry point keeps memory bounded by the chunk size:
+
+1. Data: the CSV is parsed once into the memory-mapped column cache of
+   `src.dataset`. Rows are assigned to the 80/20 train/test split by a hash
+   of their index, so no split has to be stored.
+2. Binning, in two streaming passes over the training rows:
+   * the first feeds `StandardScaler.partial_fit` and a quantile sketch,
+     which give at most `max_bins` cut points per feature;
+   * the second writes every row as uint8 bin codes, a 1-byte-per-value
+     copy of the data on disk.
+   Cut points are stored in scaled float32 units, so a row's bin code
+   agrees exactly with the comparison a sklearn tree makes on it.
+3. Trees are grown level by level. For every level, one pass over the bin
+   codes accumulates class histograms per (node, feature, bin) with a
+   single `np.bincount` per chunk. The best split of every node is then
+   read off the cumulative histograms. Per level, the memory is one chunk
+   plus the histograms of the nodes being split; when those exceed
+   `hist_budget_mb`, the level takes several passes. Bootstrap samples are
+   Poisson(1) row weights, seeded per tree and chunk, so no index arrays
+   are kept either.
+4. Parallelism: trees are independent tasks on a process pool. Workers
+   memory-map the same bin file, so no data is pickled or copied between
+   processes.
+
+The result is a regular sklearn RandomForestClassifier in the usual model
+artifact, so the app, `src.compiled`, `src.folding` and `src.incremental`
+work with it unchanged. `scaling` fits the same trees with 1, 2, 4 ... N
+worker processes and reports speedup and parallel efficiency.
+
+Usage:
+    python -m src.train_large synth 20000000 data/survey_20m.csv
+    python -m src.train_large fit data/survey_20m.csv --n-jobs -1 --save
+    python -m src.train_large scaling data/survey_20m.csv --trees 16
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import StandardScaler
+from sklearn.tree import DecisionTreeClassifier
+
+from src.dataset import load_dataset
+from src.models import BASELINES
+from src.preprocessing import CLEANED_CSV, QuantileSketch
+from src.utils import FEATURES, PROJECT_ROOT, SAVED_MODELS_DIR, SELECTED_FEATURES, TARGET
+
+BINNED_DIR = os.path.join(PROJECT_ROOT, '.cache', 'binned')
+FEATURE_SETS = {'full': FEATURES, 'selected': SELECTED_FEATURES}
+DEFAULT_MODEL = 'RTRFC'
+MAX_BINS = 64
+CHUNK_ROWS = 250_000
+HIST_BUDGET_MB = 64
+TEST_SIZE = 0.2
+SEED = 42
+_HASH_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+
+
+# -----------------------------------------------------------------------------
+# 1. TRAIN/TEST SPLIT AND BINNING
+# -----------------------------------------------------------------------------
+def is_test(start, stop, test_size=TEST_SIZE, seed=SEED):
+    """
+    Holdout mask for rows [start, stop), from a hash of the row index, so
+    every chunk size and every worker agrees on the split.
+    """
+    h = (np.arange(start, stop, dtype=np.uint64) + np.uint64(seed)) * _HASH_MULTIPLIER
+    h ^= h >> np.uint64(29)
+    h *= _HASH_MULTIPLIER
+    h ^= h >> np.uint64(32)
+    return (h >> np.uint64(11)).astype(np.float64) * 2.0 ** -53 < test_size
+
+
+def chunks(n_rows, chunk_rows=CHUNK_ROWS):
+    for start in range(0, n_rows, chunk_rows):
+        yield start, min(start + chunk_rows, n_rows)
+
+
+def _raw(dataset, features, start, stop):
+    return pd.DataFrame({f: np.asarray(dataset.columns[f][start:stop], dtype=np.float64)
+                         for f in features})
+
+
+class BinnedData:
+    """
+    uint8 bin codes (n_rows x n_features) on disk with the class codes, the
+    cut points in scaled float32 units and the scaler fit on the train rows.
+    """
+
+    def __init__(self, directory, mmap_mode='r'):
+        with open(os.path.join(directory, 'binning.json')) as f:
+            header = json.load(f)
+        self.directory = directory
+        self.features = header['features']
+        self.classes = np.asarray(header['classes'])
+        self.n_rows = header['n_rows']
+        self.test_size = header['test_size']
+        self.seed = header['seed']
+        self.cuts = np.asarray(header['cuts'], dtype=np.float32)
+        self.scaler = joblib.load(os.path.join(directory, 'scaler.joblib'))
+        shape = (self.n_rows, len(self.features))
+        self.bins = (np.memmap(os.path.join(directory, 'bins.u8'), dtype=np.uint8, mode=mmap_mode,
+                               shape=shape) if self.n_rows else np.empty(shape, dtype=np.uint8))
+        self.codes = (np.memmap(os.path.join(directory, 'codes.u8'), dtype=np.uint8, mode=mmap_mode,
+                                shape=(self.n_rows,)) if self.n_rows else np.empty(0, dtype=np.uint8))
+
+    @property
+    def n_bins(self):
+        return self.cuts.shape[1] + 1
+
+
+def _bin_codes(scaled, cuts):
+    out = np.empty(scaled.shape, dtype=np.uint8)
+    for j in range(scaled.shape[1]):
+        out[:, j] = np.searchsorted(cuts[j], scaled[:, j], side='left')
+    return out
+
+
+def _midpoint_cuts(cuts, low, high):
+    """
+    Move each cut point to the middle of the gap between the training values
+    on either side, as sklearn places its thresholds. No training value lies
+    in the gap, so the bin codes already written stay valid.
+    """
+    below = np.maximum.accumulate(high, axis=1)[:, :-1]
+    above = np.minimum.accumulate(low[:, ::-1], axis=1)[:, ::-1][:, 1:]
+    with np.errstate(invalid='ignore', over='ignore'):
+        mid = ((below.astype(np.float64) + above) / 2).astype(np.float32)
+    mid = np.where(mid < above, np.maximum(mid, below), below)  # adjacent float32 values
+    return np.where(np.isfinite(below) & np.isfinite(above), mid, cuts)
+
+
+def bin_dataset(csv_path, features=FEATURES, max_bins=MAX_BINS, test_size=TEST_SIZE, seed=SEED,
+                chunk_rows=CHUNK_ROWS, cache_dir=BINNED_DIR, log=None):
+    """
+    Binned copy of `csv_path`, built on first use (two streaming passes)
+    and memory-mapped afterwards. Entries are keyed by the file contents and
+    the binning settings.
+    """
+    if not 2 <= max_bins <= 256:
+        raise ValueError("max_bins must be between 2 and 256")
+    dataset = load_dataset(csv_path, features, log=log)
+    features = list(features)
+    key = hashlib.sha256(json.dumps([dataset.source_hash, features, max_bins, test_size, seed])
+                         .encode()).hexdigest()[:16]
+    directory = os.path.join(cache_dir, f"{os.path.splitext(os.path.basename(csv_path))[0]}-{key}")
+    if os.path.exists(os.path.join(directory, 'binning.json')):
+        return BinnedData(directory)
+
+    if log:
+        log(f"Binning {dataset.n_rows:,} rows into {max_bins} bins per feature")
+    scaler = StandardScaler()
+    sketch = QuantileSketch(len(features))
+    for start, stop in chunks(dataset.n_rows, chunk_rows):
+        X = _raw(dataset, features, start, stop)[~is_test(start, stop, test_size, seed)]
+        if len(X):
+            scaler.partial_fit(X)
+            sketch.update(X.to_numpy())
+    if not getattr(scaler, 'n_samples_seen_', 0):
+        raise ValueError(f"{csv_path} has no training rows")
+
+    # Cut points in the units the trees compare: float32 of the scaled value
+    raw_cuts = pd.DataFrame(sketch.quantiles(np.arange(1, max_bins) / max_bins), columns=features)
+    scaled_cuts = np.asarray(scaler.transform(raw_cuts), dtype=np.float32).T
+    cuts = np.full((len(features), max_bins - 1), np.inf, dtype=np.float32)
+    for j, column in enumerate(scaled_cuts):
+        unique = np.unique(column[np.isfinite(column)])
+        cuts[j, :len(unique)] = unique
+
+    tmp_dir = f"{directory}.{os.getpid()}.tmp"
+    os.makedirs(tmp_dir, exist_ok=True)
+    low = np.full((len(features), max_bins), np.inf, dtype=np.float32)
+    high = np.full((len(features), max_bins), -np.inf, dtype=np.float32)
+    with open(os.path.join(tmp_dir, 'bins.u8'), 'wb') as out, \
+            open(os.path.join(tmp_dir, 'codes.u8'), 'wb') as codes:
+        for start, stop in chunks(dataset.n_rows, chunk_rows):
+            scaled = np.asarray(scaler.transform(_raw(dataset, features, start, stop)), dtype=np.float32)
+            binned = _bin_codes(scaled, cuts)
+            out.write(binned.tobytes())
+            codes.write(np.asarray(dataset.codes[start:stop]).tobytes())
+            train = ~is_test(start, stop, test_size, seed)
+            for j in range(len(features)):
+                np.minimum.at(low[j], binned[train, j], scaled[train, j])
+                np.maximum.at(high[j], binned[train, j], scaled[train, j])
+    cuts = _midpoint_cuts(cuts, low, high)
+    joblib.dump(scaler, os.path.join(tmp_dir, 'scaler.joblib'))
+    header = {'source': os.path.abspath(csv_path), 'features': features,
+              'classes': [str(c) for c in dataset.classes], 'n_rows': dataset.n_rows,
+              'test_size': test_size, 'seed': seed, 'cuts': cuts.tolist()}
+    with open(os.path.join(tmp_dir, 'binning.json'), 'w') as f:
+        json.dump(header, f)
+    os.makedirs(cache_dir, exist_ok=True)
+    try:
+        os.replace(tmp_dir, directory)
+    except OSError:
+        shutil.rmtree(tmp_dir, ignore_errors=True)  # another process finished first
+    return BinnedData(directory)
+
+
+# -----------------------------------------------------------------------------
+# 2. HISTOGRAM TREE GROWING
+# -----------------------------------------------------------------------------
+def _impurity(counts, criterion):
+    """
+    Gini or entropy (bits) of class counts along the last axis.
+    """
+    total = counts.sum(axis=-1, keepdims=True)
+    p = counts / np.maximum(total, 1e-300)
+    if criterion == 'gini':
+        return 1.0 - (p * p).sum(axis=-1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return -np.where(p > 0, p * np.log2(p), 0.0).sum(axis=-1)
+
+
+def _max_features(value, n_features):
+    if value in (None, 1.0):
+        return n_features
+    if value == 'sqrt':
+        return max(1, int(np.sqrt(n_features)))
+    if value == 'log2':
+        return max(1, int(np.log2(n_features)))
+    if isinstance(value, float):
+        return max(1, int(value * n_features))
+    return int(value)
+
+
+class _TreeBuilder:
+    """
+    Node arrays of one tree while it grows; `route` sends rows to leaves.
+    """
+
+    def __init__(self, n_classes):
+        self.left, self.right, self.feature, self.bin = [-1], [-1], [-2], [0]
+        self.value = [np.zeros(n_classes)]
+        self.depth = [0]
+
+    def add(self, depth, n_classes):
+        self.left.append(-1)
+        self.right.append(-1)
+        self.feature.append(-2)
+        self.bin.append(0)
+        self.value.append(np.zeros(n_classes))
+        self.depth.append(depth)
+        return len(self.left) - 1
+
+    def route(self, bins):
+        left, right = np.asarray(self.left), np.asarray(self.right)
+        feature, split_bin = np.asarray(self.feature), np.asarray(self.bin)
+        node = np.zeros(len(bins), dtype=np.intp)
+        rows = np.arange(len(bins))
+        for _ in range(max(self.depth) + 1):
+            f = feature[node]
+            internal = f >= 0
+            if not internal.any():
+                break
+            go_left = bins[rows, np.maximum(f, 0)] <= split_bin[node]
+            node = np.where(internal, np.where(go_left, left[node], right[node]), node)
+        return node
+
+
+def grow_tree(data, params, seed, chunk_rows=CHUNK_ROWS, hist_budget_mb=HIST_BUDGET_MB):
+    """
+    Grow one tree on the train rows of `data` (a BinnedData). Returns a dict
+    of node arrays: children, split feature and bin, class weights per node.
+    """
+    n_features, n_bins, n_classes = len(data.features), data.n_bins, len(data.classes)
+    criterion = params.get('criterion', 'gini')
+    max_depth = params.get('max_depth') or np.iinfo(np.int32).max
+    min_split = params.get('min_samples_split', 2)
+    min_leaf = max(1, params.get('min_samples_leaf', 1))
+    n_candidates = _max_features(params.get('max_features', 'sqrt'), n_features)
+    bootstrap = params.get('bootstrap', True)
+    rng = np.random.default_rng(seed)
+    per_node = n_features * n_bins * n_classes
+    group_size = max(1, int(hist_budget_mb * 2 ** 20 // (per_node * 8)))
+
+    tree = _TreeBuilder(n_classes)
+    frontier = [0]
+    while frontier:
+        next_frontier = []
+        for g in range(0, len(frontier), group_size):
+            group = frontier[g:g + group_size]
+            slot_of = np.full(len(tree.left), -1, dtype=np.intp)
+            slot_of[group] = np.arange(len(group))
+            hist = np.zeros(len(group) * per_node)
+            for start, stop in chunks(data.n_rows, chunk_rows):
+                weight = (~is_test(start, stop, data.test_size, data.seed)).astype(np.float64)
+                if bootstrap:
+                    weight *= np.random.default_rng([seed, start]).poisson(1.0, stop - start)
+                bins = np.asarray(data.bins[start:stop])
+                slot = slot_of[tree.route(bins)]
+                keep = (slot >= 0) & (weight > 0)
+                if not keep.any():
+                    continue
+                index = ((slot[keep, None] * n_features + np.arange(n_features)) * n_bins
+                         + bins[keep]) * n_classes + data.codes[start:stop][keep, None]
+                hist += np.bincount(index.ravel(), weights=np.repeat(weight[keep], n_features),
+                                    minlength=len(hist))
+            hist = hist.reshape(len(group), n_features, n_bins, n_classes)
+
+            for node, node_hist in zip(group, hist):
+                total = node_hist[0].sum(axis=0)
+                tree.value[node] = total
+                n = total.sum()
+                parent = _impurity(total, criterion)
+                if tree.depth[node] >= max_depth or n < min_split or n < 2 * min_leaf or parent <= 0:
+                    continue
+                left = np.cumsum(node_hist, axis=1)[:, :-1]  # features x split bin x classes
+                n_left = left.sum(axis=-1)
+                n_right = n - n_left
+                gain = parent - (n_left * _impurity(left, criterion)
+                                 + n_right * _impurity(total - left, criterion)) / n
+                gain[(n_left < min_leaf) | (n_right < min_leaf)] = -np.inf
+                # Like sklearn: max_features random features, skipping those
+                # that cannot be split in this node
+                splittable = np.isfinite(gain).any(axis=1)
+                order = [f for f in rng.permutation(n_features) if splittable[f]][:n_candidates]
+                if not order:
+                    continue
+                feature = order[int(np.argmax(gain[order].max(axis=1)))]
+                split_bin = int(np.argmax(gain[feature]))
+                tree.feature[node], tree.bin[node] = int(feature), split_bin
+                tree.left[node] = tree.add(tree.depth[node] + 1, n_classes)
+                tree.right[node] = tree.add(tree.depth[node] + 1, n_classes)
+                next_frontier += [tree.left[node], tree.right[node]]
+        frontier = next_frontier
+
+    return {'left': np.asarray(tree.left), 'right': np.asarray(tree.right),
+            'feature': np.asarray(tree.feature), 'bin': np.asarray(tree.bin),
+            'value': np.asarray(tree.value), 'depth': int(max(tree.depth))}
+
+
+# -----------------------------------------------------------------------------
+# 3. SKLEARN FOREST
+# -----------------------------------------------------------------------------
+def _node_dtype():
+    tiny = DecisionTreeClassifier(max_depth=1).fit([[0.0], [1.0]], [0, 1])
+    return tiny.tree_.__getstate__()['nodes'].dtype
+
+
+def to_sklearn_tree(arrays, cuts, n_classes, params):
+    """
+    A fitted DecisionTreeClassifier with the grown splits. A split on bin b
+    of feature f becomes `x[f] <= cuts[f, b]`, exactly the rows in bins <= b.
+    """
+    from sklearn.tree._tree import Tree
+
+    n_features = cuts.shape[0]
+    leaf = arrays['left'] == -1
+    nodes = np.zeros(len(leaf), dtype=_node_dtype())
+    nodes['left_child'] = arrays['left']
+    nodes['right_child'] = arrays['right']
+    nodes['feature'] = np.where(leaf, -2, arrays['feature'])
+    nodes['threshold'] = np.where(leaf, -2.0, cuts[np.maximum(arrays['feature'], 0), arrays['bin']])
+    weights = arrays['value']
+    nodes['weighted_n_node_samples'] = weights.sum(axis=1)
+    nodes['n_node_samples'] = np.rint(weights.sum(axis=1)).astype(np.int64)
+    nodes['impurity'] = _impurity(weights, params.get('criterion', 'gini'))
+    values = weights / np.maximum(weights.sum(axis=1, keepdims=True), 1e-300)
+
+    tree = Tree(n_features, np.array([n_classes], dtype=np.intp), 1)
+    tree.__setstate__({'max_depth': arrays['depth'], 'node_count': len(nodes), 'nodes': nodes,
+                       'values': values[:, None, :]})
+    estimator = DecisionTreeClassifier(**{k: v for k, v in params.items()
+                                          if k in DecisionTreeClassifier().get_params()})
+    estimator.tree_ = tree
+    estimator.n_features_in_ = n_features
+    estimator.n_outputs_ = 1
+    estimator.classes_ = np.arange(n_classes)
+    estimator.n_classes_ = n_classes
+    estimator.max_features_ = _max_features(params.get('max_features', 'sqrt'), n_features)
+    return estimator
+
+
+def to_sklearn_forest(trees, cuts, n_classes, params):
+    forest = RandomForestClassifier(**{**params, 'n_estimators': len(trees)})
+    forest.estimators_ = [to_sklearn_tree(t, cuts, n_classes, params) for t in trees]
+    forest.estimator_ = DecisionTreeClassifier()
+    forest.n_features_in_ = cuts.shape[0]
+    forest.n_outputs_ = 1
+    forest.classes_ = np.arange(n_classes)
+    forest.n_classes_ = n_classes
+    return forest
+
+
+# -----------------------------------------------------------------------------
+# 4. PARALLEL TRAINING
+# -----------------------------------------------------------------------------
+_WORKER = {}
+
+
+def _init_worker(directory, params, chunk_rows, hist_budget_mb):
+    _WORKER.update(data=BinnedData(directory), params=params, chunk_rows=chunk_rows,
+                   hist_budget_mb=hist_budget_mb)
+
+
+def _grow(seed):
+    w = _WORKER
+    return grow_tree(w['data'], w['params'], seed, w['chunk_rows'], w['hist_budget_mb'])
+
+
+def tree_seeds(n_trees, random_state=SEED):
+    return np.random.default_rng(random_state).integers(0, 2 ** 31 - 1, size=n_trees).tolist()
+
+
+def grow_forest(data, params, n_trees, n_jobs=-1, chunk_rows=CHUNK_ROWS,
+                hist_budget_mb=HIST_BUDGET_MB):
+    """
+    Grow `n_trees` trees on `n_jobs` worker processes (one tree per task).
+    """
+    seeds = tree_seeds(n_trees, params.get('random_state', SEED))
+    workers = os.cpu_count() if n_jobs in (None, -1) else max(1, n_jobs)
+    initargs = (data.directory, params, chunk_rows, hist_budget_mb)
+    if workers == 1:
+        _init_worker(*initargs)
+        return [_grow(seed) for seed in seeds]
+    with ProcessPoolExecutor(max_workers=min(workers, n_trees), initializer=_init_worker,
+                             initargs=initargs) as pool:
+        return list(pool.map(_grow, seeds))
+
+
+def holdout_accuracy(model, data, csv_path, chunk_rows=CHUNK_ROWS):
+    """
+    Accuracy on the hashed test rows, streamed in chunks.
+    """
+    dataset = load_dataset(csv_path, data.features)
+    correct = total = 0
+    for start, stop in chunks(data.n_rows, chunk_rows):
+        test = is_test(start, stop, data.test_size, data.seed)
+        if not test.any():
+            continue
+        X = data.scaler.transform(_raw(dataset, data.features, start, stop)[test])
+        correct += int((model.predict(X) == dataset.codes[start:stop][test]).sum())
+        total += int(test.sum())
+    return correct / total if total else float('nan')
+
+
+def train(csv_path=CLEANED_CSV, features=FEATURES, model=DEFAULT_MODEL, n_trees=None, n_jobs=-1,
+          max_bins=MAX_BINS, chunk_rows=CHUNK_ROWS, hist_budget_mb=HIST_BUDGET_MB, log=None):
+    """
+    Bin, grow and evaluate a forest. Returns (ModelArtifact, report dict).
+    """
+    from src.artifact import ModelArtifact
+
+    name, params = BASELINES[model]
+    if name != 'random_forest':
+        raise ValueError(f"{model} is not a Random Forest configuration")
+    params = dict(params)
+    if n_trees:
+        params['n_estimators'] = n_trees
+
+    start = time.perf_counter()
+    data = bin_dataset(csv_path, features, max_bins, chunk_rows=chunk_rows, log=log)
+    bin_seconds = time.perf_counter() - start
+    if log:
+        log(f"Growing {params['n_estimators']} trees on {data.n_rows:,} rows "
+            f"({data.n_bins} bins, n_jobs={n_jobs})")
+    start = time.perf_counter()
+    trees = grow_forest(data, params, params['n_estimators'], n_jobs, chunk_rows, hist_budget_mb)
+    grow_seconds = time.perf_counter() - start
+    forest = to_sklearn_forest(trees, data.cuts, len(data.classes), params)
+    accuracy = holdout_accuracy(forest, data, csv_path, chunk_rows)
+
+    report = {'rows': data.n_rows, 'bins': data.n_bins, 'trees': len(trees),
+              'bin_seconds': bin_seconds, 'grow_seconds': grow_seconds,
+              'test_accuracy': accuracy}
+    artifact = ModelArtifact(forest, data.scaler, data.classes, data.features,
+                             metadata={'source': 'src.train_large', 'model': model, 'params': params,
+                                       'max_bins': data.n_bins, 'rows': data.n_rows,
+                                       'test_accuracy': accuracy})
+    return artifact, report
+
+
+def scaling_report(csv_path=CLEANED_CSV, features=FEATURES, model=DEFAULT_MODEL, n_trees=8,
+                   max_jobs=None, max_bins=MAX_BINS, chunk_rows=CHUNK_ROWS, log=None):
+    """
+    Grow the same `n_trees` trees with 1, 2, 4 ... `max_jobs` processes.
+    Binning is done once beforehand and is not part of the timings.
+    """
+    params = {**BASELINES[model][1], 'n_estimators': n_trees}
+    data = bin_dataset(csv_path, features, max_bins, chunk_rows=chunk_rows, log=log)
+    max_jobs = max_jobs or os.cpu_count()
+    jobs = sorted({min(2 ** i, max_jobs) for i in range(int(np.log2(max_jobs)) + 2)})
+    rows = []
+    for n_jobs in jobs:
+        start = time.perf_counter()
+        grow_forest(data, params, n_trees, n_jobs, chunk_rows)
+        seconds = time.perf_counter() - start
+        speedup = rows[0]['seconds'] / seconds if rows else 1.0
+        rows.append({'n_jobs': n_jobs, 'seconds': seconds, 'speedup': speedup,
+                     'efficiency': speedup / n_jobs})
+        if log:
+            log(f"  n_jobs={n_jobs}: {seconds:.2f}s")
+    return {'rows': data.n_rows, 'trees': n_trees, 'cpu_count': os.cpu_count(), 'runs': rows}
+
+
+def write_synthetic(n_rows, output_path, chunk_rows=1_000_000, seed=SEED):
+    """
+    Write a survey-like CSV of `n_rows` (resampled Kaggle rows plus noise)
+    chunk by chunk, for trying the pipeline at scale.
+    """
+    from src.benchmarks import synthetic_dataset
+
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    for i, (start, stop) in enumerate(chunks(n_rows, chunk_rows)):
+        frame = synthetic_dataset(stop - start, seed=seed + i)
+        frame[FEATURES + [TARGET]].to_csv(output_path, mode='w' if i == 0 else 'a',
+                                          header=i == 0, index=False)
+    return output_path
+
+
+# -----------------------------------------------------------------------------
+# 5. CLI
+# -----------------------------------------------------------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Out-of-core parallel Random Forest training.")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    def common(cmd):
+        cmd.add_argument('data', nargs='?', default=CLEANED_CSV)
+        cmd.add_argument('--features', choices=sorted(FEATURE_SETS), default='selected')
+        cmd.add_argument('--model', default=DEFAULT_MODEL,
+                         choices=[k for k, (name, _) in BASELINES.items() if name == 'random_forest'])
+        cmd.add_argument('--max-bins', type=int, default=MAX_BINS)
+        cmd.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS)
+
+    fit = sub.add_parser('fit', help="Train a forest and report holdout accuracy")
+    common(fit)
+    fit.add_argument('--trees', type=int, default=None, help="Override the model's n_estimators")
+    fit.add_argument('--n-jobs', type=int, default=-1)
+    fit.add_argument('--hist-budget-mb', type=float, default=HIST_BUDGET_MB,
+                     help="Histogram memory per worker and tree level")
+    fit.add_argument('--save', action='store_true', help="Save the model artifact")
+    fit.add_argument('--models', default=SAVED_MODELS_DIR)
+
+    scaling = sub.add_parser('scaling', help="Time tree growing at 1, 2, 4 ... N processes")
+    common(scaling)
+    scaling.add_argument('--trees', type=int, default=8)
+    scaling.add_argument('--max-jobs', type=int, default=None, help="Default: all CPUs")
+    scaling.add_argument('--output', default=None, help="Also write the report as JSON")
+
+    synth = sub.add_parser('synth', help="Write a large synthetic survey CSV")
+    synth.add_argument('rows', type=int)
+    synth.add_argument('output')
+    args = parser.parse_args(argv)
+
+    def log(message):
+        print(message, file=sys.stderr)
+
+    if args.command == 'synth':
+        if args.rows <= 0:
+            parser.error("rows must be a positive integer")
+        start = time.perf_counter()
+        write_synthetic(args.rows, args.output)
+        print(f"Wrote {args.rows:,} rows -> {args.output} in {time.perf_counter() - start:.1f}s")
+        return 0
+
+    if not os.path.exists(args.data):
+        parser.error(f"Input file not found: {args.data}")
+    if not 2 <= args.max_bins <= 256:
+        parser.error("--max-bins must be between 2 and 256")
+    if args.chunk_rows <= 0:
+        parser.error("--chunk-rows must be a positive integer")
+    if args.trees is not None and args.trees <= 0:
+        parser.error("--trees must be a positive integer")
+    features = FEATURE_SETS[args.features]
+
+    if args.command == 'scaling':
+        if args.max_jobs is not None and args.max_jobs <= 0:
+            parser.error("--max-jobs must be a positive integer")
+        report = scaling_report(args.data, features, args.model, args.trees, args.max_jobs,
+                                args.max_bins, args.chunk_rows, log=log)
+        print(f"{report['trees']} trees on {report['rows']:,} rows, {report['cpu_count']} CPUs")
+        print(f"{'n_jobs':>6}{'seconds':>10}{'speedup':>9}{'efficiency':>12}")
+        for row in report['runs']:
+            print(f"{row['n_jobs']:>6}{row['seconds']:>10.2f}{row['speedup']:>8.2f}x"
+                  f"{row['efficiency']:>11.0%}")
+        if args.output:
+            os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+            with open(args.output, 'w') as f:
+                json.dump(report, f, indent=2)
+        return 0
+
+    artifact, report = train(args.data, features, args.model, args.trees, args.n_jobs,
+                             args.max_bins, args.chunk_rows, args.hist_budget_mb, log=log)
+    print(f"{report['trees']} trees on {report['rows']:,} rows: binning {report['bin_seconds']:.1f}s, "
+          f"growing {report['grow_seconds']:.1f}s, holdout accuracy {report['test_accuracy']:.4f}")
+    if args.save:
+        from src.artifact import ARTIFACT_FILE, save_artifact
+
+        path = save_artifact(artifact, os.path.join(args.models, ARTIFACT_FILE))
+        print(f"Saved -> {path}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
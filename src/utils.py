@@ -0,0 +1,79 @@
+"""
+Shared helpers: project paths, the feature schema used during training and
+loading of the saved model files outside of Streamlit.
+"""
+import os
+
+# -----------------------------------------------------------------------------
+# 1. PROJECT PATHS
+# -----------------------------------------------------------------------------
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+SAVED_MODELS_DIR = os.path.join(PROJECT_ROOT, 'saved_models')
+DATA_DIR = os.path.join(PROJECT_ROOT, 'data')
+
+MODEL_FILE = 'crop_recommendation_model.pkl'
+SCALER_FILE = 'scaler.pkl'
+ENCODER_FILE = 'label_encoder.pkl'
+
+# -----------------------------------------------------------------------------
+# 2. FEATURE SCHEMA
+# -----------------------------------------------------------------------------
+# Full feature order used in 02_model_training._model_selection.ipynb
+FEATURES = ['Nitrogen', 'Phosphorous', 'Potassium', 'temperature', 'humidity', 'ph', 'rainfall']
+
+# Reduced feature order of the deployed Random Forest (top-5 importances)
+SELECTED_FEATURES = ['Potassium', 'humidity', 'rainfall', 'Nitrogen', 'Phosphorous']
+
+# The raw Kaggle CSV uses N/P/K; the preprocessing notebook renames them
+COLUMN_ALIASES = {'N': 'Nitrogen', 'P': 'Phosphorous', 'K': 'Potassium'}
+
+TARGET = 'label'
+
+# Input domain of the Streamlit number_input widgets: (min, max, step)
+INPUT_BOUNDS = {
+    'Nitrogen': (0.0, 140.0, 1.0),
+    'Phosphorous': (0.0, 145.0, 1.0),
+    'Potassium': (0.0, 205.0, 1.0),
+    'temperature': (0.0, 60.0, 0.1),
+    'humidity': (0.0, 100.0, 0.1),
+    'ph': (0.0, 14.0, 0.1),
+    'rainfall': (0.0, 500.0, 0.1),
+}
+
+
+def normalize_columns(df):
+    """
+    Rename raw N/P/K columns to the names used during training.
+    """
+    return df.rename(columns=COLUMN_ALIASES)
+
+
+def feature_order(scaler):
+    """
+    Return the feature order the scaler (and therefore the model) was fit on.
+    """
+    names = getattr(scaler, 'feature_names_in_', None)
+    if names is not None:
+        return [str(name) for name in names]
+    if scaler.n_features_in_ == len(FEATURES):
+        return list(FEATURES)
+    if scaler.n_features_in_ == len(SELECTED_FEATURES):
+        return list(SELECTED_FEATURES)
+    raise ValueError(f"Cannot infer feature order for a scaler with {scaler.n_features_in_} features")
+
+
+# -----------------------------------------------------------------------------
+# 3. MODEL LOADING
+# -----------------------------------------------------------------------------
+def load_tools(base_path=SAVED_MODELS_DIR):
+    """
+    Load the saved model, scaler, and label encoder from `base_path`.
+    Raises FileNotFoundError if any of the three files is missing.
+    """
+    # Imported here so that importing the schema above stays cheap
+    import joblib
+
+    model = joblib.load(os.path.join(base_path, MODEL_FILE))
+    scaler = joblib.load(os.path.join(base_path, SCALER_FILE))
+    encoder = joblib.load(os.path.join(base_path, ENCODER_FILE))
+    return model, scaler, encoder
@@ -0,0 +1,47 @@
+"""
+Shared fixtures: a small model trained on the cleaned Kaggle data, so the
+tests do not depend on what is in saved_models/.
+"""
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+from sklearn.preprocessing import StandardScaler
+
+from src.artifact import ModelArtifact, save_artifact
+from src.dataset import load_dataset
+from src.preprocessing import CLEANED_CSV
+from src.utils import SELECTED_FEATURES
+
+
+@pytest.fixture(scope='session')
+def crop_data():
+    dataset = load_dataset(CLEANED_CSV)
+    frame = dataset.frame(SELECTED_FEATURES, np.float64)
+    return frame, np.asarray(dataset.codes, dtype=np.intp), dataset.classes
+
+
+def _artifact(crop_data, model):
+    frame, y, classes = crop_data
+    scaler = StandardScaler().fit(frame)
+    model.fit(scaler.transform(frame), y)
+    return ModelArtifact(model, scaler, classes, SELECTED_FEATURES, metadata={'version': 1})
+
+
+@pytest.fixture(scope='session')
+def forest_artifact(crop_data):
+    return _artifact(crop_data, RandomForestClassifier(n_estimators=20, max_depth=12, random_state=0))
+
+
+@pytest.fixture(scope='session')
+def linear_artifact(crop_data):
+    return _artifact(crop_data, LogisticRegression(max_iter=1000))
+
+
+@pytest.fixture
+def models_dir(tmp_path, forest_artifact):
+    """
+    A saved_models/ directory holding the forest as the live artifact.
+    """
+    save_artifact(forest_artifact, str(tmp_path / 'crop_recommendation.joblib'))
+    return str(tmp_path)
@@ -0,0 +1,35 @@
+import numpy as np
+import pandas as pd
+
+from src.artifact import top_k
+from src.inference import recommend
+
+
+def test_top_k_breaks_ties_by_column_like_a_stable_sort():
+    proba = np.array([[0.0, 0.0, 0.5, 0.0, 0.5, 0.0],
+                      [0.2, 0.2, 0.2, 0.2, 0.2, 0.0],
+                      [0.0, 0.0, 0.0, 0.0, 0.0, 1.0],
+                      [0.1, 0.3, 0.0, 0.3, 0.0, 0.3]])
+    for k in range(1, 7):
+        ids, values = top_k(proba, k)
+        expected = np.argsort(-proba, axis=1, kind='stable')[:, :k]
+        np.testing.assert_array_equal(ids, expected)
+        np.testing.assert_array_equal(values, np.take_along_axis(proba, expected, axis=1))
+
+
+def test_top_k_matches_stable_argsort_on_forest_rows(forest_artifact, crop_data):
+    proba = forest_artifact.predict_proba(crop_data[0].iloc[::7])
+    assert (proba == 0).sum(axis=1).min() > 3
+    ids, _ = top_k(proba, 3)
+    np.testing.assert_array_equal(ids, np.argsort(-proba, axis=1, kind='stable')[:, :3])
+
+
+def test_ranking_drops_zero_probability_runners_up(forest_artifact, crop_data):
+    frame = crop_data[0]
+    proba = forest_artifact.predict_proba(frame)
+    row = int(np.argmax(proba.max(axis=1)))  # a row the forest is sure about
+    assert (proba[row] > 0).sum() < 3
+    result = recommend(dict(frame.iloc[row]), k=3, predictor=forest_artifact)
+    assert len(result.ranking) == (proba[row] > 0).sum()
+    assert all(p > 0 for _, p in result.ranking)
+    assert result.crop == forest_artifact.predict(pd.DataFrame([frame.iloc[row]]))[0]
@@ -0,0 +1,23 @@
+import numpy as np
+import pandas as pd
+
+from src.batch_predict import ERROR_COLUMN, PREDICTION_COLUMN, score_csv
+
+
+def test_validate_top_k_with_a_fully_rejected_chunk(models_dir, crop_data, tmp_path):
+    frame, _, classes = crop_data
+    rows = frame.iloc[:4].copy()
+    rows.loc[rows.index[:2], 'Potassium'] = -5.0  # below INPUT_BOUNDS: rejected
+    source, output = tmp_path / 'in.csv', tmp_path / 'out.csv'
+    rows.to_csv(source, index=False)
+
+    stats = score_csv(str(source), str(output), chunksize=2, base_path=models_dir, top_k=2, validate=True)
+
+    scored = pd.read_csv(output)
+    assert stats['rejected'] == 2
+    assert list(scored.columns[-5:]) == [PREDICTION_COLUMN, 'top1_label', 'top1_proba',
+                                         'top2_label', 'top2_proba']
+    assert scored[ERROR_COLUMN].iloc[:2].notna().all()
+    assert scored[PREDICTION_COLUMN].iloc[:2].isna().all()
+    assert scored[PREDICTION_COLUMN].iloc[2:].isin(classes).all()
+    assert np.all(scored['top1_proba'].iloc[2:] >= scored['top2_proba'].iloc[2:])
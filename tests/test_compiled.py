@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+from sklearn.tree import DecisionTreeClassifier
+
+from src.compiled import compile_model
+
+
+def _on_thresholds(model, X, seed=0):
+    """
+    Rows with one feature set exactly on a split threshold (as sklearn sees
+    it, in float32) or one float32 step either side of it.
+    """
+    trees = [model.tree_] if hasattr(model, 'tree_') else [e.tree_ for e in model.estimators_]
+    rng = np.random.default_rng(seed)
+    rows = []
+    for tree in trees:
+        split = np.flatnonzero(tree.children_left != -1)
+        for node in rng.choice(split, size=min(40, len(split)), replace=False):
+            at = np.float32(tree.threshold[node])
+            for value in (at, np.nextafter(at, np.float32(-np.inf)), np.nextafter(at, np.float32(np.inf))):
+                row = X[rng.integers(len(X))].copy()
+                row[tree.feature[node]] = value
+                rows.append(row)
+    return np.asarray(rows)
+
+
+@pytest.fixture(scope='module')
+def scaled(forest_artifact, crop_data):
+    return forest_artifact.scaler.transform(crop_data[0])
+
+
+@pytest.fixture(scope='module')
+def single_tree(scaled, crop_data):
+    return DecisionTreeClassifier(max_depth=8, random_state=0).fit(scaled, crop_data[1])
+
+
+@pytest.mark.parametrize('which', ['tree', 'forest'])
+def test_compiled_is_bit_identical_to_sklearn(which, forest_artifact, single_tree, scaled):
+    model = single_tree if which == 'tree' else forest_artifact.model
+    compiled = compile_model(model)
+    rng = np.random.default_rng(1)
+    X = np.vstack([scaled, _on_thresholds(model, scaled),
+                   rng.normal(0, 2, size=(500, scaled.shape[1]))])
+    np.testing.assert_array_equal(compiled.predict_proba(X), model.predict_proba(X))
+    np.testing.assert_array_equal(compiled.predict(X), model.predict(X))
+    assert compiled.n_trees == (1 if which == 'tree' else len(model.estimators_))
+
+
+def test_threshold_rows_take_both_branches(forest_artifact, scaled):
+    # Guard for the test above: the threshold rows really straddle the splits
+    model = forest_artifact.model
+    X = _on_thresholds(model, scaled)
+    leaves = model.apply(X)
+    assert len(np.unique(leaves[0::3, 0])) > 1
+    assert (leaves[0::3] != leaves[2::3]).any()
+
+
+def test_compiled_round_trips_through_dict(forest_artifact, scaled):
+    compiled = compile_model(forest_artifact.model)
+    restored = type(compiled).from_dict(compiled.to_dict())
+    np.testing.assert_array_equal(restored.predict_proba(scaled), compiled.predict_proba(scaled))
+
+
+def test_rejects_non_tree_models(linear_artifact):
+    with pytest.raises(TypeError):
+        compile_model(linear_artifact.model)
@@ -0,0 +1,67 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from src.dataset import HEADER_FILE, _entry_dir, build_cache, file_hash, load_dataset
+from src.utils import FEATURES, TARGET
+
+
+def _write_csv(path, n=50, seed=0):
+    rng = np.random.default_rng(seed)
+    # Raw column names, as in the original download; loading normalizes them
+    frame = pd.DataFrame({'N': rng.integers(0, 140, n), 'P': rng.integers(5, 145, n),
+                          'K': rng.integers(5, 205, n), 'temperature': rng.uniform(8, 44, n),
+                          'humidity': rng.uniform(14, 100, n), 'ph': rng.uniform(3.5, 9.9, n),
+                          'rainfall': rng.uniform(20, 300, n),
+                          TARGET: rng.choice(['rice', 'apple', 'maize', 'coffee'], n)})
+    frame.to_csv(path, index=False)
+    return str(path)
+
+
+def test_second_load_hits_the_cache_and_an_edit_builds_a_new_entry(tmp_path):
+    csv_path, cache_dir = _write_csv(tmp_path / 'crops.csv'), str(tmp_path / 'cache')
+    built = []
+    first = load_dataset(csv_path, cache_dir=cache_dir, log=built.append)
+    second = load_dataset(csv_path, cache_dir=cache_dir, log=built.append)
+    assert len(built) == 1
+    assert isinstance(second.codes, np.memmap)
+    np.testing.assert_array_equal(second.matrix(), first.matrix())
+    assert os.listdir(cache_dir) == [os.path.basename(_entry_dir(csv_path, file_hash(csv_path), cache_dir))]
+
+    with open(csv_path, 'a') as f:
+        f.write('1,2,3,20.5,80.25,6.5,100.125,banana\n')
+    edited = load_dataset(csv_path, cache_dir=cache_dir, log=built.append)
+    assert len(built) == 2
+    assert edited.source_hash != first.source_hash
+    assert edited.n_rows == first.n_rows + 1 and 'banana' in edited.classes
+    assert len(os.listdir(cache_dir)) == 2
+
+
+def test_columns_round_trip_as_float32_and_sorted_uint8_codes(tmp_path):
+    csv_path = _write_csv(tmp_path / 'crops.csv', n=37)
+    source_hash = file_hash(csv_path)
+    # Small chunks so codes assigned per chunk have to be renumbered at the end
+    entry = build_cache(csv_path, str(tmp_path / 'entry'), source_hash, chunksize=5)
+    dataset = load_dataset(csv_path, cache_dir=str(tmp_path / 'unused'))
+
+    raw = pd.read_csv(csv_path)
+    with open(os.path.join(entry, HEADER_FILE)) as f:
+        header = json.load(f)
+    assert header['n_rows'] == 37 and header['features'] == FEATURES
+    assert header['source_hash'] == source_hash
+    assert header['classes'] == sorted(raw[TARGET].unique())
+
+    codes = np.fromfile(os.path.join(entry, 'codes.u8'), dtype=np.uint8)
+    expected_classes, expected_codes = np.unique(raw[TARGET], return_inverse=True)
+    np.testing.assert_array_equal(codes, expected_codes)
+    assert dataset.codes.dtype == np.uint8 and dataset.classes.tolist() == expected_classes.tolist()
+    np.testing.assert_array_equal(dataset.labels(), raw[TARGET])
+
+    nitrogen = np.fromfile(os.path.join(entry, 'Nitrogen.f32'), dtype=np.float32)
+    np.testing.assert_array_equal(nitrogen, raw['N'].to_numpy(dtype=np.float32))
+    matrix = dataset.matrix(['rainfall', 'Nitrogen'])
+    assert matrix.dtype == np.float32
+    np.testing.assert_array_equal(matrix[:, 0], raw['rainfall'].to_numpy(dtype=np.float32))
+    assert dataset.frame(['ph'], dtype=np.float64)['ph'].dtype == np.float64
@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.edge import export_arrays, from_arrays, load_edge, save_edge
+from src.folding import fold_scaler
+from src.utils import INPUT_BOUNDS, SELECTED_FEATURES
+
+
+@pytest.fixture(scope='module')
+def readings(crop_data):
+    rng = np.random.default_rng(0)
+    random = pd.DataFrame({f: rng.uniform(*INPUT_BOUNDS[f][:2], 2000) for f in SELECTED_FEATURES})
+    return pd.concat([crop_data[0][SELECTED_FEATURES], random], ignore_index=True)
+
+
+def _sklearn(artifact, frame):
+    proba = artifact.model.predict_proba(artifact.scaler.transform(frame))
+    return artifact.classes.take(artifact.model.classes_.take(proba.argmax(axis=1))), proba
+
+
+def test_forest_matches_sklearn(tmp_path, forest_artifact, readings):
+    path = save_edge(export_arrays(forest_artifact), str(tmp_path / 'forest.edge.npz'))
+    edge = load_edge(path)
+    labels, proba = _sklearn(forest_artifact, readings)
+    X = readings.to_numpy()
+    # Only the uint8 leaf distributions are rounded
+    np.testing.assert_allclose(edge.predict_proba(X), proba, atol=0.5 / 255)
+    assert (edge.predict(X) == labels).mean() > 0.995
+
+
+def test_16_bit_forest_branches_like_sklearn_at_raw_thresholds(forest_artifact, readings):
+    folded = fold_scaler(forest_artifact.model, forest_artifact.scaler)
+    split = np.flatnonzero(np.isfinite(folded.threshold))
+    rng = np.random.default_rng(0)
+    X = readings.to_numpy()[rng.integers(len(readings), size=len(split))]
+    # On each threshold, between it and its float32 rounding, and one step above
+    rows = []
+    for value in (folded.threshold[split], folded.threshold[split].astype(np.float32).astype(np.float64),
+                  np.nextafter(folded.threshold[split], np.inf)):
+        at = X.copy()
+        at[np.arange(len(split)), folded.feature[split]] = value
+        rows.append(at)
+    rows = np.vstack(rows)
+    edge = from_arrays(export_arrays(forest_artifact))
+    frame = pd.DataFrame(rows, columns=SELECTED_FEATURES)
+    np.testing.assert_allclose(edge.predict_proba(rows), _sklearn(forest_artifact, frame)[1], atol=0.5 / 255)
+
+
+def test_linear_matches_sklearn(forest_artifact, linear_artifact, readings):
+    edge = from_arrays(export_arrays(linear_artifact))
+    labels, proba = _sklearn(linear_artifact, readings)
+    np.testing.assert_allclose(edge.predict_proba(readings.to_numpy()), proba, atol=1e-5)
+    assert (edge.predict(readings.to_numpy()) == labels).mean() > 0.999
+
+
+def test_8_bit_export_stays_close(forest_artifact, linear_artifact, readings):
+    X = readings.to_numpy()
+    for artifact in (forest_artifact, linear_artifact):
+        edge = from_arrays(export_arrays(artifact, bits=8))
+        assert (edge.predict(X) == _sklearn(artifact, readings)[0]).mean() > 0.95
+
+
+def test_recommend_ranks_like_predict_proba(forest_artifact):
+    edge = from_arrays(export_arrays(forest_artifact))
+    reading = {'Nitrogen': 90, 'Phosphorous': 42, 'Potassium': 43, 'humidity': 82, 'rainfall': 202}
+    ranking = edge.recommend(reading, k=3)
+    assert ranking[0][0] == edge.predict([[reading[f] for f in edge.features]])[0]
+    assert [p for _, p in ranking] == sorted((p for _, p in ranking), reverse=True)
+    with pytest.raises(ValueError, match='rainfall'):
+        edge.recommend({k: v for k, v in reading.items() if k != 'rainfall'})
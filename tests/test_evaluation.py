@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+from sklearn import metrics
+
+from src.evaluation import PredictionCache, confusion_matrices, evaluate, predict_models, split_digest
+
+
+@pytest.fixture(scope='module')
+def data(crop_data):
+    frame, y, classes = crop_data
+    rng = np.random.default_rng(0)
+    test = rng.permutation(len(y))[:400]
+    train = np.setdiff1d(np.arange(len(y)), test)
+    X = frame.to_numpy()
+    return {'X_train': X[train], 'y_train': y[train], 'X_test': X[test], 'y_test': y[test],
+            'classes': classes}
+
+
+def _predictions(data, seed):
+    # Noisy predictions, one class never predicted
+    rng = np.random.default_rng(seed)
+    out = {}
+    for split in ('train', 'test'):
+        y = data[f'y_{split}'].copy()
+        noise = rng.random(len(y)) < 0.3
+        y[noise] = rng.integers(0, len(data['classes']), noise.sum())
+        y[y == 3] = 4
+        out[split] = y
+    return out
+
+
+def test_metrics_match_sklearn(data):
+    predictions = {'A': _predictions(data, 1), 'B': _predictions(data, 2)}
+    table, per_class, matrices = evaluate(predictions, data)
+    labels = np.arange(len(data['classes']))
+    for name, predicted in predictions.items():
+        y_test, y_pred = data['y_test'], predicted['test']
+        precision, recall, f1, support = metrics.precision_recall_fscore_support(
+            y_test, y_pred, labels=labels, zero_division=0)
+        row = table.loc[name]
+        assert row['Precision'] == pytest.approx(precision.mean())
+        assert row['Recall'] == pytest.approx(recall.mean())
+        assert row['F1-score'] == pytest.approx(f1.mean())
+        assert row['Test Accuracy'] == pytest.approx(metrics.accuracy_score(y_test, y_pred))
+        assert row['Train Accuracy'] == pytest.approx(
+            metrics.accuracy_score(data['y_train'], predicted['train']))
+        assert row['Mean Absolute Error test'] == pytest.approx(
+            metrics.mean_absolute_error(y_test, y_pred))
+        np.testing.assert_allclose(per_class[name]['f1-score'], f1)
+        np.testing.assert_array_equal(per_class[name]['support'], support)
+        np.testing.assert_array_equal(matrices[name],
+                                      metrics.confusion_matrix(y_test, y_pred, labels=labels))
+
+
+def test_confusion_matrices_stack_models(data):
+    y = data['y_test']
+    stacked = np.stack([y, _predictions(data, 3)['test']])
+    n = len(data['classes'])
+    result = confusion_matrices(y, stacked, n)
+    for i in range(2):
+        np.testing.assert_array_equal(result[i], metrics.confusion_matrix(y, stacked[i], labels=range(n)))
+
+
+def test_predictions_are_fitted_once(tmp_path, data):
+    cache = PredictionCache(str(tmp_path), split_digest(data))
+    candidates = {'DTC': ('decision_tree', {'max_depth': 5, 'random_state': 42})}
+    first, fitted = predict_models(candidates, data, cache)
+    assert fitted == 1
+    second, fitted = predict_models(candidates, data, cache)
+    assert fitted == 0
+    np.testing.assert_array_equal(first['DTC']['test'], second['DTC']['test'])
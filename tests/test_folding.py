@@ -0,0 +1,88 @@
+import copy
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import MinMaxScaler, StandardScaler
+
+from src.compiled import compile_model
+from src.folding import fold_forest, fold_linear, fold_scaler, raw_thresholds
+
+
+def _at_raw_thresholds(folded, X, seed=0):
+    """
+    Raw rows with one feature exactly on a folded threshold or one float64
+    step above it, i.e. on both sides of every tested split.
+    """
+    rng = np.random.default_rng(seed)
+    split = np.flatnonzero(np.isfinite(folded.threshold))
+    rows = []
+    for node in rng.choice(split, size=min(600, len(split)), replace=False):
+        t = folded.threshold[node]
+        for value in (t, np.nextafter(t, np.inf)):
+            row = X[rng.integers(len(X))].copy()
+            row[folded.feature[node]] = value
+            rows.append(row)
+    return np.asarray(rows)
+
+
+@pytest.mark.parametrize('scaler_type', [StandardScaler, MinMaxScaler])
+def test_folded_forest_predicts_exactly_like_sklearn(scaler_type, crop_data):
+    frame, y, _ = crop_data
+    X = frame.to_numpy()
+    scaler = scaler_type().fit(X)
+    model = RandomForestClassifier(n_estimators=10, max_depth=10, random_state=0).fit(scaler.transform(X), y)
+    folded = fold_scaler(model, scaler)
+    assert folded.raw_input
+    rows = np.vstack([X, _at_raw_thresholds(folded, X)])
+    np.testing.assert_array_equal(folded.predict_proba(rows), model.predict_proba(scaler.transform(rows)))
+
+
+def test_raw_threshold_is_the_last_value_going_left(forest_artifact):
+    compiled = compile_model(forest_artifact.model)
+    folded = fold_forest(compiled, forest_artifact.scaler)
+    split = np.flatnonzero(np.isfinite(compiled.threshold))[:200]
+    feature, raw = compiled.feature[split], folded.threshold[split]
+    scaler = forest_artifact.scaler
+    on = np.zeros((len(split), compiled.n_features))
+    above = np.zeros_like(on)
+    on[np.arange(len(split)), feature] = raw
+    above[np.arange(len(split)), feature] = np.nextafter(raw, np.inf)
+    names = forest_artifact.features
+    scaled_on = scaler.transform(pd.DataFrame(on, columns=names)).astype(np.float32)
+    scaled_above = scaler.transform(pd.DataFrame(above, columns=names)).astype(np.float32)
+    scaled_on = scaled_on[np.arange(len(split)), feature]
+    scaled_above = scaled_above[np.arange(len(split)), feature]
+    assert (scaled_on <= compiled.threshold[split]).all()
+    assert (scaled_above > compiled.threshold[split]).all()
+
+
+def test_folded_linear_matches_multinomial_lr(linear_artifact, crop_data):
+    X = crop_data[0]
+    model, scaler = linear_artifact.model, linear_artifact.scaler
+    folded = fold_linear(model, scaler)
+    assert not folded.ovr
+    np.testing.assert_allclose(folded.predict_proba(X), model.predict_proba(scaler.transform(X)),
+                               rtol=1e-9, atol=1e-12)
+    np.testing.assert_array_equal(folded.predict(X), model.predict(scaler.transform(X)))
+
+
+def test_folded_linear_matches_one_vs_rest(linear_artifact, crop_data):
+    # Models pickled from liblinear / multi_class='ovr' normalise per-class sigmoids
+    X = crop_data[0]
+    model = copy.deepcopy(linear_artifact.model)
+    model.solver = 'liblinear'
+    folded = fold_linear(model, linear_artifact.scaler)
+    assert folded.ovr
+    np.testing.assert_allclose(folded.predict_proba(X),
+                               model._predict_proba_lr(linear_artifact.scaler.transform(X)),
+                               rtol=1e-9, atol=1e-12)
+
+
+def test_decreasing_scaler_is_rejected(forest_artifact):
+    scaler = copy.deepcopy(forest_artifact.scaler)
+    scaler.scale_ = -scaler.scale_
+    compiled = compile_model(forest_artifact.model)
+    with pytest.raises(ValueError, match='increasing'):
+        raw_thresholds(scaler, compiled.feature, compiled.threshold, compiled.n_features)
@@ -0,0 +1,24 @@
+import pytest
+
+from src.images import ThumbnailStore, build_thumbnails, get_thumbnails
+
+Image = pytest.importorskip('PIL.Image')
+
+
+def test_build_skips_unreadable_images_and_store_reads_output_dir(tmp_path, capsys):
+    source, output = tmp_path / 'images', tmp_path / 'thumbs-elsewhere'
+    source.mkdir()
+    Image.new('RGB', (800, 600), (40, 120, 40)).save(source / 'rice.jpg')
+    (source / 'maize.jpg').write_bytes(b'not a jpeg')
+
+    manifest = build_thumbnails(str(source), str(output), sizes=(160, 320))
+    assert sorted(manifest['crops']) == ['rice']
+    assert 'maize.jpg' in capsys.readouterr().err
+
+    store = ThumbnailStore(str(source), str(output))
+    assert store.built
+    rice = store.get('rice', 200)
+    assert rice.width == 320 and not rice.placeholder
+    assert store.get('maize', 200).placeholder
+    assert not ThumbnailStore(str(source)).built
+    assert get_thumbnails(str(source), str(output)).built
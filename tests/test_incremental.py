@@ -0,0 +1,81 @@
+import copy
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.artifact import load_default
+from src.incremental import (append_rows, list_versions, main, next_version, read_updates,
+                             rescale_linear, rescale_trees)
+from src.utils import TARGET
+
+
+def _shifted_scaler(artifact, frame):
+    scaler = copy.deepcopy(artifact.scaler)
+    scaler.partial_fit(frame * 1.5 + 10)
+    return scaler
+
+
+def test_rescale_trees_keeps_predictions(forest_artifact, crop_data):
+    # Training rows sit half a gap away from every threshold
+    frame = crop_data[0]
+    scaler = _shifted_scaler(forest_artifact, frame)
+    model = copy.deepcopy(forest_artifact.model)
+    rescale_trees([estimator.tree_ for estimator in model.estimators_], forest_artifact.scaler, scaler)
+    np.testing.assert_array_equal(model.predict(scaler.transform(frame)),
+                                  forest_artifact.model.predict(forest_artifact.scaler.transform(frame)))
+
+
+def test_rescale_linear_keeps_predictions(linear_artifact, crop_data):
+    frame = crop_data[0]
+    scaler = _shifted_scaler(linear_artifact, frame)
+    model = copy.deepcopy(linear_artifact.model)
+    rescale_linear(model, linear_artifact.scaler, scaler)
+    expected = linear_artifact.model.predict_proba(linear_artifact.scaler.transform(frame))
+    np.testing.assert_allclose(model.predict_proba(scaler.transform(frame)), expected, atol=1e-9)
+
+
+def _updates_csv(path, crop_data, rows=slice(0, 40)):
+    frame, y, classes = crop_data
+    updates = frame.iloc[rows].copy()
+    updates[TARGET] = np.asarray(classes)[y[rows]]
+    updates.to_csv(path, index=False)
+    return str(path)
+
+
+def test_read_updates_rejects_unknown_labels(tmp_path, forest_artifact, crop_data):
+    path = _updates_csv(tmp_path / 'new.csv', crop_data)
+    frame = pd.read_csv(path)
+    frame.loc[3, TARGET] = 'dragonfruit'
+    frame.to_csv(path, index=False)
+    with pytest.raises(ValueError, match='dragonfruit'):
+        read_updates(path, forest_artifact)
+
+
+def test_versions_are_never_reused_after_rollback(models_dir, tmp_path, crop_data):
+    updates = _updates_csv(tmp_path / 'new.csv', crop_data)
+    appended = str(tmp_path / 'field_updates.csv')
+    args = ['update', updates, '--models', models_dir, '--trees', '2', '--append-to', appended]
+    assert main(args) == 0
+    assert load_default(models_dir).metadata['version'] == 2
+
+    assert main(['rollback', '1', '--models', models_dir]) == 0
+    live = load_default(models_dir)
+    assert live.metadata['version'] == 1
+    assert next_version(live, models_dir) == 3
+
+    assert main(args) == 0
+    assert sorted(list_versions(models_dir)) == [1, 2, 3]
+    assert load_default(models_dir).metadata['parent_version'] == 1
+    assert len(pd.read_csv(appended)) == 80
+
+
+def test_append_rows_matches_columns_by_name(tmp_path, crop_data):
+    path = str(tmp_path / 'field_updates.csv')
+    pd.DataFrame(columns=[TARGET, 'rainfall', 'Nitrogen']).to_csv(path, index=False)
+    frame = pd.DataFrame({'N': [90.0], 'rainfall': [200.0], TARGET: ['rice'], 'humidity': [80.0]})
+    append_rows(frame, path)
+    written = pd.read_csv(path)
+    assert list(written.columns) == [TARGET, 'rainfall', 'Nitrogen']
+    assert written.iloc[0].tolist() == ['rice', 200.0, 90.0]
@@ -0,0 +1,76 @@
+import threading
+
+import pytest
+
+from src import instrumentation
+from src.instrumentation import SPAN_ERRORS, SPAN_SECONDS, Registry, SamplingProfiler, span
+
+
+def test_prometheus_text_has_headers_cumulative_buckets_and_escaped_labels():
+    registry = Registry()
+    requests = registry.counter('requests_total', 'Requests served\nper "path" \\ route')
+    requests.inc(path='/pre"dict\\x\ny')
+    requests.inc(2, path='/health')
+    latency = registry.histogram('latency_seconds', 'Request latency', buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        latency.observe(value, path='/predict')
+
+    lines = registry.prometheus_text().splitlines()
+    assert lines[:2] == ['# HELP requests_total Requests served\\nper "path" \\\\ route',
+                         '# TYPE requests_total counter']
+    assert 'requests_total{path="/health"} 2' in lines
+    assert 'requests_total{path="/pre\\"dict\\\\x\\ny"} 1' in lines
+    assert lines[lines.index('# HELP latency_seconds Request latency') + 1:] == [
+        '# TYPE latency_seconds histogram',
+        'latency_seconds_bucket{path="/predict",le="0.1"} 2',
+        'latency_seconds_bucket{path="/predict",le="1.0"} 3',
+        'latency_seconds_bucket{path="/predict",le="+Inf"} 4',
+        'latency_seconds_count{path="/predict"} 4',
+        'latency_seconds_sum{path="/predict"} 3.65',
+    ]
+
+
+def test_registry_rejects_a_name_reused_for_another_kind():
+    registry = Registry()
+    assert registry.counter('hits', 'Hits') is registry.counter('hits', 'Hits')
+    with pytest.raises(ValueError, match='counter'):
+        registry.gauge('hits', 'Hits')
+
+
+def test_span_is_a_no_op_when_disabled(monkeypatch):
+    monkeypatch.setattr(instrumentation, '_enabled', False)
+    before = SPAN_SECONDS.to_dict()
+    with pytest.raises(KeyError):
+        with span('test-disabled'):
+            raise KeyError('x')
+    assert SPAN_SECONDS.to_dict() == before
+    assert SPAN_ERRORS.value(span='test-disabled', error='KeyError') == 0
+
+    monkeypatch.setattr(instrumentation, '_enabled', True)
+    with pytest.raises(KeyError):
+        with span('test-enabled'):
+            raise KeyError('x')
+    assert SPAN_ERRORS.value(span='test-enabled', error='KeyError') == 1
+    assert any(s['labels'] == {'span': 'test-enabled'} and s['count'] == 1 for s in SPAN_SECONDS.to_dict())
+
+
+def test_sampling_profiler_records_other_threads(tmp_path):
+    stop = threading.Event()
+
+    def busy_worker():
+        while not stop.is_set():
+            sum(range(1000))
+
+    worker = threading.Thread(target=busy_worker)
+    worker.start()
+    try:
+        with SamplingProfiler(interval=0.001) as profiler:
+            while profiler.samples < 5:
+                stop.wait(0.005)
+    finally:
+        stop.set()
+        worker.join()
+    assert not profiler.running
+    assert any('busy_worker' in stack for stack in profiler.stacks)
+    lines = open(profiler.write_collapsed(str(tmp_path / 'stacks.txt'))).read().splitlines()
+    assert sum(int(line.rsplit(' ', 1)[1]) for line in lines) == sum(profiler.stacks.values())
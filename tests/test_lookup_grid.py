@@ -0,0 +1,69 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.artifact import save_artifact
+from src.lookup_grid import GRID_FILE, GridPredictor, build_grid, main, save_grid
+from src.prediction_cache import CachedPredictor, artifact_version
+from src.utils import INPUT_BOUNDS, SELECTED_FEATURES
+
+BUDGET = 64 * 1024
+
+
+@pytest.fixture
+def grid_predictor(models_dir, forest_artifact):
+    grid = build_grid(forest_artifact, BUDGET, model_version=artifact_version(models_dir))
+    save_grid(grid, os.path.join(models_dir, GRID_FILE))
+    return GridPredictor(CachedPredictor(models_dir, check_interval=0),
+                         os.path.join(models_dir, GRID_FILE))
+
+
+def _rows(n, seed=0, scale=1.0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({f: rng.uniform(INPUT_BOUNDS[f][0], INPUT_BOUNDS[f][1] * scale, n)
+                         for f in SELECTED_FEATURES})
+
+
+def test_in_domain_rows_come_from_the_grid(grid_predictor):
+    grid = grid_predictor.current_grid()
+    assert grid is not None and grid.confidence is not None
+    frame = _rows(500)
+    np.testing.assert_array_equal(grid_predictor.predict(frame), grid.predict(frame.to_numpy()))
+    labels, proba = grid_predictor.recommend(frame, 1)
+    np.testing.assert_array_equal(labels[:, 0], grid.predict(frame.to_numpy()))
+    assert ((proba > 0) & (proba <= 1)).all()
+
+
+def test_out_of_domain_rows_and_rankings_use_the_model(grid_predictor):
+    model = grid_predictor.predictor
+    frame = _rows(500, seed=1, scale=2.0)
+    frame.loc[0, 'rainfall'] = np.nan
+    outside = ~grid_predictor.current_grid().covers(frame.to_numpy())
+    assert outside[0] and outside.any() and not outside.all()
+    np.testing.assert_array_equal(grid_predictor.predict(frame)[outside],
+                                  model.predict(frame[outside]))
+    labels, _ = grid_predictor.recommend(frame, 1)
+    np.testing.assert_array_equal(labels[outside], model.recommend(frame[outside], 1)[0])
+
+    labels, proba = grid_predictor.recommend(frame, 3)
+    expected_labels, expected_proba = model.recommend(frame, 3)
+    np.testing.assert_array_equal(labels, expected_labels)
+    np.testing.assert_array_equal(proba, expected_proba)
+
+
+def test_grid_is_ignored_after_the_model_changes(grid_predictor, models_dir, linear_artifact):
+    save_artifact(linear_artifact, os.path.join(models_dir, 'crop_recommendation.joblib'))
+    os.utime(os.path.join(models_dir, 'crop_recommendation.joblib'), ns=(1, 1))
+    assert grid_predictor.current_grid() is None
+    frame = _rows(200, seed=2)
+    np.testing.assert_array_equal(grid_predictor.predict(frame), linear_artifact.predict(frame))
+
+
+def test_build_rejects_bins_for_unknown_features(models_dir):
+    with pytest.raises(SystemExit) as e:
+        main(['build', '--models', models_dir, '--bins', 'ph=4'])
+    assert e.value.code == 2
+    with pytest.raises(SystemExit):
+        main(['build', '--models', models_dir, '--bins', 'rainfall=x'])
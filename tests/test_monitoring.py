@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.monitoring import BatchValidator, DriftMonitor, build_profile, psi
+from src.preprocessing import CLEANED_CSV
+from src.utils import SELECTED_FEATURES
+
+
+@pytest.fixture(scope='module')
+def profile():
+    return build_profile(CLEANED_CSV, SELECTED_FEATURES)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_validator_rejects_bad_rows_with_reasons(profile):
+    frame = pd.DataFrame({'Nitrogen': [90, -5, 90], 'Phosphorous': [42, 42, 'abc'],
+                          'Potassium': [43, 43, 43], 'humidity': [82, 82, 82],
+                          'rainfall': [202, 202, 202]})
+    result = BatchValidator(SELECTED_FEATURES, profile=profile).check(frame)
+    assert result.valid.tolist() == [True, False, False]
+    errors = result.errors()
+    assert 'Nitrogen=-5 is outside [0, 140]' in errors[1]
+    assert 'Phosphorous is missing or not a number' in errors[2]
+
+
+def test_psi_is_small_on_training_data_and_large_when_shifted(profile, crop_data):
+    X = crop_data[0][profile.features].to_numpy()
+    assert psi(profile.bin_counts(X), profile.expected).max() < 0.01
+    shifted = X.copy()
+    shifted[:, profile.features.index('rainfall')] *= 2
+    scores = dict(zip(profile.features, psi(profile.bin_counts(shifted), profile.expected)))
+    assert scores['rainfall'] > 0.25
+    assert scores['Nitrogen'] < 0.01
+
+
+def test_overdue_window_closes_when_read(profile, crop_data):
+    clock = FakeClock()
+    drift = DriftMonitor(profile, interval=60, min_rows=10, clock=clock)
+    drift.observe(crop_data[0][profile.features].to_numpy()[:50])
+    assert drift.snapshot()['last_window'] is None
+
+    # No more traffic: reading the metrics still publishes the window
+    clock.now = 61
+    last = drift.snapshot()['last_window']
+    assert last is not None and last['rows'] == 50
+    assert drift.snapshot()['window_rows'] == 0
+
+    drift.observe(crop_data[0][profile.features].to_numpy()[:50])
+    clock.now = 122
+    assert drift.poll()['rows'] == 50
@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.artifact import load_default
+from src.prediction_cache import CachedPredictor
+
+
+def _rows(crop_data, n=40):
+    frame, _, _ = crop_data
+    # Already on the widget grid, so rounding does not change what gets scored
+    rows = frame.iloc[:n].round({'Potassium': 0, 'Nitrogen': 0, 'Phosphorous': 0,
+                                 'humidity': 1, 'rainfall': 1}).reset_index(drop=True)
+    return rows
+
+
+def test_cached_matches_uncached_and_hits(models_dir, crop_data):
+    rows = _rows(crop_data)
+    predictor = CachedPredictor(models_dir)
+    expected = load_default(models_dir).predict(rows)
+    assert np.array_equal(predictor.predict(rows), expected)
+    assert np.array_equal(predictor.predict(rows), expected)
+    assert predictor.cache.hits >= len(np.unique(rows.to_numpy(), axis=0))
+
+
+def test_missing_readings_bypass_the_cache(models_dir, crop_data):
+    rows = _rows(crop_data, 10)
+    rows.loc[[2, 5], 'Potassium'] = np.nan
+    artifact = load_default(models_dir)
+    predictor = CachedPredictor(models_dir)
+    with np.errstate(invalid='raise'):
+        labels = predictor.predict(rows)
+    assert np.array_equal(labels, artifact.predict(rows))
+    cached_labels, cached_proba = predictor.recommend(rows, k=3)
+    labels, proba = artifact.recommend(rows, 3)
+    assert np.array_equal(cached_labels, labels)
+    assert np.allclose(cached_proba, proba)
+    # Only the finite rows were stored
+    assert len(predictor.cache) == 2 * len(np.unique(rows.drop(index=[2, 5]).to_numpy(), axis=0))
+
+
+def test_infinite_readings_behave_like_the_artifact(models_dir, crop_data):
+    rows = _rows(crop_data, 4)
+    rows.loc[1, 'rainfall'] = np.inf
+    artifact = load_default(models_dir)
+    try:
+        expected = artifact.predict(rows)
+    except ValueError:
+        with pytest.raises(ValueError):
+            CachedPredictor(models_dir).predict(rows)
+    else:
+        assert np.array_equal(CachedPredictor(models_dir).predict(rows), expected)
+
+
+def test_all_rows_missing(models_dir):
+    frame = pd.DataFrame(np.nan, index=range(3),
+                         columns=['Potassium', 'humidity', 'rainfall', 'Nitrogen', 'Phosphorous'])
+    predictor = CachedPredictor(models_dir)
+    assert np.array_equal(predictor.predict(frame), load_default(models_dir).predict(frame))
+    assert len(predictor.cache) == 0
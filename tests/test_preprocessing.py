@@ -0,0 +1,28 @@
+import filecmp
+
+import pytest
+
+from src.preprocessing import CLEANED_CSV, RAW_CSV, clean_csv, main
+
+
+def test_default_clean_reproduces_the_committed_csv(tmp_path):
+    output = str(tmp_path / 'cleaned.csv')
+    assert main(['clean', RAW_CSV, output, '--models', str(tmp_path)]) == 0
+    assert filecmp.cmp(output, CLEANED_CSV, shallow=False)
+
+
+def test_unshuffled_runs_cannot_overwrite_the_cleaned_csv(tmp_path):
+    for args in (['--no-shuffle'], ['--chunksize', '500'], ['--shuffle-seed', '7']):
+        with pytest.raises(SystemExit):
+            main(['clean', RAW_CSV, CLEANED_CSV, '--models', str(tmp_path)] + args)
+    with pytest.raises(ValueError):
+        clean_csv(RAW_CSV, CLEANED_CSV, shuffle_seed=None)
+
+
+def test_chunked_clean_keeps_row_order(tmp_path):
+    output = str(tmp_path / 'streamed.csv')
+    assert main(['clean', RAW_CSV, output, '--chunksize', '500', '--models', str(tmp_path)]) == 0
+    in_memory = str(tmp_path / 'ordered.csv')
+    clean_csv(RAW_CSV, in_memory, shuffle_seed=None)
+    with open(output) as streamed, open(in_memory) as ordered:
+        assert [line.split(',')[-1] for line in streamed] == [line.split(',')[-1] for line in ordered]
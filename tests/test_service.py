@@ -0,0 +1,102 @@
+import json
+import socket
+import threading
+import urllib.error
+import urllib.request
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.prediction_cache import quantize
+from src.service import MAX_BODY_BYTES, build_server
+
+
+def _serve(models_dir, **kwargs):
+    server = build_server('127.0.0.1', 0, window_ms=1, base_path=models_dir, **kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _stop(server):
+    server.shutdown()
+    server.server_close()
+    server.batcher.close()
+
+
+@pytest.fixture
+def server(models_dir):
+    server = _serve(models_dir)
+    yield server
+    _stop(server)
+
+
+def _call(server, path, body=None):
+    url = f"http://127.0.0.1:{server.server_address[1]}{path}"
+    data = None if body is None else json.dumps(body).encode('utf-8')
+    try:
+        with urllib.request.urlopen(url, data=data, timeout=10) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def test_rejected_requests_are_counted(server):
+    row = {'N': 90, 'P': 42, 'K': 43, 'humidity': 82, 'rainfall': 202}
+    assert _call(server, '/predict', row)[0] == 200
+    status, body = _call(server, '/predict', dict(row, N=-5))
+    assert status == 400 and 'Nitrogen' in body['error']
+    assert _call(server, '/predict', {'N': 90})[0] == 400
+
+    status, metrics = _call(server, '/metrics')
+    assert (metrics['requests'], metrics['rejected'], metrics['errors']) == (3, 2, 0)
+
+
+def _raw_post(server, length):
+    # The client keeps the connection open, as a slow or hostile client would
+    with socket.create_connection(server.server_address, timeout=5) as sock:
+        sock.sendall(f"POST /predict HTTP/1.1\r\nHost: test\r\nContent-Length: {length}\r\n\r\n".encode())
+        return int(sock.recv(4096).decode().split()[1])
+
+
+@pytest.mark.parametrize('length, status', [(-1, 400), ('abc', 400), (MAX_BODY_BYTES + 1, 413)])
+def test_bad_content_length_is_rejected_without_reading(server, length, status):
+    assert _raw_post(server, length) == status
+    assert _call(server, '/health')[0] == 200
+
+
+def _off_grid_row(artifact, crop_data):
+    """
+    A training row moved just across a split threshold, where rounding to
+    the input grid moves it back and changes the predicted crop.
+    """
+    frame = crop_data[0][artifact.features]
+    scaler = artifact.scaler
+    for estimator in artifact.model.estimators_:
+        tree = estimator.tree_
+        for node in np.flatnonzero(tree.feature >= 0):
+            f = tree.feature[node]
+            threshold = tree.threshold[node] * scaler.scale_[f] + scaler.mean_[f]
+            for value in (threshold - 1e-3, threshold + 1e-3):
+                exact = frame.copy()
+                exact.iloc[:, f] = value
+                rounded = pd.DataFrame(quantize(exact, artifact.features)[0], columns=artifact.features)
+                flipped = np.flatnonzero(artifact.predict(exact) != artifact.predict(rounded))
+                if len(flipped):
+                    return exact.iloc[flipped[0]], rounded.iloc[flipped[0]]
+    raise AssertionError("no threshold where rounding changes the prediction")
+
+
+def test_rows_are_scored_as_submitted_unless_the_cache_is_on(models_dir, forest_artifact, crop_data):
+    exact, rounded = _off_grid_row(forest_artifact, crop_data)
+    expected = forest_artifact.predict(exact.to_frame().T)[0]
+    nearest = forest_artifact.predict(rounded.to_frame().T)[0]
+    assert nearest != expected
+    # With the cache on, the answer is the nearest grid point's, as documented
+    for kwargs, answer in (({}, expected), ({'cache_size': 100}, nearest)):
+        server = _serve(models_dir, **kwargs)
+        try:
+            status, body = _call(server, '/predict', exact.to_dict())
+        finally:
+            _stop(server)
+        assert (status, body['crop']) == (200, answer)
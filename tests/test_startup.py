@@ -0,0 +1,41 @@
+import threading
+
+import pytest
+
+from src.startup import WarmupTask, warm_up
+
+
+def test_loader_errors_reach_the_caller():
+    task = WarmupTask('broken', lambda: 1 / 0)
+    with pytest.raises(ZeroDivisionError):
+        task.result(timeout=5)
+    assert task.ready() and task.failed()
+    assert isinstance(task.exception(), ZeroDivisionError)
+    assert task.seconds is not None
+
+
+def test_result_waits_for_a_running_loader():
+    release = threading.Event()
+    task = WarmupTask('slow', lambda: release.wait(5) and 'model')
+    assert not task.ready() and task.exception() is None and not task.failed()
+    release.set()
+    assert task.result(timeout=5) == 'model'
+    assert not task.failed()
+
+
+def test_warm_up_reuses_tasks_and_restarts_failed_ones():
+    calls = []
+
+    def flaky():
+        calls.append(1)
+        if len(calls) == 1:
+            raise OSError("model files missing")
+        return 'model'
+
+    first = warm_up('test-flaky', flaky)
+    with pytest.raises(OSError):
+        first.result(timeout=5)
+    second = warm_up('test-flaky', flaky)
+    assert second is not first and second.result(timeout=5) == 'model'
+    assert warm_up('test-flaky', flaky) is second
+    assert len(calls) == 2
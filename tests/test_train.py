@@ -0,0 +1,85 @@
+import os
+
+import numpy as np
+import pytest
+from sklearn.model_selection import KFold, cross_val_score
+from sklearn.tree import DecisionTreeClassifier
+
+from src.train import N_SPLITS, SEED, cross_validate, halving_schedule, successive_halving
+
+TREE = ('decision_tree', {'max_depth': 6, 'random_state': 0})
+CANDIDATES = [TREE, ('decision_tree', {'max_depth': 2, 'random_state': 0}),
+              ('logreg', {'max_iter': 300, 'random_state': 0})]
+
+
+@pytest.fixture(scope='module')
+def xy(crop_data):
+    frame, y, _ = crop_data
+    X = frame.to_numpy()
+    return (X - X.mean(axis=0)) / X.std(axis=0), y
+
+
+def _cached_files(root):
+    return sum(name.endswith('.joblib') for _, _, names in os.walk(root) for name in names)
+
+
+def test_scores_match_sklearn_cross_val_score(tmp_path, xy):
+    X, y = xy
+    [row] = cross_validate([TREE], X, y, n_jobs=1, cache_dir=str(tmp_path))
+    expected = cross_val_score(DecisionTreeClassifier(**TREE[1]), X, y,
+                               cv=KFold(N_SPLITS, shuffle=True, random_state=SEED))
+    np.testing.assert_allclose(row['scores'], expected)
+    assert row['mean'] == pytest.approx(expected.mean())
+
+
+def test_rerun_only_fits_new_candidates(tmp_path, xy):
+    X, y = xy
+    first = cross_validate(CANDIDATES[:2], X, y, n_jobs=1, cache_dir=str(tmp_path))
+    assert all(row['cached'] == 0 for row in first)
+    second = {row['params']['max_depth'] if 'max_depth' in row['params'] else 'lr': row
+              for row in cross_validate(CANDIDATES, X, y, n_jobs=1, cache_dir=str(tmp_path))}
+    assert second[6]['cached'] == second[2]['cached'] == N_SPLITS
+    assert second['lr']['cached'] == 0
+    np.testing.assert_array_equal(second[6]['scores'], {r['params']['max_depth']: r for r in first}[6]['scores'])
+
+
+def test_fits_finished_after_stop_are_cached(tmp_path, xy):
+    X, y = xy
+    calls = []
+
+    def stop(result):
+        calls.append(result)
+        return True
+
+    cross_validate(CANDIDATES, X, y, n_jobs=2, cache_dir=str(tmp_path), stop=stop)
+    # The fit that triggered the stop and those already running next to it are all kept
+    assert _cached_files(str(tmp_path)) == len(calls) >= 2
+    rerun = cross_validate(CANDIDATES, X, y, n_jobs=1, cache_dir=str(tmp_path))
+    assert sum(row['cached'] for row in rerun) == len(calls)
+
+
+def test_halving_schedule_ends_at_the_full_budget():
+    assert halving_schedule(27, factor=3) == pytest.approx([1 / 9, 1 / 3, 1.0])
+    assert halving_schedule(2, factor=3) == [1.0]
+    assert halving_schedule(100, factor=2, min_fraction=0.25) == [0.25, 0.5, 1.0]
+
+
+def test_successive_halving_keeps_the_best_candidate_with_fewer_fits(tmp_path, xy):
+    X, y = xy
+    candidates = [('decision_tree', {'max_depth': d, 'random_state': 0}) for d in (1, 2, 3, 4, 8, 12)]
+    full = cross_validate(candidates, X, y, n_jobs=1, cache_dir=str(tmp_path / 'full'))
+    summary, report = successive_halving(candidates, X, y, factor=3, n_jobs=1,
+                                         cache_dir=str(tmp_path / 'halving'))
+    assert report['complete']
+    assert summary[0]['mean'] >= full[0]['mean'] - 0.01
+    assert report['cost'] < report['fits_full_grid']
+    assert summary[0]['params']['max_depth'] >= 8
+
+
+def test_successive_halving_stops_on_the_fit_time_budget(tmp_path, xy):
+    X, y = xy
+    candidates = [('decision_tree', {'max_depth': d, 'random_state': 0}) for d in range(1, 10)]
+    summary, report = successive_halving(candidates, X, y, cpu_budget_s=0.0, n_jobs=1,
+                                         cache_dir=str(tmp_path))
+    assert not report['complete']
+    assert report['fits'] <= N_SPLITS * len(candidates)
@@ -0,0 +1,52 @@
+import functools
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src import train_large
+from src.dataset import load_dataset
+from src.preprocessing import CLEANED_CSV
+from src.train_large import (_raw, _TreeBuilder, bin_dataset, chunks, grow_forest, is_test,
+                             to_sklearn_forest)
+from src.utils import SELECTED_FEATURES
+
+PARAMS = {'max_depth': 8, 'min_samples_split': 4, 'min_samples_leaf': 2, 'criterion': 'entropy',
+          'bootstrap': True, 'random_state': 0}
+
+
+@pytest.fixture
+def binned(tmp_path, monkeypatch):
+    csv_path = str(tmp_path / 'survey.csv')
+    pd.read_csv(CLEANED_CSV, nrows=600).to_csv(csv_path, index=False)
+    load = functools.partial(load_dataset, cache_dir=str(tmp_path / 'datasets'))
+    monkeypatch.setattr(train_large, 'load_dataset', load)
+    data = bin_dataset(csv_path, SELECTED_FEATURES, max_bins=16, chunk_rows=128,
+                       cache_dir=str(tmp_path / 'binned'))
+    return load(csv_path, data.features), data
+
+
+def test_is_test_split_does_not_depend_on_the_chunk_size():
+    whole = is_test(0, 5000)
+    for chunk_rows in (1, 7, 128, 4999):
+        np.testing.assert_array_equal(
+            np.concatenate([is_test(start, stop) for start, stop in chunks(5000, chunk_rows)]), whole)
+    assert 0.17 < whole.mean() < 0.23
+    assert not np.array_equal(is_test(0, 5000, seed=1), whole)
+
+
+def test_sklearn_trees_send_training_rows_to_the_grown_leaves(binned):
+    dataset, data = binned
+    trees = grow_forest(data, PARAMS, 3, n_jobs=1, chunk_rows=128)
+    forest = to_sklearn_forest(trees, data.cuts, len(data.classes), PARAMS)
+
+    train = ~is_test(0, data.n_rows, data.test_size, data.seed)
+    X = data.scaler.transform(_raw(dataset, data.features, 0, data.n_rows)[train])
+    bins = np.asarray(data.bins)[train]
+    for arrays, estimator in zip(trees, forest.estimators_):
+        assert arrays['depth'] > 1
+        builder = _TreeBuilder(len(data.classes))
+        for name in ('left', 'right', 'feature', 'bin'):
+            setattr(builder, name, arrays[name].tolist())
+        builder.depth = [arrays['depth']]
+        np.testing.assert_array_equal(estimator.apply(X), builder.route(bins))